@@ -0,0 +1,58 @@
+"""
+Micro-benchmark of the per-turn setup cost of the finance sub-agent.
+
+"before" replays what ``agent_node`` used to do on every user turn (format the
+system prompt, build a ChatPromptTemplate and compile a new ReAct graph), "after"
+is the work left per turn now that the graph is compiled once: rendering the
+prompt from the state.
+
+Usage:
+    python benchmarks/agent_graph_build_bench.py [turns]
+"""
+import os
+import sys
+import timeit
+
+from langchain_core.messages import HumanMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langgraph.prebuilt import create_react_agent
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(absolute_path)
+from agent.finance_manager import finance_agent_prompt, llm, system_prompt_template
+from utils.tools import tools
+
+state = {
+    "messages": [HumanMessage(content="Quanto gastei em abril?")],
+    "user_id": 123,
+    "user_name": "John Doe",
+}
+
+
+def build_per_turn():
+    dynamic_system_prompt = system_prompt_template.format(
+        user_name=state["user_name"],
+        user_id=state["user_id"],
+        messages=""
+    )
+    prompt_template = ChatPromptTemplate.from_messages([
+        ("system", dynamic_system_prompt),
+        ("placeholder", "{messages}")
+    ])
+    return create_react_agent(model=llm, tools=tools, prompt=prompt_template)
+
+
+def render_cached_prompt():
+    return finance_agent_prompt(state)
+
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    before = timeit.timeit(build_per_turn, number=turns) / turns
+    after = timeit.timeit(render_cached_prompt, number=turns) / turns
+
+    print(f"turns: {turns}")
+    print(f"before (graph built per turn): {before * 1000:.3f} ms/turn")
+    print(f"after (pre-compiled graph):    {after * 1000:.3f} ms/turn")
+    print(f"speedup: {before / after:.0f}x")
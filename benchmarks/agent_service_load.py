@@ -0,0 +1,113 @@
+"""
+Load test of the HTTP agent service.
+
+Starts ``agent_service.server`` in process on a random local port, over the full
+finance graph with the stub streaming model of ``agent_ttft_bench`` (no network,
+throwaway databases), then sends ``--requests`` streaming chat requests from
+``--concurrency`` concurrent clients. Every request comes from a different user,
+so the router, the response cache and batching do not shortcut the agent.
+
+Reports the status codes (429 when the queue is full), requests per second and
+the p50/p95/p99 of the time to the first token and to the end of the reply.
+
+Usage:
+    python benchmarks/agent_service_load.py [--requests N] [--concurrency C]
+        [--workers W] [--queue-size Q] [--first-token S] [--per-token S]
+"""
+import argparse
+import asyncio
+import collections
+import os
+import statistics
+import sys
+import time
+
+from aiohttp import ClientSession, TCPConnector, web
+
+# Sets up the throwaway databases and the stub model before the agent is imported.
+from agent_ttft_bench import SlowStreamingChatModel, finance_manager
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(absolute_path)
+from agent_service.finance_buddy import FinanceBuddy
+from agent_service.server import create_app
+
+
+def percentiles(samples: list[float]) -> str:
+    if len(samples) < 2:
+        return "not enough samples"
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return " ".join(
+        f"p{point} {cuts[point - 1] * 1000:7.1f} ms" for point in (50, 95, 99)
+    )
+
+
+async def send(session: ClientSession, url: str, user_id: int, results: dict):
+    started = time.perf_counter()
+    first_token = None
+    async with session.post(
+        url, json={"user_id": user_id, "message": "Como posso economizar mais dinheiro?"}
+    ) as response:
+        results["status"][response.status] += 1
+        if response.status != 200:
+            await response.read()
+            return
+        async for line in response.content:
+            if first_token is None and line.startswith(b"event: token"):
+                first_token = time.perf_counter() - started
+    results["latency"].append(time.perf_counter() - started)
+    if first_token is not None:
+        results["first_token"].append(first_token)
+
+
+async def load(arguments) -> tuple[dict, float]:
+    finance_manager.finance_agent_graph = finance_manager.build_finance_agent_graph(
+        SlowStreamingChatModel(first_token=arguments.first_token, per_token=arguments.per_token)
+    )
+    app = create_app(
+        FinanceBuddy(finance_manager.finance_agent),
+        workers=arguments.workers,
+        queue_size=arguments.queue_size,
+    )
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    url = f"http://{host}:{port}/v1/chat/stream"
+
+    results = {"status": collections.Counter(), "latency": [], "first_token": []}
+    user_ids = iter(range(1, arguments.requests + 1))
+
+    async def client(session: ClientSession):
+        for user_id in user_ids:
+            await send(session, url, user_id, results)
+
+    started = time.perf_counter()
+    try:
+        async with ClientSession(connector=TCPConnector(limit=arguments.concurrency)) as session:
+            await asyncio.gather(*(client(session) for _ in range(arguments.concurrency)))
+    finally:
+        elapsed = time.perf_counter() - started
+        await runner.cleanup()
+    return results, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--first-token", type=float, default=0.2)
+    parser.add_argument("--per-token", type=float, default=0.005)
+    arguments = parser.parse_args()
+
+    results, elapsed = asyncio.run(load(arguments))
+    completed = len(results["latency"])
+    print(f"requests: {arguments.requests}, concurrency: {arguments.concurrency}, "
+          f"workers: {arguments.workers}, queue: {arguments.queue_size}")
+    print("status codes:", dict(sorted(results["status"].items())))
+    print(f"throughput: {completed / elapsed:.1f} completed requests/s over {elapsed:.1f} s")
+    print("first token:", percentiles(results["first_token"]))
+    print("full reply: ", percentiles(results["latency"]))
@@ -0,0 +1,164 @@
+"""
+Time-to-first-token benchmark of ``finance_agent``.
+
+Runs the full graph (router, response cache, memory, context compaction and the
+ReAct agent) on throwaway databases, with a stand-in chat model that waits
+``first_token`` seconds before its first token and ``per_token`` seconds between
+tokens, like a hosted model would. Each turn is asked twice:
+
+* ``stream_mode="values"``: the reply is only visible once the agent finished, so
+  the time to the first reply text is the full completion latency;
+* ``stream_mode="messages"``: the reply tokens are forwarded as the model
+  produces them, see ``reply_token``.
+
+Every turn uses a new user, so neither the intent router nor the response cache
+answer it. Pass ``--async`` to measure ``astream`` instead of ``stream``.
+
+Usage:
+    python benchmarks/agent_ttft_bench.py [turns] [--async]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+directory = tempfile.mkdtemp()
+os.environ["EXPENSES_DB_PATH"] = os.path.join(directory, "expenses_bench.db")
+os.environ["MESSAGES_DB_PATH"] = os.path.join(directory, "messages_bench.db")
+os.environ["MESSAGES_VECTOR_DB_PATH"] = os.path.join(directory, "messages_bench_vec.db")
+os.environ["CHECKPOINTS_DB_PATH"] = os.path.join(directory, "checkpoints_bench.db")
+os.environ["EMBEDDINGS_PROVIDER"] = "hashing"
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(absolute_path)
+import agent.finance_manager as finance_manager
+from utils.expenses_db_sqlite import initialize_database
+from utils.messages_db_sqlite import initialize_messages_database
+
+REPLY = (
+    "Para economizar, comece separando seus gastos fixos dos variáveis e defina um "
+    "limite mensal para cada categoria. Reserve uma parte da renda assim que ela cair."
+)
+
+
+class SlowStreamingChatModel(BaseChatModel):
+    """Fake chat model answering ``REPLY`` word by word with a model-like latency."""
+
+    first_token: float = 0.4
+    per_token: float = 0.02
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-streaming-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    @staticmethod
+    def _result(chunks: list[ChatGenerationChunk]) -> ChatResult:
+        content = "".join(chunk.message.content for chunk in chunks)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self._result(list(self._stream(messages, stop, run_manager, **kwargs)))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        chunks = [chunk async for chunk in self._astream(messages, stop, run_manager, **kwargs)]
+        return self._result(chunks)
+
+    def _tokens(self):
+        words = REPLY.split(" ")
+        return [word if index == 0 else f" {word}" for index, word in enumerate(words)]
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token)
+        for token in self._tokens():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+            time.sleep(self.per_token)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token)
+        for token in self._tokens():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+            await asyncio.sleep(self.per_token)
+
+
+def turn(user_id: int) -> tuple[dict, dict]:
+    state = {
+        "messages": [HumanMessage(content="Como posso economizar mais dinheiro todo mês?")],
+        "user_id": user_id,
+        "user_name": "John Doe",
+    }
+    return state, {"configurable": {"thread_id": f"ttft-{user_id}"}}
+
+
+def first_reply_text(item, mode: str) -> bool:
+    if mode == "messages":
+        return bool(finance_manager.reply_token(*item))
+    message = item["messages"][-1]
+    return isinstance(message, AIMessage) and bool(message.content)
+
+
+def measure(mode: str, user_id: int) -> tuple[float, float]:
+    """Return the seconds to the first reply text and to the end of the turn."""
+    state, config = turn(user_id)
+    started = time.perf_counter()
+    first = None
+    for item in finance_manager.finance_agent.stream(state, config, stream_mode=mode):
+        if first is None and first_reply_text(item, mode):
+            first = time.perf_counter() - started
+    return first, time.perf_counter() - started
+
+
+async def ameasure(mode: str, user_id: int) -> tuple[float, float]:
+    """Async version of ``measure``."""
+    state, config = turn(user_id)
+    started = time.perf_counter()
+    first = None
+    async for item in finance_manager.finance_agent.astream(state, config, stream_mode=mode):
+        if first is None and first_reply_text(item, mode):
+            first = time.perf_counter() - started
+    return first, time.perf_counter() - started
+
+
+def report(mode: str, samples: list[tuple[float, float]]):
+    first = statistics.median(sample[0] for sample in samples) * 1000
+    total = statistics.median(sample[1] for sample in samples) * 1000
+    print(f"{mode:>8}: first reply text {first:8.1f} ms, full turn {total:8.1f} ms (p50)")
+
+
+if __name__ == "__main__":
+    arguments = [argument for argument in sys.argv[1:] if argument != "--async"]
+    use_async = "--async" in sys.argv[1:]
+    turns = int(arguments[0]) if arguments else 5
+
+    initialize_database()
+    initialize_messages_database()
+    finance_manager.finance_agent_graph = finance_manager.build_finance_agent_graph(
+        SlowStreamingChatModel()
+    )
+
+    print(f"turns: {turns} ({'astream' if use_async else 'stream'}), "
+          f"reply: {len(REPLY.split())} tokens")
+    for mode in ("values", "messages"):
+        samples = []
+        for index in range(turns):
+            user_id = (1 if mode == "values" else 2) * 1_000_000 + index
+            if use_async:
+                samples.append(asyncio.run(ameasure(mode, user_id)))
+            else:
+                samples.append(measure(mode, user_id))
+        report(mode, samples)
@@ -0,0 +1,102 @@
+"""
+Benchmark of the spending analytics on a single user with a large history.
+
+Builds a throwaway database with ``rows`` expenses of one user spread over five
+years and 200 categories, then times the columnar load and each NumPy step of
+``spending_report`` over the whole history, and the full report.
+
+Usage:
+    python benchmarks/expense_analytics_bench.py [rows]
+"""
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+database = os.path.join(tempfile.mkdtemp(), "expenses_bench.db")
+os.environ["EXPENSES_DB_PATH"] = database
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(absolute_path)
+from utils.expense_analytics import (
+    anomaly_scores,
+    category_totals,
+    load_expense_columns,
+    month_index,
+    month_over_month,
+    monthly_totals,
+    rolling_average,
+    spending_report
+)
+from utils.expenses_db_sqlite import create_expenses_table, pool
+
+USER_ID = 1
+BATCH_SIZE = 100_000
+FIRST_MONTH, LAST_MONTH = month_index(2021, 1), month_index(2025, 12)
+
+
+def synthetic_rows(rows):
+    rng = random.Random(42)
+    for _ in range(rows):
+        yield (
+            USER_ID,
+            f"Category {rng.randrange(200)}",
+            round(rng.lognormvariate(4, 1), 2),
+            "BRL",
+            rng.randrange(2),
+            0,
+            f"{rng.randrange(2021, 2026)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}"
+        )
+
+
+def populate(rows):
+    generator = synthetic_rows(rows)
+    with pool.connection() as conn:
+        inserted = 0
+        while inserted < rows:
+            batch = list(itertools.islice(generator, BATCH_SIZE))
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO expenses (
+                        user_id, label, value, currency, recurrent, installments, expiring_date
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    batch
+                )
+            inserted += len(batch)
+
+
+def timed(label, func, *args, repeat=3, **kwargs):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args, **kwargs)
+    print(f"{label:<22} {(time.perf_counter() - start) / repeat * 1000:10.1f} ms")
+    return result
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    create_expenses_table()
+    start = time.perf_counter()
+    populate(rows)
+    print(f"populated {rows} rows in {time.perf_counter() - start:.1f}s")
+
+    columns = timed("columnar load", load_expense_columns, USER_ID, "BRL", FIRST_MONTH, LAST_MONTH)
+    series = timed("monthly totals", monthly_totals, columns, FIRST_MONTH, LAST_MONTH)
+    timed("category totals", category_totals, columns)
+    timed("rolling average", rolling_average, series)
+    timed("month over month", month_over_month, series)
+    timed("anomaly scores", anomaly_scores, columns)
+    report = timed(
+        "spending report", spending_report, USER_ID,
+        months=LAST_MONTH - FIRST_MONTH + 1, year=2025, month=12
+    )
+
+    print(f"expenses: {report['count']}, categories: {len(report['categories'])}, "
+          f"anomalies: {len(report['anomalies'])}")
+    assert report["count"] == rows, report["count"]
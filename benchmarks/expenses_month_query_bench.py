@@ -0,0 +1,125 @@
+"""
+Benchmark of the month filter of ``get_expenses_by_month`` on a synthetic table.
+
+Builds a throwaway database with ``rows`` expenses spread over ``users`` users and
+five years of dates. The old ``strftime('%m', expiring_date)`` filter is timed on the
+old schema (no index), then the indexes are created and it is compared with the
+date-range filter backed by ``idx_expenses_user_expiring_date``.
+
+Usage:
+    python benchmarks/expenses_month_query_bench.py [rows] [users]
+"""
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+database = os.path.join(tempfile.mkdtemp(), "expenses_bench.db")
+os.environ["EXPENSES_DB_PATH"] = database
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(absolute_path)
+from utils.expenses_db_sqlite import (
+    EXPENSES_INDEXES,
+    create_expenses_table,
+    get_expenses_by_month,
+    month_date_range,
+    pool
+)
+
+OLD_QUERY = """
+    SELECT * FROM expenses
+    WHERE user_id = ? AND strftime('%m', expiring_date) = ?
+    ORDER BY expiring_date DESC
+    LIMIT 50
+"""
+NEW_QUERY = """
+    SELECT * FROM expenses
+    WHERE user_id = ? AND expiring_date >= ? AND expiring_date < ?
+    ORDER BY expiring_date DESC
+    LIMIT 50
+"""
+BATCH_SIZE = 100_000
+
+
+def synthetic_rows(rows, users):
+    rng = random.Random(42)
+    for _ in range(rows):
+        yield (
+            rng.randrange(1, users + 1),
+            "Synthetic expense",
+            round(rng.uniform(5, 500), 2),
+            "BRL",
+            rng.randrange(2),
+            0,
+            f"{rng.randrange(2021, 2026)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}"
+        )
+
+
+def populate(rows, users):
+    with pool.connection() as conn:
+        conn.execute("DROP INDEX IF EXISTS idx_expenses_user_expiring_date")
+        generator = synthetic_rows(rows, users)
+        inserted = 0
+        while inserted < rows:
+            batch = list(itertools.islice(generator, BATCH_SIZE))
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO expenses (
+                        user_id, label, value, currency, recurrent, installments, expiring_date
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    batch
+                )
+            inserted += len(batch)
+
+
+def create_indexes():
+    # Same DDL the upgrade migration runs on an existing database.
+    with pool.connection() as conn:
+        for statement in EXPENSES_INDEXES:
+            conn.execute(statement)
+        conn.execute("ANALYZE")
+
+
+def time_query(sql, params, repeat):
+    with pool.connection() as conn:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql, params).fetchall()
+        return (time.perf_counter() - start) / repeat
+
+
+def query_plan(sql, params):
+    with pool.connection() as conn:
+        return " | ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+
+    create_expenses_table()
+    start = time.perf_counter()
+    populate(rows, users)
+    print(f"populated {rows} rows for {users} users in {time.perf_counter() - start:.1f}s")
+
+    user_id, month, year = 1, 4, 2024
+    old_params = (user_id, f"{month:02d}")
+    new_params = (user_id, *month_date_range(month, year))
+
+    print(f"old schema plan: {query_plan(OLD_QUERY, old_params)}")
+    print(f"old schema, strftime filter: {time_query(OLD_QUERY, old_params, 5) * 1000:.3f} ms/query")
+
+    create_indexes()
+    new_plan = query_plan(NEW_QUERY, new_params)
+    print(f"indexed plan: {new_plan}")
+    print(f"indexed, strftime filter:    {time_query(OLD_QUERY, old_params, 20) * 1000:.3f} ms/query")
+    print(f"indexed, date range filter:  {time_query(NEW_QUERY, new_params, 20) * 1000:.3f} ms/query")
+    print(f"rows returned: {len(get_expenses_by_month(user_id, month, year))}")
+
+    assert "idx_expenses_user_expiring_date" in new_plan and "SCAN" not in new_plan, new_plan
@@ -0,0 +1,134 @@
+"""
+Latency of an agent step that calls several tools at once.
+
+Runs the ReAct finance sub-agent on a throwaway database with a scripted model
+that asks for ``search_user_monthly_income`` and ``search_expense_by_month`` in
+the same step, then answers. Each tool gets a simulated I/O latency on top of
+its real query (``LATENCIES``, e.g. a remote database or a cold disk), and the
+turn is timed:
+
+* with each tool alone;
+* with both tools, one after the other (``max_concurrency=1``);
+* with both tools run concurrently by the tool node, with ``invoke`` and ``ainvoke``.
+
+The concurrent turn should take about as long as the slowest tool alone.
+
+Usage:
+    python benchmarks/parallel_tools_bench.py [turns]
+"""
+import asyncio
+import functools
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+database = os.path.join(tempfile.mkdtemp(), "expenses_bench.db")
+os.environ["EXPENSES_DB_PATH"] = database
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import StructuredTool
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(absolute_path)
+from agent.finance_manager import build_finance_agent_graph
+from utils.expenses_db_sqlite import add_user_expenses_bulk, add_user_param, initialize_database
+from utils.tools import tools
+
+USER_ID = 1
+# Seconds added to every call of the tool.
+LATENCIES = {"search_user_monthly_income": 0.05, "search_expense_by_month": 0.12}
+
+
+class ScriptedToolCallModel(GenericFakeChatModel):
+    """Fake model replaying a fixed tool-calling step and answer on every turn."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def with_latency(tool: StructuredTool, seconds: float) -> StructuredTool:
+    @functools.wraps(tool.func)
+    def func(*args, **kwargs):
+        time.sleep(seconds)
+        return tool.func(*args, **kwargs)
+
+    @functools.wraps(tool.coroutine)
+    async def coroutine(*args, **kwargs):
+        await asyncio.sleep(seconds)
+        return await tool.coroutine(*args, **kwargs)
+
+    return StructuredTool(
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        func=func,
+        coroutine=coroutine,
+    )
+
+
+def tool_call(name: str, index: int) -> dict:
+    args = {"user_id": USER_ID}
+    if name == "search_expense_by_month":
+        args.update(month=4, year=2025)
+    return {"name": name, "args": args, "id": f"call_{index}", "type": "tool_call"}
+
+
+def agent_for(names: list[str]):
+    step = AIMessage(
+        content="", tool_calls=[tool_call(name, index) for index, name in enumerate(names)]
+    )
+    answer = AIMessage(content="Sua renda e seus gastos de abril estão acima.")
+    slowed = [with_latency(tool, LATENCIES.get(tool.name, 0.0)) for tool in tools]
+    return build_finance_agent_graph(
+        ScriptedToolCallModel(messages=itertools.cycle([step, answer])), slowed
+    )
+
+
+def state() -> dict:
+    return {
+        "messages": [HumanMessage(content="Qual minha renda e quanto gastei em abril?")],
+        "user_id": USER_ID,
+        "user_name": "John Doe",
+    }
+
+
+def timed(run, turns: int) -> float:
+    samples = []
+    for _ in range(turns):
+        started = time.perf_counter()
+        result = run()
+        samples.append(time.perf_counter() - started)
+        assert result["messages"][-1].content, "the turn did not finish"
+    return statistics.median(samples) * 1000
+
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    initialize_database()
+    add_user_param(USER_ID, {"label": "monthly_income", "value": "5000"})
+    add_user_expenses_bulk(USER_ID, [
+        {"label": f"Despesa {index}", "value": 10.0 + index, "currency": "BRL",
+         "recurrent": index % 2, "installments": 0, "expiring_date": "2025-04-10"}
+        for index in range(40)
+    ])
+
+    both = list(LATENCIES)
+    print(f"turns: {turns}, simulated latency: "
+          + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in LATENCIES.items()))
+    for name in both:
+        alone = timed(lambda agent=agent_for([name]): agent.invoke(state()), turns)
+        print(f"{name + ' alone':>44}: {alone:7.1f} ms")
+
+    agent = agent_for(both)
+    sequential = timed(lambda: agent.invoke(state(), {"max_concurrency": 1}), turns)
+    parallel = timed(lambda: agent.invoke(state()), turns)
+    gathered = timed(lambda: asyncio.run(agent.ainvoke(state())), turns)
+    print(f"{'both tools, sequential':>44}: {sequential:7.1f} ms")
+    print(f"{'both tools, concurrent (invoke)':>44}: {parallel:7.1f} ms")
+    print(f"{'both tools, concurrent (ainvoke)':>44}: {gathered:7.1f} ms")
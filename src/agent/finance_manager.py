@@ -1,16 +1,49 @@
+from langchain_core.language_models import BaseChatModel, LanguageModelLike
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+)
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.tools import BaseTool
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
+from langgraph.prebuilt import create_react_agent
 from pydantic import SecretStr
 from dotenv import load_dotenv
+import logging
 import sys
 import os
+import time
+from collections.abc import Sequence
 
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(parent_dir)
+from utils.checkpointer import SQLiteCheckpointSaver
+from utils.context_window import (
+    aarchive_compaction,
+    acompact_context,
+    archive_compaction,
+    compact_context,
+)
+from utils.expenses_db_sqlite import aget_user_data_version, get_user_data_version
+from utils.intent_router import INTENT_AGENT, aanswer_intent, answer_intent, classify_intent
+from utils.memory import aretrieve_memory, retrieve_memory
+from utils.response_cache import (
+    INTENT_CACHED,
+    acache_response,
+    afind_cached_response,
+    cache_response,
+    cacheable,
+    find_cached_response,
+)
 from utils.tools import tools
-from utils.schemas import State
+from utils.schemas import NEW_TURN, FinanceAgentState, State
 load_dotenv()
+logger = logging.getLogger(__name__)
 openai_api_key = SecretStr(os.getenv("OPENAI_API_KEY") or "")
 
 system_prompt_template = """
@@ -33,6 +66,11 @@ The messages history is:
 {messages}
 </messages_history>
 
+The summary of the earlier part of this conversation is:
+<conversation_summary>
+{summary}
+</conversation_summary>
+
 Follow these guidelines to provide the best possible assistance:
 
 1. Language Adaptation:
@@ -96,41 +134,379 @@ llm = ChatOpenAI(
 ) #type: ignore
 
 
-def agent_node(state: State):
-    """Agent node in the workflow graph."""
-    from langgraph.prebuilt import create_react_agent
-    from langchain_core.prompts import ChatPromptTemplate
-    
-    # Create a dynamic system prompt with user information
+def finance_agent_prompt(state: FinanceAgentState) -> list[BaseMessage]:
+    """Render the system prompt for the current user at invoke time."""
     dynamic_system_prompt = system_prompt_template.format(
         user_name=state.get("user_name", ""),
         user_id=state.get("user_id", ""),
-        messages=""  # Will be handled by the agent automatically
+        messages=state.get("memory", ""),
+        summary=state.get("summary", "")
     )
-    
-    # Create a proper prompt template
-    prompt_template = ChatPromptTemplate.from_messages([
-		("system", dynamic_system_prompt),
-		("placeholder", "{messages}")
-    ])
-    
-    finance_agent_graph = create_react_agent(
-        model=llm,
-        tools=tools,
-        prompt=prompt_template,
+    return [SystemMessage(content=dynamic_system_prompt), *state["messages"]]
+
+
+def build_finance_agent_graph(
+    model: LanguageModelLike = llm, agent_tools: Sequence[BaseTool] = tools
+):
+    """
+    Build the compiled ReAct finance sub-agent.
+
+    The graph does not depend on the user: ``user_name`` and ``user_id`` travel in
+    the state and are rendered by ``finance_agent_prompt`` on every model call, so a
+    single compiled instance can serve all users.
+
+    The model may ask for several tools in one step (e.g. the monthly income and a
+    month's expenses); the tool node then runs them concurrently, in a thread pool
+    with ``invoke`` (bounded by the ``max_concurrency`` of the run config) or with
+    ``asyncio.gather`` with ``ainvoke``, so the step takes about as long as its
+    slowest tool. The tools are safe to run concurrently: every call checks its own
+    connection out of the database pool.
+    """
+    if isinstance(model, BaseChatModel):
+        model = model.bind_tools(agent_tools, parallel_tool_calls=True)
+    return create_react_agent(
+        model=model,
+        tools=agent_tools,
+        prompt=finance_agent_prompt,
+        state_schema=FinanceAgentState,
+        # The ReAct loop is rebuilt from the outer state on every turn; only the
+        # outer graph is checkpointed.
+        checkpointer=False,
     )
-    result = finance_agent_graph.invoke(state)
+
+
+finance_agent_graph = build_finance_agent_graph()
+
+
+def last_user_message(messages: list) -> str:
+    """Text of the latest human message, used as the memory search query."""
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return message.content if isinstance(message.content, str) else ""
+    return ""
+
+
+def memory_node(state: State):
+    """
+    Memory node: load the user's recent and related past messages into ``memory``.
+
+    A failure here must not cost the user an answer, so the agent then runs
+    without memory.
+    """
+    try:
+        memory = retrieve_memory(
+            state["user_id"], last_user_message(state["messages"]), model=llm.model_name
+        )
+    except Exception:
+        logger.exception("failed to retrieve conversation memory")
+        return {"memory": ""}
+    return {"memory": memory.text, "timings": memory.timings}
+
+
+async def amemory_node(state: State):
+    """Async memory node, fetching both memory sources concurrently."""
+    try:
+        memory = await aretrieve_memory(
+            state["user_id"], last_user_message(state["messages"]), model=llm.model_name
+        )
+    except Exception:
+        logger.exception("failed to retrieve conversation memory")
+        return {"memory": ""}
+    return {"memory": memory.text, "timings": memory.timings}
+
+
+# Writes the rolling summary of the turns trimmed from the context window.
+summary_model = llm
+
+
+def _compaction_update(compaction, started: float) -> dict:
+    return {
+        "messages": [RemoveMessage(id=message.id) for message in compaction.messages],
+        "summary": compaction.summary,
+        "timings": {"context_compaction_ms": round((time.perf_counter() - started) * 1000, 2)},
+    }
+
+
+def compact_context_node(state: State):
+    """
+    Context node: keep the last turns verbatim within the token budget and fold the
+    older ones into ``summary``. The trimmed messages are archived in the messages
+    database with the summary as their topic.
+    """
+    started = time.perf_counter()
+    try:
+        compaction = compact_context(
+            state["messages"], state.get("summary", ""), summary_model,
+            token_model=llm.model_name
+        )
+        if compaction is None:
+            return {}
+        archive_compaction(state["user_id"], compaction)
+    except Exception:
+        logger.exception("failed to compact the conversation context")
+        return {}
+    return _compaction_update(compaction, started)
+
+
+async def acompact_context_node(state: State):
+    """Async context node."""
+    started = time.perf_counter()
+    try:
+        compaction = await acompact_context(
+            state["messages"], state.get("summary", ""), summary_model,
+            token_model=llm.model_name
+        )
+        if compaction is None:
+            return {}
+        await aarchive_compaction(state["user_id"], compaction)
+    except Exception:
+        logger.exception("failed to compact the conversation context")
+        return {}
+    return _compaction_update(compaction, started)
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def _classify(state: State):
+    started = time.perf_counter()
+    match = classify_intent(last_user_message(state["messages"]))
+    return match, {NEW_TURN: 0.0, "intent_classification_ms": _elapsed_ms(started)}
+
+
+def _routed_update(match, reply: str, started: float, timings: dict) -> dict:
+    route_ms = _elapsed_ms(started)
+    logger.info("answered %s intent without the agent in %.1f ms", match.intent, route_ms)
+    return {
+        "messages": [AIMessage(content=reply)],
+        "intent": match.intent,
+        "timings": {**timings, f"route_{match.intent}_ms": route_ms},
+    }
+
+
+def route_intent_node(state: State):
+    """
+    Router node: answer lookups such as the monthly income or a month's total with
+    their tool and a templated reply, skipping memory retrieval and the LLM.
+
+    Anything the router is not confident about, or fails to answer, goes to the agent.
+    """
+    started = time.perf_counter()
+    match, timings = _classify(state)
+    if match.intent != INTENT_AGENT:
+        try:
+            reply = answer_intent(match, state["user_id"])
+        except Exception:
+            logger.exception("failed to answer the %s intent, using the agent", match.intent)
+        else:
+            return _routed_update(match, reply, started, timings)
+    return {"intent": INTENT_AGENT, "timings": timings}
+
+
+async def aroute_intent_node(state: State):
+    """Async router node."""
+    started = time.perf_counter()
+    match, timings = _classify(state)
+    if match.intent != INTENT_AGENT:
+        try:
+            reply = await aanswer_intent(match, state["user_id"])
+        except Exception:
+            logger.exception("failed to answer the %s intent, using the agent", match.intent)
+        else:
+            return _routed_update(match, reply, started, timings)
+    return {"intent": INTENT_AGENT, "timings": timings}
+
+
+def next_after_routing(state: State) -> str:
+    return "check_response_cache" if state.get("intent") == INTENT_AGENT else END
+
+
+def _cache_lookup_update(reply, version, started: float) -> dict:
+    if reply is None:
+        return {
+            "data_version": version,
+            "timings": {"response_cache_lookup_ms": _elapsed_ms(started)},
+        }
+    route_ms = _elapsed_ms(started)
+    logger.info("answered from the response cache in %.1f ms", route_ms)
+    return {
+        "messages": [AIMessage(content=reply)],
+        "intent": INTENT_CACHED,
+        "timings": {f"route_{INTENT_CACHED}_ms": route_ms},
+    }
+
+
+def _standalone_query(state: State) -> str:
+    """
+    The user's message when it opens its thread, "" otherwise. A message following
+    earlier turns or a summary may depend on them ("and what about in May?"), so its
+    answer is neither served from nor written to the cache.
+    """
+    if state.get("summary"):
+        return ""
+    if sum(isinstance(message, HumanMessage) for message in state["messages"]) != 1:
+        return ""
+    return last_user_message(state["messages"])
+
+
+def response_cache_node(state: State):
+    """
+    Response cache node: reuse the answer to a close enough earlier question of the
+    user, as long as their expenses and parameters did not change since. Only the
+    first message of a thread is looked up, see ``_standalone_query``.
+
+    The data version read here is kept in the state, so the agent's answer is cached
+    against the data it was computed from. A failing cache is skipped.
+    """
+    started = time.perf_counter()
+    query = _standalone_query(state)
+    if not cacheable(query):
+        return {"data_version": None}
+    try:
+        version = get_user_data_version(state["user_id"])
+        reply = find_cached_response(state["user_id"], query, version)
+    except Exception:
+        logger.exception("failed to look up the response cache")
+        return {"data_version": None}
+    return _cache_lookup_update(reply, version, started)
+
+
+async def aresponse_cache_node(state: State):
+    """Async response cache node."""
+    started = time.perf_counter()
+    query = _standalone_query(state)
+    if not cacheable(query):
+        return {"data_version": None}
+    try:
+        version = await aget_user_data_version(state["user_id"])
+        reply = await afind_cached_response(state["user_id"], query, version)
+    except Exception:
+        logger.exception("failed to look up the response cache")
+        return {"data_version": None}
+    return _cache_lookup_update(reply, version, started)
+
+
+def next_after_cache(state: State) -> str:
+    return END if state.get("intent") == INTENT_CACHED else "retrieve_memory"
+
+
+def _cacheable_answer(state: State) -> str:
+    answer = state["messages"][-1]
+    if state.get("data_version") is None or not isinstance(answer, AIMessage):
+        return ""
+    return answer.content if isinstance(answer.content, str) else ""
+
+
+def store_response_node(state: State):
+    """
+    Store the agent's answer in the response cache. Answers of turns whose tools
+    changed the user's data are not stored: they would never be valid again.
+    """
+    answer = _cacheable_answer(state)
+    if not answer:
+        return {}
+    try:
+        if get_user_data_version(state["user_id"]) == state["data_version"]:
+            cache_response(
+                state["user_id"], last_user_message(state["messages"]), answer,
+                state["data_version"]
+            )
+    except Exception:
+        logger.exception("failed to store the answer in the response cache")
+    return {}
+
+
+async def astore_response_node(state: State):
+    """Async version of ``store_response_node``."""
+    answer = _cacheable_answer(state)
+    if not answer:
+        return {}
+    try:
+        if await aget_user_data_version(state["user_id"]) == state["data_version"]:
+            await acache_response(
+                state["user_id"], last_user_message(state["messages"]), answer,
+                state["data_version"]
+            )
+    except Exception:
+        logger.exception("failed to store the answer in the response cache")
+    return {}
+
+
+def agent_node(state: State, config: RunnableConfig):
+    """
+    Agent node in the workflow graph.
+
+    The run config is passed on to the ReAct agent, so its callbacks reach the
+    model: with ``stream_mode="messages"`` the reply streams token by token out of
+    ``finance_agent`` instead of arriving once the whole tool loop is done.
+    """
+    started = time.perf_counter()
+    result = finance_agent_graph.invoke(state, config)
+    agent_response = result['messages'][-1]
+
+    return {
+        "messages": add_messages(state["messages"], [agent_response]),
+        "timings": {f"route_{INTENT_AGENT}_ms": _elapsed_ms(started)},
+    }
+
+
+async def aagent_node(state: State, config: RunnableConfig):
+    """Async agent node, so ``finance_agent.ainvoke``/``astream`` run the async tools."""
+    started = time.perf_counter()
+    result = await finance_agent_graph.ainvoke(state, config)
     agent_response = result['messages'][-1]
 
     return {
         "messages": add_messages(state["messages"], [agent_response]),
+        "timings": {f"route_{INTENT_AGENT}_ms": _elapsed_ms(started)},
     }
 
 
+# Nodes whose messages make up the reply; compact_context streams the summary model's
+# tokens and the agent's "tools" node its tool results, which are not shown.
+REPLY_NODES = frozenset({"route_intent", "check_response_cache", "agent"})
+
+
+def reply_token(message, metadata: dict) -> str:
+    """
+    Text of the reply carried by an item of ``finance_agent.stream(...,
+    stream_mode="messages")``: a model token of the agent, or the whole answer of
+    the router or the response cache. Returns "" for everything else.
+    """
+    if metadata.get("langgraph_node") not in REPLY_NODES or not isinstance(message, AIMessage):
+        return ""
+    return message.content if isinstance(message.content, str) else ""
+
+
 workflow = StateGraph(State)
-workflow.add_node("agent", agent_node)
-workflow.set_entry_point("agent")
-workflow.add_edge("agent", END)
+workflow.add_node("route_intent", RunnableLambda(route_intent_node, afunc=aroute_intent_node))
+workflow.add_node(
+    "check_response_cache", RunnableLambda(response_cache_node, afunc=aresponse_cache_node)
+)
+workflow.add_node("retrieve_memory", RunnableLambda(memory_node, afunc=amemory_node))
+workflow.add_node(
+    "compact_context", RunnableLambda(compact_context_node, afunc=acompact_context_node)
+)
+workflow.add_node("agent", RunnableLambda(agent_node, afunc=aagent_node))
+workflow.add_node(
+    "store_response", RunnableLambda(store_response_node, afunc=astore_response_node)
+)
+workflow.set_entry_point("route_intent")
+workflow.add_conditional_edges(
+    "route_intent", next_after_routing, ["check_response_cache", END]
+)
+workflow.add_conditional_edges(
+    "check_response_cache", next_after_cache, ["retrieve_memory", END]
+)
+workflow.add_edge("retrieve_memory", "compact_context")
+workflow.add_edge("compact_context", "agent")
+workflow.add_edge("agent", "store_response")
+workflow.add_edge("store_response", END)
+
+# Conversation threads are persisted, so each call only sends the new message:
+# finance_agent.invoke(state, {"configurable": {"thread_id": ...}})
+checkpointer = SQLiteCheckpointSaver(os.getenv("CHECKPOINTS_DB_PATH", "checkpoints.db"))
 
 # Compile the workflow
-finance_agent = workflow.compile()
+finance_agent = workflow.compile(checkpointer=checkpointer)
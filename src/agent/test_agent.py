@@ -2,34 +2,38 @@ from langchain_core.messages import HumanMessage
 from dotenv import load_dotenv
 import sys
 import os
+import uuid
 
 load_dotenv()
 # Add the parent directory to the path
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(parent_dir)
-from agent.finance_manager import finance_agent
+from agent.finance_manager import finance_agent, reply_token
 
 def print_stream(stream):
-    for s in stream:
-        message = s["messages"][-1]
-        if isinstance(message, tuple):
-            print(message)
-        else:
-            message.pretty_print()
+    """Print the reply token by token, as ``stream_mode="messages"`` yields it."""
+    print("Assistant: ", end="", flush=True)
+    for message, metadata in stream:
+        print(reply_token(message, metadata), end="", flush=True)
+    print()
 
 if __name__ == "__main__":
     # Initialize the databases
     # initialize_database()
     # initialize_messages_database()
+    # The thread's history is kept by the checkpointer: each turn sends only the new
+    # message. Pass a thread id as argument to resume a previous conversation.
+    thread_id = sys.argv[1] if len(sys.argv) > 1 else f"cli-{uuid.uuid4()}"
+    config = {"configurable": {"thread_id": thread_id}}
+    print("Thread:", thread_id)
     while True:
         user_input = input("User: ")
         if user_input.lower() == "exit":
             break
 
         agent_state = {
-            "messages": [],
+            "messages": [HumanMessage(content=user_input)],
             "user_id": 123,
             "user_name": "John Doe",
         }
-        agent_state["messages"].append(HumanMessage(content=user_input))
-        print_stream(finance_agent.stream(agent_state, stream_mode="values"))
+        print_stream(finance_agent.stream(agent_state, config, stream_mode="messages"))
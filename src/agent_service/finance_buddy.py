@@ -0,0 +1,101 @@
+import asyncio
+import os
+import sys
+from collections.abc import AsyncIterator, Sequence
+from typing import Any, Optional
+
+from langchain_core.messages import HumanMessage
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+
+class FinanceBuddy:
+    """
+    Async facade of ``finance_agent`` for the HTTP service.
+
+    A conversation is a checkpointed thread: each turn only sends the new messages,
+    the history is restored by the graph. The reply is streamed token by token with
+    ``stream_mode="messages"``, see ``reply_token``.
+
+    Args:
+        agent: Compiled finance graph; defaults to ``finance_agent``. The agent
+            module is imported on construction, not with this module.
+    """
+
+    def __init__(self, agent: Optional[Any] = None):
+        from agent.finance_manager import finance_agent, reply_token
+        self.agent = agent if agent is not None else finance_agent
+        self._reply_token = reply_token
+        self.ready = False
+
+    @staticmethod
+    def thread_id(user_id: int, thread_id: Optional[str] = None) -> str:
+        """
+        Checkpoint thread of the conversation: ``user-<id>`` by default, or the
+        client's ``thread_id`` under that prefix, so a user can never resume another
+        user's thread. IDs already under the user's prefix are returned unchanged.
+        """
+        default = f"user-{int(user_id)}"
+        if not thread_id or thread_id == default or thread_id.startswith(f"{default}:"):
+            return thread_id or default
+        return f"{default}:{thread_id}"
+
+    async def initialize(self):
+        """Create the expenses and messages schemas, then mark the buddy ready."""
+        from utils.expenses_db_sqlite import initialize_database
+        from utils.messages_db_sqlite import initialize_messages_database
+        await asyncio.to_thread(initialize_database)
+        await asyncio.to_thread(initialize_messages_database)
+        self.ready = True
+
+    async def close(self):
+        """Write the pending message embeddings and close the databases."""
+        from utils.messages_db_sqlite import close_connections, flush_message_embeddings
+        self.ready = False
+        await asyncio.to_thread(flush_message_embeddings)
+        await asyncio.to_thread(close_connections)
+
+    async def stream_reply(
+        self,
+        user_id: int,
+        messages: Sequence[str],
+        thread_id: Optional[str] = None,
+        user_name: str = ""
+    ) -> AsyncIterator[str]:
+        """
+        Run one turn of the conversation and yield the reply as it is generated.
+
+        The new messages are sent as a single human message, one per line, so the
+        intent router, the response cache and the memory search read all of them
+        instead of only the last one.
+
+        Args:
+            user_id: ID of the user.
+            messages: The user's new messages, answered together in one turn.
+            thread_id: Conversation thread, see ``thread_id``.
+            user_name: Name used to greet the user.
+        """
+        state = {
+            "messages": [HumanMessage(content="\n".join(messages))],
+            "user_id": int(user_id),
+            "user_name": user_name,
+        }
+        config = {"configurable": {"thread_id": self.thread_id(user_id, thread_id)}}
+        async for message, metadata in self.agent.astream(state, config, stream_mode="messages"):
+            token = self._reply_token(message, metadata)
+            if token:
+                yield token
+
+    async def reply(
+        self,
+        user_id: int,
+        messages: Sequence[str],
+        thread_id: Optional[str] = None,
+        user_name: str = ""
+    ) -> str:
+        """Run one turn of the conversation and return the whole reply."""
+        tokens = [
+            token async for token in self.stream_reply(user_id, messages, thread_id, user_name)
+        ]
+        return "".join(tokens)
@@ -0,0 +1,325 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+from typing import Any, Optional
+
+from aiohttp import web
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+from agent_service.finance_buddy import FinanceBuddy
+
+logger = logging.getLogger(__name__)
+
+AGENT_SERVICE_HOST = os.getenv("AGENT_SERVICE_HOST", "127.0.0.1")
+AGENT_SERVICE_PORT = int(os.getenv("AGENT_SERVICE_PORT", "8080"))
+# Agent turns running at the same time.
+AGENT_SERVICE_WORKERS = int(os.getenv("AGENT_SERVICE_WORKERS", "8"))
+# Turns waiting for a worker; further requests are rejected with 429.
+AGENT_SERVICE_QUEUE_SIZE = int(os.getenv("AGENT_SERVICE_QUEUE_SIZE", "64"))
+# Largest number of waiting messages of one thread answered together in one turn.
+AGENT_SERVICE_MAX_BATCH = int(os.getenv("AGENT_SERVICE_MAX_BATCH", "8"))
+# Seconds a rejected client is asked to wait before retrying.
+AGENT_SERVICE_RETRY_AFTER = int(os.getenv("AGENT_SERVICE_RETRY_AFTER", "1"))
+
+
+class QueueFullError(Exception):
+    """Raised when a turn cannot be queued because the service is saturated."""
+
+
+class Turn:
+    """
+    One agent turn of a conversation thread: the user's messages answered together
+    and the queues of the requests waiting for its reply. Each queue receives
+    ``("token", text)`` events, then ``("done", None)`` or ``("error", message)``.
+    """
+
+    def __init__(self, user_id: int, thread_id: str, user_name: str, message: str):
+        self.user_id = user_id
+        self.thread_id = thread_id
+        self.user_name = user_name
+        self.messages = [message]
+        self.subscribers: list[asyncio.Queue] = []
+        self.queued = False
+
+    def subscribe(self) -> asyncio.Queue:
+        subscriber: asyncio.Queue = asyncio.Queue()
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def publish(self, kind: str, value: Optional[str] = None):
+        for subscriber in self.subscribers:
+            subscriber.put_nowait((kind, value))
+
+
+class TurnScheduler:
+    """
+    Runs agent turns on a fixed number of workers fed by a bounded queue.
+
+    A thread runs one turn at a time, so its checkpoint is never written by two
+    turns at once. Messages sent to a thread while its turn is waiting are batched
+    into that turn (up to ``max_batch``): the agent answers them together with one
+    model round trip and every request receives the same streamed reply. Messages
+    sent while the thread's turn is running form its next turn, which the same
+    worker runs as soon as the current one ends.
+
+    ``submit`` never waits: when the queue is full it raises ``QueueFullError``,
+    so a saturated service answers 429 instead of piling up requests.
+
+    Args:
+        buddy: Runs the turns, see ``FinanceBuddy``.
+        workers: Turns running at the same time.
+        queue_size: Turns waiting for a worker.
+        max_batch: Messages answered together in one turn.
+    """
+
+    def __init__(self, buddy: FinanceBuddy, workers: int, queue_size: int, max_batch: int):
+        if workers < 1 or queue_size < 1 or max_batch < 1:
+            raise ValueError("workers, queue_size and max_batch must be at least 1")
+        self.buddy = buddy
+        self.workers = workers
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue[Turn] = asyncio.Queue(maxsize=queue_size)
+        # Next turn of each thread that has not started yet.
+        self._pending: dict[str, Turn] = {}
+        self._running: set[str] = set()
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"agent-worker-{number}")
+            for number in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "workers": sum(not task.done() for task in self._tasks),
+            "running": len(self._running),
+            "queued": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+        }
+
+    def submit(self, user_id: int, thread_id: str, user_name: str, message: str) -> asyncio.Queue:
+        """Schedule ``message`` and return the queue its reply is streamed to."""
+        turn = self._pending.get(thread_id)
+        if turn is not None and len(turn.messages) < self.max_batch:
+            turn.messages.append(message)
+            return turn.subscribe()
+        if turn is not None:
+            raise QueueFullError(f"thread {thread_id} has {self.max_batch} waiting messages")
+
+        turn = Turn(user_id, thread_id, user_name, message)
+        if thread_id not in self._running:
+            try:
+                self._queue.put_nowait(turn)
+            except asyncio.QueueFull:
+                raise QueueFullError("the agent queue is full") from None
+            turn.queued = True
+        self._pending[thread_id] = turn
+        return turn.subscribe()
+
+    async def _work(self):
+        while True:
+            turn: Optional[Turn] = await self._queue.get()
+            try:
+                while turn is not None:
+                    turn = await self._run(turn)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, turn: Turn) -> Optional[Turn]:
+        """Run ``turn`` and return the thread's next turn if it is not queued."""
+        if self._pending.get(turn.thread_id) is turn:
+            del self._pending[turn.thread_id]
+        self._running.add(turn.thread_id)
+        try:
+            async for token in self.buddy.stream_reply(
+                turn.user_id, turn.messages, turn.thread_id, turn.user_name
+            ):
+                turn.publish("token", token)
+            turn.publish("done")
+        except Exception:
+            logger.exception("agent turn of thread %s failed", turn.thread_id)
+            turn.publish("error", "the agent failed to answer")
+        finally:
+            self._running.discard(turn.thread_id)
+        follow_up = self._pending.get(turn.thread_id)
+        return follow_up if follow_up is not None and not follow_up.queued else None
+
+
+buddy_key = web.AppKey("buddy", FinanceBuddy)
+scheduler_key = web.AppKey("scheduler", TurnScheduler)
+
+
+def _error(status: int, message: str, **headers: str) -> web.Response:
+    return web.json_response({"error": message}, status=status, headers=headers)
+
+
+def _rejected(error: QueueFullError) -> web.Response:
+    return _error(429, str(error), **{"Retry-After": str(AGENT_SERVICE_RETRY_AFTER)})
+
+
+async def _read_chat_request(request: web.Request) -> dict[str, Any]:
+    """Validate a chat request body, raising ``ValueError`` with the problem."""
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise ValueError("the body must be a JSON object") from None
+    if not isinstance(body, dict):
+        raise ValueError("the body must be a JSON object")
+    user_id = body.get("user_id")
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        raise ValueError("user_id must be an integer")
+    message = body.get("message")
+    if not isinstance(message, str) or not message.strip():
+        raise ValueError("message must be a non-empty string")
+    thread_id = body.get("thread_id")
+    if thread_id is not None and not isinstance(thread_id, str):
+        raise ValueError("thread_id must be a string")
+    return {
+        "user_id": user_id,
+        "thread_id": FinanceBuddy.thread_id(user_id, thread_id),
+        "user_name": str(body.get("user_name") or ""),
+        "message": message,
+    }
+
+
+async def _submit(request: web.Request) -> tuple[dict[str, Any], asyncio.Queue]:
+    chat = await _read_chat_request(request)
+    events = request.app[scheduler_key].submit(
+        chat["user_id"], chat["thread_id"], chat["user_name"], chat["message"]
+    )
+    return chat, events
+
+
+async def chat(request: web.Request) -> web.Response:
+    """
+    ``POST /v1/chat`` with ``{"user_id", "message", "thread_id"?, "user_name"?}``:
+    answer once the whole reply is ready, as ``{"thread_id", "reply"}``.
+    """
+    try:
+        chat_request, events = await _submit(request)
+    except ValueError as error:
+        return _error(400, str(error))
+    except QueueFullError as error:
+        return _rejected(error)
+
+    tokens = []
+    while True:
+        kind, value = await events.get()
+        if kind == "token":
+            tokens.append(value)
+        elif kind == "error":
+            return _error(500, value)
+        else:
+            return web.json_response(
+                {"thread_id": chat_request["thread_id"], "reply": "".join(tokens)}
+            )
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+
+
+async def chat_stream(request: web.Request) -> web.StreamResponse:
+    """
+    ``POST /v1/chat/stream``: same body as ``/v1/chat``, the reply is sent as
+    server-sent events: ``token`` events with ``{"text"}`` as it is generated,
+    then ``done`` with ``{"thread_id"}`` or ``error`` with ``{"error"}``.
+    """
+    try:
+        chat_request, events = await _submit(request)
+    except ValueError as error:
+        return _error(400, str(error))
+    except QueueFullError as error:
+        return _rejected(error)
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    await response.prepare(request)
+    while True:
+        kind, value = await events.get()
+        if kind == "token":
+            await response.write(_sse("token", {"text": value}))
+        elif kind == "error":
+            await response.write(_sse("error", {"error": value}))
+            break
+        else:
+            await response.write(_sse("done", {"thread_id": chat_request["thread_id"]}))
+            break
+    await response.write_eof()
+    return response
+
+
+async def health(request: web.Request) -> web.Response:
+    """``GET /healthz``: the process is up."""
+    return web.json_response({"status": "ok"})
+
+
+async def ready(request: web.Request) -> web.Response:
+    """
+    ``GET /readyz``: 200 when the databases are initialized, every worker is alive
+    and the queue can take a turn, 503 otherwise.
+    """
+    stats = request.app[scheduler_key].stats()
+    is_ready = (
+        request.app[buddy_key].ready
+        and stats["workers"] == request.app[scheduler_key].workers
+        and stats["queued"] < stats["queue_size"]
+    )
+    return web.json_response(
+        {"status": "ready" if is_ready else "unavailable", **stats},
+        status=200 if is_ready else 503
+    )
+
+
+def create_app(
+    buddy: Optional[FinanceBuddy] = None,
+    workers: int = AGENT_SERVICE_WORKERS,
+    queue_size: int = AGENT_SERVICE_QUEUE_SIZE,
+    max_batch: int = AGENT_SERVICE_MAX_BATCH
+) -> web.Application:
+    """
+    Build the HTTP application serving ``finance_agent``.
+
+    Args:
+        buddy: Runs the agent turns; defaults to a ``FinanceBuddy`` over ``finance_agent``.
+        workers: Agent turns running at the same time.
+        queue_size: Turns waiting for a worker before requests get 429.
+        max_batch: Waiting messages of one thread answered together in one turn.
+    """
+    app = web.Application()
+    app[buddy_key] = buddy if buddy is not None else FinanceBuddy()
+    app[scheduler_key] = TurnScheduler(app[buddy_key], workers, queue_size, max_batch)
+
+    async def startup(app: web.Application):
+        await app[buddy_key].initialize()
+        app[scheduler_key].start()
+
+    async def cleanup(app: web.Application):
+        await app[scheduler_key].stop()
+        await app[buddy_key].close()
+
+    app.on_startup.append(startup)
+    app.on_cleanup.append(cleanup)
+    app.router.add_post("/v1/chat", chat)
+    app.router.add_post("/v1/chat/stream", chat_stream)
+    app.router.add_get("/healthz", health)
+    app.router.add_get("/readyz", ready)
+    return app
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(create_app(), host=AGENT_SERVICE_HOST, port=AGENT_SERVICE_PORT)
@@ -1,37 +1,110 @@
-from .expenses_db_sqlite import (
-    create_expenses_table,
-    create_user_table,
-    create_user_params_table,
-    get_user_monthly_income,
-    get_recent_user_expenses,
-    get_expenses_by_month,
-    add_user_expense,
-    add_user,
-    add_user_param
-)
-from .messages_db_sqlite import (
-    create_conversations_table,
-    add_message_with_embedding,
-    get_recent_conversations,
-    find_similar_messages_for_user,
-    find_recent_similar_messages_by_date,
-    find_similar_messages_by_topic
-)
+import importlib
+
+# Public functions and their modules. They are imported on first access (PEP 562), so
+# ``from src.utils import get_user_monthly_income`` does not load the messages module,
+# the sqlite-vss extension or an embeddings client.
+_EXPORTS = {
+    "create_expenses_table": "expenses_db_sqlite",
+    "create_user_table": "expenses_db_sqlite",
+    "create_user_params_table": "expenses_db_sqlite",
+    "initialize_database": "expenses_db_sqlite",
+    "migrate_database": "expenses_db_sqlite",
+    "get_user_param": "expenses_db_sqlite",
+    "get_user_monthly_income": "expenses_db_sqlite",
+    "get_recent_user_expenses": "expenses_db_sqlite",
+    "get_expenses_by_month": "expenses_db_sqlite",
+    "get_monthly_expense_totals": "expenses_db_sqlite",
+    "get_user_data_version": "expenses_db_sqlite",
+    "add_user_expense": "expenses_db_sqlite",
+    "add_user_expenses_bulk": "expenses_db_sqlite",
+    "add_user": "expenses_db_sqlite",
+    "add_user_param": "expenses_db_sqlite",
+    "aget_user_param": "expenses_db_sqlite",
+    "aget_user_monthly_income": "expenses_db_sqlite",
+    "aget_recent_user_expenses": "expenses_db_sqlite",
+    "aget_expenses_by_month": "expenses_db_sqlite",
+    "aget_monthly_expense_totals": "expenses_db_sqlite",
+    "aget_user_data_version": "expenses_db_sqlite",
+    "aadd_user_expense": "expenses_db_sqlite",
+    "aadd_user_expenses_bulk": "expenses_db_sqlite",
+    "aadd_user": "expenses_db_sqlite",
+    "aadd_user_param": "expenses_db_sqlite",
+    "Expense": "expenses_db_sqlite",
+    "serialize_expenses": "expenses_db_sqlite",
+    "spending_report": "expense_analytics",
+    "expense_to_income_report": "expense_analytics",
+    "aspending_report": "expense_analytics",
+    "aexpense_to_income_report": "expense_analytics",
+    "create_conversations_table": "messages_db_sqlite",
+    "add_message_with_embedding": "messages_db_sqlite",
+    "flush_message_embeddings": "messages_db_sqlite",
+    "get_recent_conversations": "messages_db_sqlite",
+    "find_similar_messages_for_user": "messages_db_sqlite",
+    "find_recent_similar_messages_by_date": "messages_db_sqlite",
+    "find_similar_messages_by_topic": "messages_db_sqlite",
+    "aadd_message_with_embedding": "messages_db_sqlite",
+    "aget_recent_conversations": "messages_db_sqlite",
+    "afind_similar_messages_for_user": "messages_db_sqlite",
+    "afind_recent_similar_messages_by_date": "messages_db_sqlite",
+    "afind_similar_messages_by_topic": "messages_db_sqlite",
+}
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *_EXPORTS])
+
 
 __all__ = [
     "create_expenses_table",
     "create_user_table",
     "create_user_params_table",
+    "initialize_database",
+    "migrate_database",
+    "get_user_param",
     "get_user_monthly_income",
     "get_recent_user_expenses",
     "get_expenses_by_month",
+    "get_monthly_expense_totals",
+    "get_user_data_version",
     "add_user_expense",
+    "add_user_expenses_bulk",
     "add_user",
     "add_user_param",
+    "aget_user_param",
+    "aget_user_monthly_income",
+    "aget_recent_user_expenses",
+    "aget_expenses_by_month",
+    "aget_monthly_expense_totals",
+    "aget_user_data_version",
+    "aadd_user_expense",
+    "aadd_user_expenses_bulk",
+    "aadd_user",
+    "aadd_user_param",
+    "Expense",
+    "serialize_expenses",
+    "spending_report",
+    "expense_to_income_report",
+    "aspending_report",
+    "aexpense_to_income_report",
     "create_conversations_table",
     "add_message_with_embedding",
+    "flush_message_embeddings",
     "get_recent_conversations",
     "find_similar_messages_for_user",
     "find_recent_similar_messages_by_date",
-    "find_similar_messages_by_topic"
+    "find_similar_messages_by_topic",
+    "aadd_message_with_embedding",
+    "aget_recent_conversations",
+    "afind_similar_messages_for_user",
+    "afind_recent_similar_messages_by_date",
+    "afind_similar_messages_by_topic"
 ]
@@ -0,0 +1,370 @@
+import random
+import threading
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.types import TASKS, ChannelProtocol
+
+from .db_executor import DBExecutor
+from .sqlite_pool import SQLiteConnectionPool
+
+CHECKPOINT_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS checkpoints (
+        thread_id TEXT,
+        checkpoint_ns TEXT DEFAULT '',
+        checkpoint_id TEXT,
+        parent_checkpoint_id TEXT,
+        type TEXT,
+        checkpoint BLOB,
+        metadata_type TEXT,
+        metadata BLOB,
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+        thread_id TEXT,
+        checkpoint_ns TEXT DEFAULT '',
+        channel TEXT,
+        version TEXT,
+        type TEXT,
+        blob BLOB,
+        PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS checkpoint_writes (
+        thread_id TEXT,
+        checkpoint_ns TEXT DEFAULT '',
+        checkpoint_id TEXT,
+        task_id TEXT,
+        idx INTEGER,
+        channel TEXT,
+        type TEXT,
+        blob BLOB,
+        task_path TEXT DEFAULT '',
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+    )
+    """,
+]
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpointer persisting conversation threads in SQLite.
+
+    Compile a graph with it and pass ``{"configurable": {"thread_id": ...}}`` on each
+    call: the thread's state is loaded from the database, so a turn only needs the
+    new message. Values go through LangGraph's ``JsonPlusSerializer``, which stores
+    them as msgpack (``ormsgpack``).
+
+    Each channel value is stored once per version in ``checkpoint_blobs``, and a
+    checkpoint only references the versions it uses, so a long conversation is not
+    rewritten on every step. Connections come from a WAL ``SQLiteConnectionPool`` and
+    the async methods run on a ``DBExecutor``.
+
+    Args:
+        database: Path of the SQLite file.
+        pool_size: Maximum number of pooled connections.
+        serde: Serializer; defaults to ``JsonPlusSerializer``.
+    """
+
+    def __init__(
+        self,
+        database: str = "checkpoints.db",
+        pool_size: int = 4,
+        *,
+        serde: Optional[SerializerProtocol] = None
+    ):
+        super().__init__(serde=serde)
+        self.pool = SQLiteConnectionPool(database, size=pool_size)
+        self.executor = DBExecutor("checkpoints-db", max_workers=pool_size)
+        self._setup_lock = threading.Lock()
+        self._is_setup = False
+
+    def setup(self):
+        """Create the checkpoint tables; runs once, on first use."""
+        if self._is_setup:
+            return
+        with self._setup_lock, self.pool.connection() as conn, conn:
+            for statement in CHECKPOINT_TABLES:
+                conn.execute(statement)
+            self._is_setup = True
+
+    def _load_blobs(self, conn, thread_id, checkpoint_ns, versions: ChannelVersions):
+        values = {}
+        for channel, version in versions.items():
+            row = conn.execute(
+                """
+                SELECT type, blob FROM checkpoint_blobs
+                WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?
+                """,
+                (thread_id, checkpoint_ns, channel, str(version))
+            ).fetchone()
+            if row and row[0] != "empty":
+                values[channel] = self.serde.loads_typed((row[0], row[1]))
+        return values
+
+    def _load_writes(self, conn, thread_id, checkpoint_ns, checkpoint_id, channel=None):
+        rows = conn.execute(
+            f"""
+            SELECT task_id, channel, type, blob, task_path FROM checkpoint_writes
+            WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+            {"AND channel = ?" if channel else ""}
+            ORDER BY task_path, task_id, idx
+            """,
+            (thread_id, checkpoint_ns, checkpoint_id, *([channel] if channel else []))
+        ).fetchall()
+        return [
+            (task_id, channel, self.serde.loads_typed((type_, blob)))
+            for task_id, channel, type_, blob, _ in rows
+        ]
+
+    def _tuple(self, conn, thread_id, checkpoint_ns, row, metadata=None) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, blob, metadata_type, metadata_blob = row
+        checkpoint = self.serde.loads_typed((type_, blob))
+        sends = []
+        if parent_id:
+            sends = [
+                value for _, _, value in
+                self._load_writes(conn, thread_id, checkpoint_ns, parent_id, TASKS)
+            ]
+
+        def config(id_):
+            return {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": id_,
+                }
+            }
+
+        return CheckpointTuple(
+            config=config(checkpoint_id),
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_blobs(
+                    conn, thread_id, checkpoint_ns, checkpoint["channel_versions"]
+                ),
+                "pending_sends": sends,
+            },
+            metadata=metadata or self.serde.loads_typed((metadata_type, metadata_blob)),
+            parent_config=config(parent_id) if parent_id else None,
+            pending_writes=self._load_writes(conn, thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Return the checkpoint ``config`` points to, or the thread's latest one."""
+        self.setup()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        query = """
+            SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata
+            FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?
+        """
+        params: tuple = (thread_id, checkpoint_ns)
+        if checkpoint_id:
+            query += " AND checkpoint_id = ?"
+            params += (checkpoint_id,)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+
+        with self.pool.connection() as conn:
+            row = conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            return self._tuple(conn, thread_id, checkpoint_ns, row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """List checkpoints, newest first, optionally filtered by thread and metadata."""
+        self.setup()
+        conditions, params = [], []
+        if config:
+            conditions.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                conditions.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                conditions.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            conditions.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type,
+                    checkpoint, metadata_type, metadata
+                FROM checkpoints {where}
+                ORDER BY checkpoint_id DESC
+                """,
+                params
+            ).fetchall()
+            for thread_id, checkpoint_ns, *row in rows:
+                if limit is not None and limit <= 0:
+                    break
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if filter and not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+                if limit is not None:
+                    limit -= 1
+                yield self._tuple(conn, thread_id, checkpoint_ns, row, metadata)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Store a checkpoint and the channel values that changed since its parent."""
+        self.setup()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        stored.pop("pending_sends", None)
+        values = stored.pop("channel_values")
+        blobs = [
+            (thread_id, checkpoint_ns, channel, str(version),
+             *(self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b"")))
+            for channel, version in new_versions.items()
+        ]
+
+        with self.pool.connection() as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO checkpoint_blobs VALUES (?, ?, ?, ?, ?, ?)", blobs
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    *self.serde.dumps_typed(stored),
+                    *self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+                )
+            )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Store the pending writes of a task."""
+        self.setup()
+        configurable = config["configurable"]
+        # Special writes (errors, interrupts) are replaced, regular ones kept once.
+        verb = "REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "IGNORE"
+        rows = [
+            (
+                configurable["thread_id"],
+                configurable.get("checkpoint_ns", ""),
+                configurable["checkpoint_id"],
+                task_id,
+                WRITES_IDX_MAP.get(channel, index),
+                channel,
+                *self.serde.dumps_typed(value),
+                task_path,
+            )
+            for index, (channel, value) in enumerate(writes)
+        ]
+        with self.pool.connection() as conn, conn:
+            conn.executemany(
+                f"INSERT OR {verb} INTO checkpoint_writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete every checkpoint and write of a thread."""
+        self.setup()
+        with self.pool.connection() as conn, conn:
+            for table in ("checkpoints", "checkpoint_blobs", "checkpoint_writes"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def get_next_version(self, current: Optional[str], channel: ChannelProtocol) -> str:
+        # Zero-padded so versions sort as text; the random suffix keeps the versions
+        # of forked threads apart.
+        if current is None:
+            current_version = 0
+        elif isinstance(current, int):
+            current_version = current
+        else:
+            current_version = int(current.split(".")[0])
+        return f"{current_version + 1:032}.{random.random():016}"
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Async version of ``get_tuple``."""
+        return await self.executor.run(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """Async version of ``list``."""
+        items = await self.executor.run(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Async version of ``put``."""
+        return await self.executor.run(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Async version of ``put_writes``."""
+        return await self.executor.run(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Async version of ``delete_thread``."""
+        return await self.executor.run(self.delete_thread, thread_id)
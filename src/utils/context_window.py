@@ -0,0 +1,175 @@
+import os
+from typing import NamedTuple, Optional
+
+from langchain_core.language_models import LanguageModelLike
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+from .tokens import count_message_tokens
+
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "4"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# Turns that may pile up past CONTEXT_KEEP_TURNS before they are summarized, so the
+# summary model runs once every few turns instead of on every turn.
+CONTEXT_COMPACT_EVERY = int(os.getenv("CONTEXT_COMPACT_EVERY", "4"))
+# Share of CONTEXT_TOKEN_BUDGET the kept turns are trimmed to once the budget is
+# exceeded, leaving room for the next turns before compacting again.
+CONTEXT_COMPACT_TARGET = float(os.getenv("CONTEXT_COMPACT_TARGET", "0.75"))
+
+SUMMARY_PROMPT = """
+You maintain the running summary of a conversation between a user and their
+financial assistant. Merge the previous summary with the new messages into a single
+summary of at most 150 words, written in the user's language.
+Keep amounts, dates, categories, accounts and any decision or pending request;
+drop greetings and small talk.
+
+Previous summary:
+{summary}
+"""
+
+
+class Compaction(NamedTuple):
+    """Older messages moved out of the context window and the summary replacing them."""
+    messages: list[BaseMessage]
+    summary: str
+
+
+def split_turns(messages: list[BaseMessage]) -> list[list[BaseMessage]]:
+    """
+    Group messages into turns, each starting at a human message.
+
+    Tool calls and their results stay in the turn that issued them, so cutting at a
+    turn boundary never leaves a tool result without its call.
+    """
+    turns: list[list[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def messages_to_compact(
+    messages: list[BaseMessage],
+    keep_turns: int = CONTEXT_KEEP_TURNS,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    model: Optional[str] = None,
+    compact_every: int = CONTEXT_COMPACT_EVERY
+) -> list[BaseMessage]:
+    """
+    Return the oldest messages that must leave the context window.
+
+    Nothing is compacted until ``compact_every`` turns have piled up past the last
+    ``keep_turns`` or the conversation exceeds ``token_budget``. Then everything but
+    the last ``keep_turns`` turns goes, and the oldest of those too until the rest
+    fits in ``CONTEXT_COMPACT_TARGET`` of the budget. The current turn is always kept.
+    """
+    turns = split_turns(messages)
+    keep_turns = max(keep_turns, 1)
+    if len(turns) - keep_turns < max(compact_every, 1) and count_message_tokens(
+        messages, model
+    ) <= token_budget:
+        return []
+
+    kept = turns[-keep_turns:]
+    while len(kept) > 1 and count_message_tokens(
+        [message for turn in kept for message in turn], model
+    ) > token_budget * CONTEXT_COMPACT_TARGET:
+        kept = kept[1:]
+    compacted = len(turns) - len(kept)
+    return [message for turn in turns[:compacted] for message in turn]
+
+
+def _role(message: BaseMessage) -> str:
+    if isinstance(message, HumanMessage):
+        return "user"
+    if isinstance(message, ToolMessage):
+        return "tool"
+    return "assistant"
+
+
+def _summary_request(summary: str, messages: list[BaseMessage]) -> list[BaseMessage]:
+    transcript = "\n".join(
+        f"{_role(message)}: {message.content}" for message in messages if message.content
+    )
+    return [
+        SystemMessage(content=SUMMARY_PROMPT.format(summary=summary or "(none)")),
+        HumanMessage(content=transcript),
+    ]
+
+
+def _content(response) -> str:
+    return (response.content if isinstance(response, AIMessage) else str(response)).strip()
+
+
+def compact_context(
+    messages: list[BaseMessage],
+    summary: str,
+    model: LanguageModelLike,
+    keep_turns: int = CONTEXT_KEEP_TURNS,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    token_model: Optional[str] = None,
+    compact_every: int = CONTEXT_COMPACT_EVERY
+) -> Optional[Compaction]:
+    """
+    Fold the messages that no longer fit the context window into ``summary``.
+
+    Returns ``None`` when nothing is due for compaction, see ``messages_to_compact``.
+    ``model`` writes the new summary; ``token_model`` selects the tokenizer used to
+    measure the budget.
+    """
+    old = messages_to_compact(messages, keep_turns, token_budget, token_model, compact_every)
+    if not old:
+        return None
+    response = model.invoke(_summary_request(summary, old))
+    return Compaction(old, _content(response))
+
+
+async def acompact_context(
+    messages: list[BaseMessage],
+    summary: str,
+    model: LanguageModelLike,
+    keep_turns: int = CONTEXT_KEEP_TURNS,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    token_model: Optional[str] = None,
+    compact_every: int = CONTEXT_COMPACT_EVERY
+) -> Optional[Compaction]:
+    """Async version of ``compact_context``."""
+    old = messages_to_compact(messages, keep_turns, token_budget, token_model, compact_every)
+    if not old:
+        return None
+    response = await model.ainvoke(_summary_request(summary, old))
+    return Compaction(old, _content(response))
+
+
+def _archived(compaction: Compaction) -> list[tuple[str, str]]:
+    return [
+        (_role(message), message.content)
+        for message in compaction.messages
+        if isinstance(message, (HumanMessage, AIMessage))
+        and isinstance(message.content, str) and message.content
+    ]
+
+
+def archive_compaction(user_id, compaction: Compaction):
+    """
+    Store the compacted user and assistant messages in ``conversations``, with the
+    summary as their ``topic_summary``, so they stay reachable by the memory search.
+    """
+    from .messages_db_sqlite import add_message_with_embedding
+
+    for role, content in _archived(compaction):
+        add_message_with_embedding(user_id, role, content, compaction.summary)
+
+
+async def aarchive_compaction(user_id, compaction: Compaction):
+    """Async version of ``archive_compaction``."""
+    from .messages_db_sqlite import aadd_message_with_embedding
+
+    for role, content in _archived(compaction):
+        await aadd_message_with_embedding(user_id, role, content, compaction.summary)
@@ -0,0 +1,128 @@
+import atexit
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingWriteBuffer:
+    """
+    Write-behind buffer that embeds and indexes documents in batches.
+
+    ``add`` only appends to an in-memory list, so persisting a chat message does not
+    wait for the embedding API or the vector index. A background thread hands the
+    pending documents to ``write_batch`` once ``batch_size`` documents are queued or
+    ``flush_interval`` seconds after the oldest one arrived, whichever comes first.
+    ``flush`` writes everything synchronously and runs automatically at exit.
+
+    Args:
+        write_batch: Called with each batch, e.g. ``vectorstore.add_documents``.
+        batch_size: Number of pending documents that triggers a flush.
+        flush_interval: Maximum seconds a document waits before being written.
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[list[Document]], object],
+        batch_size: int = 32,
+        flush_interval: float = 2.0
+    ):
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._pending: list[Document] = []
+        self._oldest: Optional[float] = None
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+        self._registered = False
+
+    def __len__(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def add(self, document: Document):
+        """Queue a document; it is written in the background."""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("embedding buffer is closed")
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-buffer", daemon=True
+                )
+                self._worker.start()
+                if not self._registered:
+                    atexit.register(self.close)
+                    self._registered = True
+            self._pending.append(document)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+
+    def flush(self):
+        """Write every pending document now, in the calling thread."""
+        with self._write_lock:
+            with self._condition:
+                batch, self._pending, self._oldest = self._pending, [], None
+            if not batch:
+                return
+            try:
+                for start in range(0, len(batch), self.batch_size):
+                    self.write_batch(batch[start:start + self.batch_size])
+            except Exception:
+                # Keep the documents for the next flush instead of losing them.
+                with self._condition:
+                    self._pending[:0] = batch[start:]
+                    self._oldest = self._oldest or time.monotonic()
+                raise
+
+    def close(self):
+        """
+        Stop the background thread after writing the pending documents.
+
+        The buffer stays usable: the next ``add`` starts a new thread, so a store
+        whose connections are closed and lazily reopened keeps buffering.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+            worker = self._worker
+        if worker is not None:
+            worker.join()
+        try:
+            self.flush()
+        finally:
+            with self._condition:
+                self._worker = None
+                self._closed = False
+
+    def _due(self) -> bool:
+        return self._oldest is not None and (
+            len(self._pending) >= self.batch_size
+            or time.monotonic() - self._oldest >= self.flush_interval
+        )
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and not self._due():
+                    timeout = None
+                    if self._oldest is not None:
+                        timeout = self.flush_interval - (time.monotonic() - self._oldest)
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("failed to write embeddings, retrying on the next flush")
+                time.sleep(self.flush_interval)
@@ -0,0 +1,147 @@
+import threading
+import time
+from array import array
+from typing import Optional
+
+import xxhash
+from langchain_core.embeddings import Embeddings
+
+from .sqlite_pool import SQLiteConnectionPool
+
+# Keeps the number of bound parameters per statement well below SQLite's limit.
+LOOKUP_CHUNK_SIZE = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Persistent cache in front of an embeddings client.
+
+    Vectors are stored in a SQLite table keyed by the xxh3 hash of the model name and
+    the text, so repeated texts ("ok", "obrigado", the same question again) cost no
+    network call, across restarts too. Documents and queries share the cache, which
+    assumes the model embeds both the same way (true for OpenAI and Ollama models).
+
+    The cache keeps at most ``max_entries`` vectors, evicting the least recently used
+    ones, and counts hits and misses (see ``stats``).
+
+    Args:
+        embeddings: The embeddings client to cache, e.g. ``OpenAIEmbeddings()``.
+        database: Path of the SQLite cache file.
+        max_entries: Maximum number of cached vectors.
+        model_name: Cache namespace; defaults to the client's ``model`` attribute.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        database: str = "embedding_cache.db",
+        max_entries: int = 100_000,
+        model_name: Optional[str] = None
+    ):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.model_name = model_name or str(
+            getattr(embeddings, "model", None) or type(embeddings).__name__
+        )
+        self.pool = SQLiteConnectionPool(database, size=2)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: Optional[int] = None
+
+    def _ensure_table(self, conn) -> int:
+        if self._entries is None:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB,
+                    last_used REAL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used "
+                "ON embedding_cache (last_used)"
+            )
+            self._entries = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        return self._entries
+
+    def key(self, text: str) -> str:
+        return xxhash.xxh3_128_hexdigest(f"{self.model_name}\x00{text}".encode("utf-8"))
+
+    def _lookup(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        with self.pool.connection() as conn:
+            self._ensure_table(conn)
+            for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+                chunk = keys[start:start + LOOKUP_CHUNK_SIZE]
+                placeholders = ','.join(['?'] * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+            if found:
+                with conn:
+                    conn.executemany(
+                        "UPDATE embedding_cache SET last_used = ? WHERE key = ?",
+                        [(time.time(), key) for key in found]
+                    )
+        return found
+
+    def _store(self, vectors: dict[str, list[float]]):
+        with self._lock, self.pool.connection() as conn, conn:
+            entries = self._ensure_table(conn)
+            now = time.time()
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO embedding_cache (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in vectors.items()]
+            )
+            entries += max(cursor.rowcount, 0)
+            if entries > self.max_entries:
+                conn.execute(
+                    """
+                    DELETE FROM embedding_cache WHERE key IN (
+                        SELECT key FROM embedding_cache ORDER BY last_used LIMIT ?
+                    )
+                    """,
+                    (entries - self.max_entries,)
+                )
+                entries = self.max_entries
+            self._entries = entries
+
+    def _embed(self, texts: list[str], embed_missing) -> list[list[float]]:
+        keys = [self.key(text) for text in texts]
+        cached = self._lookup(list(dict.fromkeys(keys)))
+        missing = {key: text for key, text in zip(keys, texts, strict=True) if key not in cached}
+        miss_count = sum(1 for key in keys if key in missing)
+        with self._lock:
+            self.hits += len(keys) - miss_count
+            self.misses += miss_count
+
+        if missing:
+            vectors = embed_missing(list(missing.values()))
+            fresh = dict(zip(missing, vectors, strict=True))
+            self._store(fresh)
+            cached.update(fresh)
+        return [cached[key] for key in keys]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed(list(texts), self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed([text], lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+    def stats(self) -> dict[str, float]:
+        """Return the hit/miss counters and the hit rate since the process started."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,109 @@
+import os
+import re
+import unicodedata
+from typing import Optional
+
+import numpy as np
+import xxhash
+from langchain_core.embeddings import Embeddings
+
+from .embedding_cache import CachedEmbeddings
+
+EMBEDDING_PROVIDERS = ("openai", "ollama", "hashing")
+
+WORD = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Local, deterministic embeddings built with the hashing trick.
+
+    Each text is split into accent-insensitive words, word bigrams and character
+    trigrams; every feature is hashed with xxh64 into one of ``dimensions`` signed
+    buckets and the resulting vector is L2-normalized. No model file or network is
+    needed, the same text always maps to the same vector and embedding a chat message
+    takes well under a millisecond, which makes it suitable for offline deployments
+    and for tests.
+
+    Args:
+        dimensions: Size of the embedding vectors.
+    """
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+        self.model = f"hashing-{dimensions}"
+
+    @staticmethod
+    def features(text: str) -> list[str]:
+        normalized = unicodedata.normalize("NFKD", text.lower())
+        normalized = "".join(char for char in normalized if not unicodedata.combining(char))
+        words = WORD.findall(normalized)
+        features = list(words)
+        bigrams = zip(words, words[1:], strict=False)
+        features.extend(f"{first} {second}" for first, second in bigrams)
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(f"#{padded[index:index + 3]}" for index in range(len(padded) - 2))
+        return features
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        hashes = np.fromiter(
+            (xxhash.xxh64_intdigest(feature) for feature in self.features(text)),
+            dtype=np.uint64
+        )
+        if hashes.size:
+            buckets = (hashes % np.uint64(self.dimensions)).astype(np.intp)
+            signs = np.where(hashes >> np.uint64(63), 1.0, -1.0).astype(np.float32)
+            np.add.at(vector, buckets, signs)
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+def create_embeddings(provider: Optional[str] = None) -> Embeddings:
+    """
+    Build the embeddings client selected by ``provider`` or ``EMBEDDINGS_PROVIDER``.
+
+    - ``openai`` (default): ``OpenAIEmbeddings``, model from ``OPENAI_EMBEDDINGS_MODEL``.
+    - ``ollama``: ``OllamaEmbeddings`` served by a local Ollama, model from
+      ``OLLAMA_EMBEDDINGS_MODEL`` and server from ``OLLAMA_BASE_URL``.
+    - ``hashing``: ``HashingEmbeddings``, fully local, size from ``HASHING_EMBEDDINGS_DIM``.
+
+    Remote providers are wrapped in the persistent ``CachedEmbeddings``; the hashing
+    backend is faster to recompute than to look up, so it is returned as is.
+
+    Vectors of different providers have different sizes and are not comparable, so
+    a vector store must be rebuilt when the provider changes.
+    """
+    provider = (provider or os.getenv("EMBEDDINGS_PROVIDER", "openai")).lower()
+    if provider == "hashing":
+        return HashingEmbeddings(dimensions=int(os.getenv("HASHING_EMBEDDINGS_DIM", "384")))
+
+    if provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        model = os.getenv("OPENAI_EMBEDDINGS_MODEL")
+        client: Embeddings = OpenAIEmbeddings(model=model) if model else OpenAIEmbeddings()
+    elif provider == "ollama":
+        from langchain_ollama import OllamaEmbeddings
+        client = OllamaEmbeddings(
+            model=os.getenv("OLLAMA_EMBEDDINGS_MODEL", "nomic-embed-text"),
+            base_url=os.getenv("OLLAMA_BASE_URL")
+        )
+    else:
+        raise ValueError(
+            f"unknown embeddings provider {provider!r}, expected one of {EMBEDDING_PROVIDERS}"
+        )
+
+    return CachedEmbeddings(
+        client,
+        database=os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db"),
+        max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+    )
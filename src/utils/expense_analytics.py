@@ -0,0 +1,283 @@
+import datetime
+from typing import Any, Dict, NamedTuple, Optional
+
+import numpy as np
+
+from .expenses_db_sqlite import executor, get_user_monthly_income, month_year, pool
+
+# A month index counts months since year 0, so consecutive months differ by one.
+MONTH_INDEX_SQL = (
+    "CAST(substr(expiring_date, 1, 4) AS INTEGER) * 12"
+    " + CAST(substr(expiring_date, 6, 2) AS INTEGER) - 1"
+)
+ANOMALY_Z_SCORE = 3.0
+# Categories with fewer expenses than this have no meaningful spread to compare with.
+ANOMALY_MIN_COUNT = 5
+ROLLING_WINDOW = 3
+
+
+class ExpenseColumns(NamedTuple):
+    """A user's expenses in one currency, one NumPy array per column."""
+    ids: np.ndarray
+    months: np.ndarray
+    values: np.ndarray
+    recurrent: np.ndarray
+    categories: np.ndarray
+    category_names: list[str]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def month_index(year: int, month: int) -> int:
+    return year * 12 + month - 1
+
+
+def month_label(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def load_expense_columns(
+    user_id: int,
+    currency: str = "BRL",
+    first_month: Optional[int] = None,
+    last_month: Optional[int] = None
+) -> ExpenseColumns:
+    """
+    Load the user's expenses in ``currency`` into columnar arrays with one query.
+
+    ``first_month`` and ``last_month`` are inclusive month indexes (see
+    ``month_index``); they become a date range on ``(user_id, expiring_date)``.
+    Expenses without an ``expiring_date`` belong to no month and are left out.
+    """
+    conditions = ["user_id = ?", "currency = ?", "expiring_date IS NOT NULL"]
+    params: list[Any] = [user_id, currency]
+    if first_month is not None:
+        conditions.append("expiring_date >= ?")
+        params.append(f"{month_label(first_month)}-01")
+    if last_month is not None:
+        conditions.append("expiring_date < ?")
+        params.append(f"{month_label(last_month + 1)}-01")
+
+    with pool.connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT id, {MONTH_INDEX_SQL}, value, recurrent, label FROM expenses
+            WHERE {" AND ".join(conditions)}
+            """,
+            params
+        ).fetchall()
+
+    if not rows:
+        return ExpenseColumns(
+            np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float64),
+            np.empty(0, bool), np.empty(0, np.int64), []
+        )
+    ids, months, values, recurrent, labels = zip(*rows, strict=True)
+    # Expenses have no category column yet: the normalized label is the category.
+    # Labels repeat a lot, so they are coded first and only the distinct ones normalized.
+    distinct_labels: dict[str, int] = {}
+    label_codes = np.array([distinct_labels.setdefault(label, len(distinct_labels)) for label in labels])
+    names: dict[str, int] = {}
+    categories = np.array(
+        [names.setdefault((label or "").strip().lower(), len(names)) for label in distinct_labels],
+        np.int64
+    )
+    return ExpenseColumns(
+        np.array(ids, np.int64),
+        np.array(months, np.int64),
+        np.array(values, np.float64),
+        np.array(recurrent, bool),
+        categories[label_codes],
+        list(names)
+    )
+
+
+def monthly_totals(columns: ExpenseColumns, first_month: int, last_month: int) -> np.ndarray:
+    """Total spent in each month from ``first_month`` to ``last_month``, zero-filled."""
+    inside = (columns.months >= first_month) & (columns.months <= last_month)
+    return np.bincount(
+        columns.months[inside] - first_month,
+        weights=columns.values[inside],
+        minlength=last_month - first_month + 1
+    )
+
+
+def category_totals(columns: ExpenseColumns) -> list[Dict[str, Any]]:
+    """Total and count per category, the largest total first."""
+    size = len(columns.category_names)
+    totals = np.bincount(columns.categories, weights=columns.values, minlength=size)
+    counts = np.bincount(columns.categories, minlength=size)
+    return [
+        {"category": columns.category_names[code], "total": round(float(totals[code]), 2),
+         "count": int(counts[code])}
+        for code in np.argsort(-totals, kind="stable")
+    ]
+
+
+def rolling_average(series: np.ndarray, window: int = ROLLING_WINDOW) -> np.ndarray:
+    """Trailing mean over ``window`` values; the first ones average what is available."""
+    sums = np.cumsum(series, dtype=np.float64)
+    sums[window:] = sums[window:] - sums[:-window]
+    return sums / np.minimum(np.arange(1, len(series) + 1), window)
+
+
+def month_over_month(series: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Change of each month against the previous one, in value and in percent.
+
+    The first month, and any month following one without expenses, has a NaN percent.
+    """
+    deltas = np.diff(series, prepend=np.nan)
+    previous = np.concatenate(([np.nan], series[:-1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percents = np.where(previous > 0, deltas / previous * 100, np.nan)
+    return deltas, percents
+
+
+def anomaly_scores(
+    columns: ExpenseColumns,
+    min_count: int = ANOMALY_MIN_COUNT
+) -> np.ndarray:
+    """
+    Z-score of every expense against the other expenses of its category.
+
+    The mean and spread leave the scored expense out, so a single large expense in
+    a small category is not hidden by the spread it adds itself. Expenses in
+    categories with fewer than ``min_count`` entries, or whose other expenses have
+    no spread at all, score zero.
+    """
+    size = len(columns.category_names)
+    counts = np.bincount(columns.categories, minlength=size)[columns.categories]
+    sums = np.bincount(columns.categories, weights=columns.values, minlength=size)
+    squares = np.bincount(columns.categories, weights=columns.values ** 2, minlength=size)
+    others = counts - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = (sums[columns.categories] - columns.values) / others
+        variances = (squares[columns.categories] - columns.values ** 2) / others - means ** 2
+        std = np.sqrt(np.maximum(variances, 0))
+    valid = (counts >= min_count) & (others > 0) & (std > 1e-9)
+    scores = np.zeros(len(columns))
+    scores[valid] = (columns.values[valid] - means[valid]) / std[valid]
+    return scores
+
+
+def _window(months: int, year: Optional[int], month: Optional[int]) -> tuple[int, int]:
+    month = month or datetime.date.today().month
+    last = month_index(month_year(month, year), month)
+    return last - max(months, 1) + 1, last
+
+
+def _money(values: np.ndarray) -> list[Optional[float]]:
+    return [None if np.isnan(value) else round(float(value), 2) for value in values]
+
+
+def spending_report(
+    user_id: int,
+    months: int = 6,
+    currency: str = "BRL",
+    year: Optional[int] = None,
+    month: Optional[int] = None,
+    z_score: float = ANOMALY_Z_SCORE,
+    max_anomalies: int = 10
+) -> Dict[str, Any]:
+    """
+    Analyze the user's spending over the ``months`` months ending at ``month``/``year``
+    (the current month by default).
+
+    Loads the expenses once and returns the category totals, the monthly totals with
+    their rolling average and month-over-month change, and the expenses whose
+    z-score within their category exceeds ``z_score``, the most unusual first.
+    """
+    first, last = _window(months, year, month)
+    columns = load_expense_columns(user_id, currency, first, last)
+    series = monthly_totals(columns, first, last)
+    deltas, percents = month_over_month(series)
+
+    scores = anomaly_scores(columns)
+    flagged = np.flatnonzero(scores > z_score)
+    flagged = flagged[np.argsort(-scores[flagged], kind="stable")][:max_anomalies]
+
+    return {
+        "currency": currency,
+        "first_month": month_label(first),
+        "last_month": month_label(last),
+        "count": len(columns),
+        "total": round(float(series.sum()), 2),
+        "recurrent_total": round(float(columns.values[columns.recurrent].sum()), 2),
+        "categories": category_totals(columns),
+        "months": [
+            {"month": month_label(first + offset), "total": total, "rolling_average": average,
+             "change": change, "change_percent": percent}
+            for offset, (total, average, change, percent) in enumerate(zip(
+                _money(series), _money(rolling_average(series)), _money(deltas),
+                _money(percents), strict=True
+            ))
+        ],
+        "anomalies": [
+            {"id": int(columns.ids[row]), "month": month_label(int(columns.months[row])),
+             "category": columns.category_names[columns.categories[row]],
+             "value": round(float(columns.values[row]), 2),
+             "z_score": round(float(scores[row]), 2)}
+            for row in flagged
+        ],
+    }
+
+
+def expense_to_income_report(
+    user_id: int,
+    months: int = 6,
+    currency: str = "BRL",
+    year: Optional[int] = None,
+    month: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Ratio between the user's expenses and monthly income (``get_user_monthly_income``)
+    for each of the ``months`` months ending at ``month``/``year``, and on average.
+
+    Only the expenses in ``currency`` are counted. The income is registered without
+    a currency and is taken to be in ``currency`` too, so the ratios are only
+    meaningful for the currency the user is paid in. The ratios are ``None`` when
+    the user has not registered an income.
+    """
+    first, last = _window(months, year, month)
+    series = monthly_totals(load_expense_columns(user_id, currency, first, last), first, last)
+    income = get_user_monthly_income(user_id)
+    ratios = series / income if income else np.full(len(series), np.nan)
+    return {
+        "currency": currency,
+        "income": income,
+        "average_expenses": round(float(series.mean()), 2),
+        "average_ratio": None if not income else round(float(ratios.mean()), 4),
+        "months": [
+            {"month": month_label(first + offset), "total": round(float(total), 2),
+             "ratio": None if np.isnan(ratio) else round(float(ratio), 4)}
+            for offset, (total, ratio) in enumerate(zip(series, ratios, strict=True))
+        ],
+    }
+
+
+async def aspending_report(
+    user_id: int,
+    months: int = 6,
+    currency: str = "BRL",
+    year: Optional[int] = None,
+    month: Optional[int] = None,
+    z_score: float = ANOMALY_Z_SCORE,
+    max_anomalies: int = 10
+) -> Dict[str, Any]:
+    """Async version of ``spending_report``."""
+    return await executor.run(
+        spending_report, user_id, months, currency, year, month, z_score, max_anomalies
+    )
+
+
+async def aexpense_to_income_report(
+    user_id: int,
+    months: int = 6,
+    currency: str = "BRL",
+    year: Optional[int] = None,
+    month: Optional[int] = None
+) -> Dict[str, Any]:
+    """Async version of ``expense_to_income_report``."""
+    return await executor.run(expense_to_income_report, user_id, months, currency, year, month)
@@ -1,51 +1,279 @@
-from typing import Dict, Any
-import sqlite3
-conn = sqlite3.connect("expenses.db")
-cursor = conn.cursor()
+from typing import Dict, Any, Iterable, NamedTuple, Optional, Union
+import datetime
+import itertools
+import logging
+import os
+
+from .db_executor import DBExecutor
+from .params_cache import ReadThroughCache
+from .sqlite_pool import SQLiteConnectionPool
+
+pool = SQLiteConnectionPool(
+    os.getenv("EXPENSES_DB_PATH", "expenses.db"),
+    size=int(os.getenv("EXPENSES_DB_POOL_SIZE", "5"))
+)
+executor = DBExecutor("expenses-db", max_workers=pool.size)
+logger = logging.getLogger(__name__)
+# Latest value of each (user_id, label) of ``user_params``, invalidated by ``add_user_param``.
+user_params_cache = ReadThroughCache(
+    maxsize=int(os.getenv("USER_PARAMS_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("USER_PARAMS_CACHE_TTL", "300"))
+)
+
+EXPENSES_INDEXES = [
+    """
+    CREATE INDEX IF NOT EXISTS idx_expenses_user_expiring_date
+    ON expenses (user_id, expiring_date)
+    """,
+]
+
+INSERT_EXPENSE_SQL = """
+    INSERT INTO expenses (
+        user_id,
+        label,
+        value,
+        currency,
+        recurrent,
+        installments,
+        expiring_date,
+        import_hash
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+REQUIRED_EXPENSE_FIELDS = ("label", "value", "currency", "recurrent", "installments")
+EXPENSES_PAGE_SIZE = 50
+
+
+class Expense(NamedTuple):
+    """A row of the ``expenses`` table."""
+    id: int
+    user_id: int
+    label: str
+    value: float
+    currency: str
+    recurrent: int
+    installments: int
+    expiring_date: Optional[str]
+    created_at: Optional[str]
+    import_hash: Optional[str]
+
+
+EXPENSE_COLUMNS = ", ".join(Expense._fields)
+# Columns the model needs to answer about an expense; ids, owner and bookkeeping
+# timestamps only cost tokens.
+COMPACT_EXPENSE_FIELDS = ("label", "value", "currency", "recurrent", "installments", "date")
+
+
+def compact_expense(expense: Expense) -> list:
+    """Values of ``COMPACT_EXPENSE_FIELDS`` for ``expense``, with the date as YYYY-MM-DD."""
+    return [
+        expense.label,
+        round(expense.value, 2),
+        expense.currency,
+        expense.recurrent,
+        expense.installments,
+        expense.expiring_date[:10] if expense.expiring_date else None
+    ]
+
+
+def serialize_expenses(
+    expenses: Iterable[Expense],
+    columnar: bool = False
+) -> Union[list[Dict[str, Any]], Dict[str, list]]:
+    """
+    Serialize expenses for the model with only ``COMPACT_EXPENSE_FIELDS``.
 
+    By default every expense becomes a dict. With ``columnar`` the field names are
+    written once, as ``{"columns": [...], "rows": [[...], ...]}``, which is shorter
+    for long lists.
+    """
+    rows = [compact_expense(expense) for expense in expenses]
+    if columnar:
+        return {"columns": list(COMPACT_EXPENSE_FIELDS), "rows": rows}
+    return [dict(zip(COMPACT_EXPENSE_FIELDS, row, strict=True)) for row in rows]
 
-def create_expenses_table():
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS expenses (
-        id INTEGER PRIMARY KEY,
+
+# Per user, month ("YYYY-MM" of expiring_date) and currency totals, kept up to date by
+# triggers on every write to ``expenses`` so month totals are a primary key lookup.
+# Expenses without an expiring_date belong to no month and are not aggregated.
+MONTHLY_TOTALS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS expense_monthly_totals (
         user_id INTEGER,
-        label TEXT,
-        value REAL,
+        year_month TEXT,
         currency TEXT,
-        recurrent INTEGER,
-        installments INTEGER,
-        expiring_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    conn.commit()
+        total REAL,
+        count INTEGER,
+        recurrent_total REAL,
+        PRIMARY KEY (user_id, year_month, currency)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_expenses_totals_insert
+    AFTER INSERT ON expenses WHEN NEW.expiring_date IS NOT NULL
+    BEGIN
+        INSERT INTO expense_monthly_totals
+            (user_id, year_month, currency, total, count, recurrent_total)
+        VALUES (
+            NEW.user_id, substr(NEW.expiring_date, 1, 7), NEW.currency, NEW.value, 1,
+            CASE WHEN NEW.recurrent THEN NEW.value ELSE 0 END
+        )
+        ON CONFLICT (user_id, year_month, currency) DO UPDATE SET
+            total = total + excluded.total,
+            count = count + 1,
+            recurrent_total = recurrent_total + excluded.recurrent_total;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_expenses_totals_delete
+    AFTER DELETE ON expenses WHEN OLD.expiring_date IS NOT NULL
+    BEGIN
+        UPDATE expense_monthly_totals SET
+            total = total - OLD.value,
+            count = count - 1,
+            recurrent_total = recurrent_total - CASE WHEN OLD.recurrent THEN OLD.value ELSE 0 END
+        WHERE user_id = OLD.user_id
+            AND year_month = substr(OLD.expiring_date, 1, 7)
+            AND currency = OLD.currency;
+        DELETE FROM expense_monthly_totals
+        WHERE user_id = OLD.user_id
+            AND year_month = substr(OLD.expiring_date, 1, 7)
+            AND currency = OLD.currency
+            AND count <= 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_expenses_totals_update
+    AFTER UPDATE OF user_id, value, currency, recurrent, expiring_date ON expenses
+    BEGIN
+        UPDATE expense_monthly_totals SET
+            total = total - OLD.value,
+            count = count - 1,
+            recurrent_total = recurrent_total - CASE WHEN OLD.recurrent THEN OLD.value ELSE 0 END
+        WHERE OLD.expiring_date IS NOT NULL
+            AND user_id = OLD.user_id
+            AND year_month = substr(OLD.expiring_date, 1, 7)
+            AND currency = OLD.currency;
+        DELETE FROM expense_monthly_totals
+        WHERE user_id = OLD.user_id
+            AND year_month = substr(OLD.expiring_date, 1, 7)
+            AND currency = OLD.currency
+            AND count <= 0;
+        INSERT INTO expense_monthly_totals
+            (user_id, year_month, currency, total, count, recurrent_total)
+        SELECT
+            NEW.user_id, substr(NEW.expiring_date, 1, 7), NEW.currency, NEW.value, 1,
+            CASE WHEN NEW.recurrent THEN NEW.value ELSE 0 END
+        WHERE NEW.expiring_date IS NOT NULL
+        ON CONFLICT (user_id, year_month, currency) DO UPDATE SET
+            total = total + excluded.total,
+            count = count + 1,
+            recurrent_total = recurrent_total + excluded.recurrent_total;
+    END
+    """,
+    # Backfill the totals of the expenses written before the triggers existed.
+    """
+    INSERT INTO expense_monthly_totals
+        (user_id, year_month, currency, total, count, recurrent_total)
+    SELECT
+        user_id, substr(expiring_date, 1, 7), currency, SUM(value), COUNT(*),
+        SUM(CASE WHEN recurrent THEN value ELSE 0 END)
+    FROM expenses
+    WHERE expiring_date IS NOT NULL
+    GROUP BY user_id, substr(expiring_date, 1, 7), currency
+    """,
+]
+
+# Schema migrations of the expenses table, applied in order by ``migrate_database``.
+# Each entry is a list of statements; the number of applied migrations is kept in
+# ``PRAGMA user_version``.
+MIGRATIONS = [
+    EXPENSES_INDEXES,
+    [
+        # Content hash of imported statement lines, used to skip re-imported rows.
+        "ALTER TABLE expenses ADD COLUMN import_hash TEXT",
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_expenses_user_import_hash
+        ON expenses (user_id, import_hash)
+        """,
+    ],
+    MONTHLY_TOTALS_SCHEMA,
+    [
+        # Bumped by every write to a user's expenses or parameters, see
+        # ``get_user_data_version``.
+        """
+        CREATE TABLE IF NOT EXISTS user_data_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+        """,
+    ],
+]
+
+
+def create_expenses_table():
+    with pool.connection() as conn, conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS expenses (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            label TEXT,
+            value REAL,
+            currency TEXT,
+            recurrent INTEGER,
+            installments INTEGER,
+            expiring_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+    # New tables are brought to the current schema by the same migrations as old ones.
+    migrate_database()
 
 
 def create_user_table():
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS user (
-        id INTEGER PRIMARY KEY,
-        name TEXT,
-        email TEXT,
-        password TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        deleted_at TIMESTAMP DEFAULT NULL
-    )
-    """)
-    conn.commit()
+    with pool.connection() as conn, conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS user (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            email TEXT,
+            password TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            deleted_at TIMESTAMP DEFAULT NULL
+        )
+        """)
 
 
 def create_user_params_table():
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS user_params (
-        id INTEGER PRIMARY KEY,
-        user_id INTEGER,
-        label TEXT,
-        value TEXT
-    )
-    """)
-    conn.commit()
+    with pool.connection() as conn, conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_params (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            label TEXT,
+            value TEXT
+        )
+        """)
+
+
+def migrate_database():
+    """
+    Apply the pending schema migrations to an existing database.
+
+    Every migration runs in its own transaction together with the ``user_version``
+    bump, so an interrupted upgrade resumes from the last completed migration.
+    """
+    with pool.connection() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            with conn:
+                # DDL does not open a transaction implicitly, so begin one explicitly.
+                conn.execute("BEGIN")
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {number}")
+
 
 def initialize_database():
     """
@@ -56,6 +284,81 @@ def initialize_database():
     create_user_table()
     create_user_params_table()
 
+
+def find_imported_hashes(user_id: int, import_hashes: Iterable[str]) -> set[str]:
+    """Return the subset of ``import_hashes`` already imported for the user."""
+    import_hashes = list(import_hashes)
+    if not import_hashes:
+        return set()
+    placeholders = ','.join(['?'] * len(import_hashes))
+    with pool.connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT import_hash FROM expenses
+            WHERE user_id = ? AND import_hash IN ({placeholders})
+            """,
+            [user_id, *import_hashes]
+        ).fetchall()
+    return {row[0] for row in rows}
+
+
+def month_date_range(month: int, year: int) -> tuple[str, str]:
+    """
+    Return the ``[start, end)`` ISO date bounds of a calendar month.
+
+    Comparing ``expiring_date`` against these bounds lets SQLite range-scan the
+    ``(user_id, expiring_date)`` index instead of evaluating ``strftime`` per row.
+    """
+    start = datetime.date(year, month, 1)
+    end = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+
+def month_year(
+    month: int,
+    year: Optional[int] = None,
+    today: Optional[datetime.date] = None
+) -> int:
+    """
+    Year of ``month`` when the caller gave none: its latest occurrence up to
+    ``today``, so in January "December" is December of the previous year.
+    """
+    if year:
+        return year
+    today = today or datetime.date.today()
+    return today.year - (month > today.month)
+
+
+def _load_user_param(user_id: int, label: str) -> Optional[str]:
+    with pool.connection() as conn:
+        result = conn.execute(
+            """
+            SELECT value FROM user_params
+            WHERE user_id = ? AND label = ?
+            ORDER BY id DESC
+            LIMIT 1
+            """,
+            (user_id, label)
+        ).fetchone()
+    return result[0] if result else None
+
+
+def get_user_param(user_id: int, label: str) -> Optional[str]:
+    """
+    Fetch the latest value of a user parameter, through ``user_params_cache``.
+
+    Args:
+        user_id (int): The ID of the user.
+        label (str): The parameter label, e.g. ``monthly_income``.
+
+    Returns:
+        str: The parameter value, or None if the user has not set it.
+    """
+    return user_params_cache.get(
+        (int(user_id), label), lambda: _load_user_param(user_id, label)
+    )
+
+
 def get_user_monthly_income(user_id: int) -> float | None:
     """
     Fetch the monthly income of a user from the database.
@@ -66,69 +369,190 @@ def get_user_monthly_income(user_id: int) -> float | None:
     Returns:
         Dict: The monthly income of the user and the currency.
     """
-    cursor.execute(
-        """
-        SELECT value FROM user_params
-        WHERE user_id = ? AND label = 'monthly_income'
-        ORDER BY id DESC
-        LIMIT 1
-        """,
-        [user_id]
-    )
-    result = cursor.fetchone()
+    result = get_user_param(user_id, "monthly_income")
+    return float(result) if result is not None else None
+
 
-    return float(result[0]) if result else None
+def _after_cursor(after_expiring_date: Optional[str], after_id: Optional[int]) -> tuple:
+    """
+    SQL condition and parameters keeping the rows that follow a cursor in the
+    ``expiring_date DESC, id DESC`` order.
+
+    The row value comparison lets SQLite seek in ``idx_expenses_user_expiring_date``
+    (which ends with the rowid), so a page costs the same at any depth.
+    """
+    if after_id is None:
+        return "", ()
+    return "AND (expiring_date, id) < (?, ?)", (after_expiring_date, after_id)
 
 
-def get_recent_user_expenses(user_id: int) -> list[Dict[str, Any]]:
+def get_recent_user_expenses(
+    user_id: int,
+    after_expiring_date: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = EXPENSES_PAGE_SIZE
+) -> list[Expense]:
     """
-    Fetch 50 recent user expenses from the database.
+    Fetch a page of user expenses from the database, the latest expiring first.
+
+    Pass the ``expiring_date`` and ``id`` of the last expense of a page as
+    ``after_expiring_date`` and ``after_id`` to fetch the next one. Expenses without
+    an expiring date come last, newest first.
 
     Args:
         user_id (int): The ID of the user.
+        after_expiring_date (str, optional): Expiring date of the last expense seen.
+        after_id (int, optional): ID of the last expense seen.
+        limit (int): Page size. Defaults to 50.
 
     Returns:
-        List[Dict]: The monthly expenses of the user.
+        List[Expense]: The expenses of the user.
     """
-    cursor.execute(
-        """
-        SELECT * FROM expenses
-        WHERE user_id = ?
-        ORDER BY expiring_date DESC
-        LIMIT 50
-        """,
-        (user_id,)
+    dated = after_id is None or after_expiring_date is not None
+    result = []
+    with pool.connection() as conn:
+        if dated:
+            condition, params = _after_cursor(after_expiring_date, after_id)
+            result = conn.execute(
+                f"""
+                SELECT {EXPENSE_COLUMNS} FROM expenses
+                WHERE user_id = ? AND expiring_date IS NOT NULL {condition}
+                ORDER BY expiring_date DESC, id DESC
+                LIMIT ?
+                """,
+                (user_id, *params, limit)
+            ).fetchall()
+        if len(result) < limit:
+            condition, params = ("", ()) if dated else ("AND id < ?", (after_id,))
+            result += conn.execute(
+                f"""
+                SELECT {EXPENSE_COLUMNS} FROM expenses
+                WHERE user_id = ? AND expiring_date IS NULL {condition}
+                ORDER BY id DESC
+                LIMIT ?
+                """,
+                (user_id, *params, limit - len(result))
+            ).fetchall()
+    logger.debug(
+        "recent expenses fetched", extra={"user_id": user_id, "count": len(result)}
     )
-    result = cursor.fetchall()
-    print("Recent user expenses fetched:", result)
-    if not result:
-        return []
-    return result
+    return [Expense._make(row) for row in result]
 
 
-def get_expenses_by_month(user_id: int, month: int) -> list[Dict[str, Any]]:
+def get_expenses_by_month(
+    user_id: int,
+    month: int,
+    year: Optional[int] = None,
+    after_expiring_date: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = EXPENSES_PAGE_SIZE
+) -> list[Expense]:
     """
-    Fetch the expenses of a user for a specific month from the database.
+    Fetch a page of the expenses of a user for a specific month from the database.
+
+    Pages follow the same order and cursor as ``get_recent_user_expenses``.
 
     Args:
         user_id (str): The ID of the user.
         month (int): The month for which to fetch expenses.
+        year (int, optional): The year of the month. Defaults to the month's latest
+            occurrence, see ``month_year``.
+        after_expiring_date (str, optional): Expiring date of the last expense seen.
+        after_id (int, optional): ID of the last expense seen.
+        limit (int): Page size. Defaults to 50.
 
     Returns:
-        List[Dict]: The expenses of the user for the specified month.
+        List[Expense]: The expenses of the user for the specified month.
+    """
+    start, end = month_date_range(month, month_year(month, year))
+    condition, params = _after_cursor(after_expiring_date, after_id)
+    with pool.connection() as conn:
+        result = conn.execute(
+            f"""
+            SELECT {EXPENSE_COLUMNS} FROM expenses
+            WHERE user_id = ? AND expiring_date >= ? AND expiring_date < ? {condition}
+            ORDER BY expiring_date DESC, id DESC
+            LIMIT ?
+            """,
+            (user_id, start, end, *params, limit)
+        ).fetchall()
+    logger.debug(
+        "month expenses fetched",
+        extra={"user_id": user_id, "month": start[:7], "count": len(result)}
+    )
+    return [Expense._make(row) for row in result]
+
+
+def get_monthly_expense_totals(
+    user_id: int,
+    month: int,
+    year: Optional[int] = None
+) -> list[Dict[str, Any]]:
     """
-    cursor.execute(
+    Fetch the expense totals of a user for a specific month, one entry per currency.
+
+    Reads the ``expense_monthly_totals`` aggregates, so the cost does not depend on
+    how many expenses the month has.
+
+    Args:
+        user_id (int): The ID of the user.
+        month (int): The month of the totals (1-12).
+        year (int, optional): The year of the month. Defaults to the month's latest
+            occurrence, see ``month_year``.
+
+    Returns:
+        List[Dict]: ``currency``, ``total``, ``count`` and ``recurrent_total`` per currency.
+    """
+    year_month = f"{month_year(month, year):04d}-{month:02d}"
+    with pool.connection() as conn:
+        rows = conn.execute(
+            """
+            SELECT currency, total, count, recurrent_total FROM expense_monthly_totals
+            WHERE user_id = ? AND year_month = ?
+            ORDER BY currency
+            """,
+            (user_id, year_month)
+        ).fetchall()
+    return [
+        {
+            "currency": currency,
+            "total": round(total, 2),
+            "count": count,
+            "recurrent_total": round(recurrent_total, 2),
+        }
+        for currency, total, count, recurrent_total in rows
+    ]
+
+
+def _bump_data_version(conn, user_id: int):
+    conn.execute(
         """
-        SELECT * FROM expenses
-        WHERE user_id = ? AND strftime('%m', expiring_date) = ?
-        ORDER BY expiring_date DESC
-        LIMIT 50
+        INSERT INTO user_data_versions (user_id, version) VALUES (?, 1)
+        ON CONFLICT (user_id) DO UPDATE SET version = version + 1
         """,
-        (user_id, str(month).zfill(2))
+        (user_id,)
     )
-    result = cursor.fetchall()
 
-    return result
+
+def get_user_data_version(user_id: int) -> int:
+    """
+    Version of a user's expenses and parameters.
+
+    It changes with every ``add_user_expense``, ``add_user_expenses_bulk`` and
+    ``add_user_param`` call, in the same transaction as the write, so anything derived
+    from the user's data (e.g. a cached answer) is stale once the version moved.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        int: The version, 0 for a user who never wrote anything.
+    """
+    with pool.connection() as conn:
+        result = conn.execute(
+            "SELECT version FROM user_data_versions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+    return result[0] if result else 0
 
 
 def add_user_expense(user_id: int, expense: Dict[str, Any]):
@@ -142,31 +566,77 @@ def add_user_expense(user_id: int, expense: Dict[str, Any]):
     Returns:
         None
     """
-    cursor.execute(
-        """
-        INSERT INTO expenses (
-            user_id,
-            label,
-            value,
-            currency,
-            recurrent,
-            installments,
-            expiring_date
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
+    with pool.connection() as conn, conn:
+        cursor = conn.execute(INSERT_EXPENSE_SQL, expense_row(user_id, expense))
+        _bump_data_version(conn, user_id)
+    return cursor.lastrowid
+
+
+def expense_row(user_id: int, expense: Dict[str, Any]) -> tuple:
+    """
+    Validate an expense and convert it to the parameters of ``INSERT_EXPENSE_SQL``.
+
+    Raises:
+        ValueError: If a required field is missing or has the wrong type.
+    """
+    missing = [field for field in REQUIRED_EXPENSE_FIELDS if field not in expense]
+    if missing:
+        raise ValueError(f"expense is missing required fields: {', '.join(missing)}")
+    try:
+        return (
             user_id,
-            expense["label"],
-            expense["value"],
-            expense["currency"],
-            expense["recurrent"],
-            expense["installments"],
-            expense["expiring_date"] if "expiring_date" in expense else None
+            str(expense["label"]),
+            float(expense["value"]),
+            str(expense["currency"]),
+            int(expense["recurrent"]),
+            int(expense["installments"]),
+            expense.get("expiring_date"),
+            expense.get("import_hash")
         )
-    )
-    conn.commit()
-    return cursor.lastrowid
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"invalid expense {expense!r}: {error}") from error
+
+
+def add_user_expenses_bulk(
+    user_id: int,
+    expenses: Iterable[Dict[str, Any]],
+    chunk_size: int = 1000
+) -> tuple[int, int] | None:
+    """
+    Add many expenses for a user, e.g. the lines of a bank statement.
+
+    Rows are validated and inserted with ``executemany`` in chunks of ``chunk_size``,
+    one transaction (and one fsync) per chunk instead of one per row. ``expenses``
+    is consumed lazily, so arbitrarily long iterables are inserted in constant memory.
+
+    Args:
+        user_id (int): The ID of the user.
+        expenses (Iterable[Dict[str, Any]]): The expenses to add.
+        chunk_size (int): Number of rows written per transaction.
+
+    Returns:
+        The ``(first_id, last_id)`` range of the inserted rows, or None if nothing was
+        inserted. Ids inside a chunk are contiguous; rows written by other connections
+        between two chunks may fall inside the range.
+
+    Raises:
+        ValueError: If an expense is invalid. Chunks committed before it are kept.
+    """
+    first_id = last_id = None
+    iterator = iter(expenses)
+    with pool.connection() as conn:
+        while chunk := list(itertools.islice(iterator, chunk_size)):
+            rows = [expense_row(user_id, expense) for expense in chunk]
+            with conn:
+                conn.executemany(INSERT_EXPENSE_SQL, rows)
+                _bump_data_version(conn, user_id)
+                # The write lock is held until commit, so the chunk got consecutive rowids.
+                last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            if first_id is None:
+                first_id = last_id - len(rows) + 1
+    if first_id is None:
+        return None
+    return first_id, last_id
 
 
 def add_user(user: Dict[str, Any]):
@@ -179,15 +649,15 @@ def add_user(user: Dict[str, Any]):
     Returns:
         the ID of the user.
     """
-    cursor.execute(
-        "INSERT INTO user (name, email, password) VALUES (?, ?, ?)",
-        (
-            user["name"],
-            user["email"],
-            user["password"]
+    with pool.connection() as conn, conn:
+        cursor = conn.execute(
+            "INSERT INTO user (name, email, password) VALUES (?, ?, ?)",
+            (
+                user["name"],
+                user["email"],
+                user["password"]
+            )
         )
-    )
-    conn.commit()
     return cursor.lastrowid or 0
 
 
@@ -202,13 +672,92 @@ def add_user_param(user_id: int, param: Dict[str, Any]):
     Returns:
         the ID of the parameter.
     """
-    cursor.execute(
-        "INSERT INTO user_params (user_id, label, value) VALUES (?, ?, ?)",
-        (
-            user_id,
-            param["label"],
-            param["value"]
+    with pool.connection() as conn, conn:
+        cursor = conn.execute(
+            "INSERT INTO user_params (user_id, label, value) VALUES (?, ?, ?)",
+            (
+                user_id,
+                param["label"],
+                param["value"]
+            )
         )
-    )
-    conn.commit()
+        _bump_data_version(conn, user_id)
+    user_params_cache.invalidate((int(user_id), param["label"]))
     return cursor.lastrowid or 0
+
+
+async def aget_user_param(user_id: int, label: str) -> Optional[str]:
+    """Async version of ``get_user_param``; cache hits do not use the executor."""
+    return await user_params_cache.aget(
+        (int(user_id), label), lambda: executor.run(_load_user_param, user_id, label)
+    )
+
+
+async def aget_user_monthly_income(user_id: int) -> float | None:
+    """Async version of ``get_user_monthly_income``."""
+    result = await aget_user_param(user_id, "monthly_income")
+    return float(result) if result is not None else None
+
+
+async def aget_recent_user_expenses(
+    user_id: int,
+    after_expiring_date: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = EXPENSES_PAGE_SIZE
+) -> list[Expense]:
+    """Async version of ``get_recent_user_expenses``."""
+    return await executor.run(
+        get_recent_user_expenses, user_id, after_expiring_date, after_id, limit
+    )
+
+
+async def aget_expenses_by_month(
+    user_id: int,
+    month: int,
+    year: Optional[int] = None,
+    after_expiring_date: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = EXPENSES_PAGE_SIZE
+) -> list[Expense]:
+    """Async version of ``get_expenses_by_month``."""
+    return await executor.run(
+        get_expenses_by_month, user_id, month, year, after_expiring_date, after_id, limit
+    )
+
+
+async def aget_monthly_expense_totals(
+    user_id: int,
+    month: int,
+    year: Optional[int] = None
+) -> list[Dict[str, Any]]:
+    """Async version of ``get_monthly_expense_totals``."""
+    return await executor.run(get_monthly_expense_totals, user_id, month, year)
+
+
+async def aget_user_data_version(user_id: int) -> int:
+    """Async version of ``get_user_data_version``."""
+    return await executor.run(get_user_data_version, user_id)
+
+
+async def aadd_user_expense(user_id: int, expense: Dict[str, Any]):
+    """Async version of ``add_user_expense``."""
+    return await executor.run(add_user_expense, user_id, expense)
+
+
+async def aadd_user_expenses_bulk(
+    user_id: int,
+    expenses: Iterable[Dict[str, Any]],
+    chunk_size: int = 1000
+) -> tuple[int, int] | None:
+    """Async version of ``add_user_expenses_bulk``."""
+    return await executor.run(add_user_expenses_bulk, user_id, expenses, chunk_size)
+
+
+async def aadd_user(user: Dict[str, Any]):
+    """Async version of ``add_user``."""
+    return await executor.run(add_user, user)
+
+
+async def aadd_user_param(user_id: int, param: Dict[str, Any]):
+    """Async version of ``add_user_param``."""
+    return await executor.run(add_user_param, user_id, param)
@@ -0,0 +1,410 @@
+import datetime
+import os
+import re
+import unicodedata
+from typing import Any, Dict, NamedTuple, Optional
+
+import numpy as np
+
+from .embeddings import HashingEmbeddings
+from .expenses_db_sqlite import month_year
+from .lazy import lazy_singleton
+
+INTENT_MONTHLY_INCOME = "monthly_income"
+INTENT_MONTH_TOTAL = "month_total"
+INTENT_RECENT_EXPENSES = "recent_expenses"
+# Anything else goes to the LLM agent.
+INTENT_AGENT = "agent"
+
+INTENT_MIN_CONFIDENCE = float(os.getenv("INTENT_MIN_CONFIDENCE", "0.6"))
+# Longer messages usually carry more than a lookup ("... and how can I save more?").
+INTENT_MAX_WORDS = int(os.getenv("INTENT_MAX_WORDS", "12"))
+
+# High-precision patterns over the accent-free, lowercase message.
+RULES = [
+    (INTENT_MONTHLY_INCOME, "pt", r"\bquanto (eu )?(ganho|recebo)\b|\b(minha|meu) (renda|salario)\b"),
+    (INTENT_MONTHLY_INCOME, "es", r"\bcuanto (gano|cobro)\b|\bmi (salario|sueldo|ingreso)\b"),
+    (INTENT_MONTHLY_INCOME, "en", r"\bhow much (do )?i (earn|make)\b|\bmy (monthly )?(income|salary)\b"),
+    (INTENT_MONTH_TOTAL, "pt", r"\bquanto (eu )?gastei\b|\btotal (de|dos) (meus )?gastos\b"),
+    (INTENT_MONTH_TOTAL, "es", r"\bcuanto (he )?gaste\b|\btotal de (mis )?gastos\b"),
+    (INTENT_MONTH_TOTAL, "en", r"\bhow much (did|have) i spen[dt]\b|\btotal (spending|expenses)\b"),
+    (INTENT_RECENT_EXPENSES, "pt", r"\b(ultimos gastos|ultimas despesas|(gastos|despesas) recentes)\b"),
+    (INTENT_RECENT_EXPENSES, "es", r"\b(ultimos gastos|gastos recientes)\b"),
+    (INTENT_RECENT_EXPENSES, "en", r"\b(recent|latest|last) (expenses|spending)\b"),
+]
+RULES = [(intent, language, re.compile(pattern)) for intent, language, pattern in RULES]
+
+# Labelled examples of the local classifier, used when no rule matches. The agent
+# examples keep open questions that share words with the lookups away from them.
+EXAMPLES = {
+    INTENT_MONTHLY_INCOME: [
+        "qual a minha renda mensal", "renda mensal", "salario mensal", "meu salario",
+        "quanto ganho por mes", "what is my income", "monthly income", "my salary",
+        "cual es mi ingreso mensual", "mi sueldo",
+    ],
+    INTENT_MONTH_TOTAL: [
+        "gastos de abril", "despesas de abril", "gastos do mes passado",
+        "total gasto em maio", "quanto foi gasto em marco",
+        "total do mes", "spending in april", "expenses total for may",
+        "gastos de enero", "total gastado en mayo",
+    ],
+    INTENT_RECENT_EXPENSES: [
+        "minhas despesas", "listar despesas", "mostrar meus gastos", "meus gastos",
+        "show my expenses", "list my expenses", "mis gastos", "mostrar mis gastos",
+    ],
+    INTENT_AGENT: [
+        "como posso economizar mais", "me ajuda a montar um orcamento",
+        "vale a pena investir em acoes", "adicionar uma despesa de 50 reais",
+        "how can i save money", "help me plan a budget", "add an expense",
+        "como puedo ahorrar", "oi tudo bem", "hello", "obrigado",
+        # Month listings are paged by the agent's tools.
+        "listar minhas despesas de abril", "list my expenses in april",
+    ],
+}
+
+MONTHS = {
+    "janeiro": 1, "january": 1, "enero": 1, "jan": 1,
+    "fevereiro": 2, "february": 2, "febrero": 2, "fev": 2, "feb": 2,
+    "marco": 3, "march": 3, "marzo": 3,
+    "abril": 4, "april": 4, "abr": 4, "apr": 4,
+    "maio": 5, "may": 5, "mayo": 5,
+    "junho": 6, "june": 6, "junio": 6, "jun": 6,
+    "julho": 7, "july": 7, "julio": 7, "jul": 7,
+    "agosto": 8, "august": 8, "ago": 8, "aug": 8,
+    "setembro": 9, "september": 9, "septiembre": 9, "sep": 9, "sept": 9,
+    "outubro": 10, "october": 10, "octubre": 10, "oct": 10,
+    "novembro": 11, "november": 11, "noviembre": 11, "nov": 11,
+    "dezembro": 12, "december": 12, "diciembre": 12, "dec": 12, "dic": 12,
+}
+CURRENT_MONTH = re.compile(
+    r"\b(este|esse|neste|nesse|deste|desse|this) (mes|month)\b|\bmes atual\b"
+)
+PREVIOUS_MONTH = re.compile(r"\b(mes passado|mes pasado|last month|ultimo mes)\b")
+YEAR = re.compile(r"\b(?:19|20)\d{2}\b")
+LAST_YEAR = re.compile(r"\b(ano passado|ano pasado|ano anterior|last year|previous year)\b")
+THIS_YEAR = re.compile(r"\b((este|esse|neste|nesse|deste|desse) ano|this year)\b")
+
+# Words a lookup question may carry besides its rule phrase and month. Any other word
+# ("quanto gastei no *mercado*", "minha renda *aumentou*") means a question the
+# templates cannot answer.
+FILLER_WORDS = {
+    # Portuguese
+    "a", "o", "as", "os", "e", "eu", "em", "no", "na", "de", "do", "da", "dos", "das", "ao",
+    "meu", "minha", "meus", "minhas", "qual", "quais", "sao", "foi", "por", "favor", "mes",
+    "mensal", "atual", "ultimo", "este", "esse", "neste", "nesse", "total",
+    "valor", "oi", "ola", "me", "mostre", "mostrar", "diga",
+    # Spanish
+    "mi", "mis", "es", "el", "la", "los", "en", "del", "cual", "muestra", "dime",
+    # English
+    "i", "my", "is", "what", "the", "in", "on", "of", "for", "did", "month", "monthly",
+    "this", "per", "please", "show", "tell", "hi", "hello",
+}
+# "passado", "last" or "year" only qualify a month inside CURRENT_MONTH or
+# PREVIOUS_MONTH, which are removed before the filler check. Elsewhere ("abril do ano
+# passado", "my income last year") they change the period the templates would use.
+
+# Verbs that, right after a lookup phrase, make the message a statement about it
+# ("minha renda *é* 5000", "my income *is* lower now") rather than a question.
+STATEMENT_VERBS = {
+    "e", "eh", "foi", "era", "esta", "estao", "ficou", "is", "was", "are", "has",
+    "es", "son", "fue", "estan",
+}
+
+# Words that tell the message language apart when no rule matched.
+LANGUAGE_MARKERS = {
+    "pt": {"meu", "minha", "meus", "minhas", "quanto", "qual", "mes", "despesas", "renda",
+           "voce", "em", "do", "da", "foi"},
+    "es": {"mi", "mis", "cuanto", "cual", "es", "gastado", "ingreso", "sueldo", "en", "el"},
+    "en": {"my", "what", "how", "much", "is", "the", "in", "for", "expenses", "spending",
+           "income", "show", "list"},
+}
+
+
+class IntentMatch(NamedTuple):
+    """Classification of a user message."""
+    intent: str
+    confidence: float
+    language: str
+    # Slots the reply needs, e.g. ``month`` and ``year`` of a month total.
+    slots: Dict[str, int]
+
+
+def normalize(text: str) -> str:
+    """Lowercase ``text`` and strip its accents."""
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in normalized if not unicodedata.combining(char))
+
+
+def detect_language(words: list[str]) -> str:
+    scores = {
+        language: sum(word in markers for word in words)
+        for language, markers in LANGUAGE_MARKERS.items()
+    }
+    # Portuguese wins ties: it is the language most users write in.
+    return max(scores, key=lambda language: (scores[language], language == "pt"))
+
+
+def relative_year(text: str, today: Optional[datetime.date] = None) -> Optional[int]:
+    """Year named by "ano passado", "this year" and the like in a normalized message."""
+    today = today or datetime.date.today()
+    if LAST_YEAR.search(text):
+        return today.year - 1
+    if THIS_YEAR.search(text):
+        return today.year
+    return None
+
+
+def extract_periods(text: str, today: Optional[datetime.date] = None) -> list[Dict[str, int]]:
+    """
+    Every ``month`` and ``year`` mentioned in a normalized message, in order.
+
+    A month without a year takes the relative year of the message ("abril do ano
+    passado") or else its latest occurrence up to ``today``, as in the expense
+    queries (see ``month_year``): in January, "março" is last year's March. A month
+    named with several years gives one period per year.
+    """
+    today = today or datetime.date.today()
+    periods = []
+    if PREVIOUS_MONTH.search(text):
+        previous = today.replace(day=1) - datetime.timedelta(days=1)
+        periods.append({"month": previous.month, "year": previous.year})
+    if CURRENT_MONTH.search(text):
+        periods.append({"month": today.month, "year": today.year})
+
+    years = list(dict.fromkeys(int(year) for year in YEAR.findall(text)))
+    if not years and relative_year(text, today):
+        years = [relative_year(text, today)]
+    months = dict.fromkeys(MONTHS[word] for word in re.findall(r"\w+", text) if word in MONTHS)
+    for month in months:
+        for year in years or [None]:
+            period = {"month": month, "year": month_year(month, year, today)}
+            if period not in periods:
+                periods.append(period)
+    return periods
+
+
+def extract_month(text: str, today: Optional[datetime.date] = None) -> Dict[str, int]:
+    """
+    ``month`` and ``year`` mentioned in a normalized message, or ``{}`` if it names
+    no period or several, see ``extract_periods``.
+    """
+    periods = extract_periods(text, today)
+    return periods[0] if len(periods) == 1 else {}
+
+
+class IntentClassifier:
+    """
+    Nearest-example classifier over ``HashingEmbeddings`` vectors.
+
+    Each message is compared with every labelled example by cosine similarity; the
+    confidence is the similarity of the closest one. Fitting and predicting are local
+    and take well under a millisecond per message.
+
+    Args:
+        examples: Example messages per intent.
+    """
+
+    def __init__(self, examples: Dict[str, list[str]] = EXAMPLES):
+        self.embeddings = HashingEmbeddings(dimensions=1024)
+        self.labels = [intent for intent, texts in examples.items() for _ in texts]
+        self.vectors = np.array(self.embeddings.embed_documents(
+            [text for texts in examples.values() for text in texts]
+        ))
+
+    def predict(self, text: str) -> tuple[str, float]:
+        similarities = self.vectors @ np.array(self.embeddings.embed_query(text))
+        best = int(np.argmax(similarities))
+        return self.labels[best], float(similarities[best])
+
+
+def _is_filler(word: str) -> bool:
+    # Years go with a month; any other number is an amount the user is telling us.
+    return word in FILLER_WORDS or word in MONTHS or bool(YEAR.fullmatch(word))
+
+
+def _words_by_intent(examples: Dict[str, list[str]]) -> Dict[str, set[str]]:
+    return {
+        intent: {word for text in texts for word in re.findall(r"\w+", text)}
+        for intent, texts in examples.items()
+    }
+
+
+# Words a classifier match may carry besides the fillers: those of its own examples.
+INTENT_WORDS = _words_by_intent(EXAMPLES)
+
+
+def _only_rule_phrase(intent: str, text: str) -> bool:
+    """Whether ``text`` is a plain question: the intent's rule phrase and fillers."""
+    rest = text
+    for rule_intent, _, rule in RULES:
+        if rule_intent == intent:
+            rest = rule.sub(" | ", rest)
+    return all(_is_filler(word) for word in re.findall(r"\w+", rest)) \
+        and not re.search(r"\|\W*(%s)\b" % "|".join(STATEMENT_VERBS), rest)
+
+
+@lazy_singleton
+def get_classifier() -> IntentClassifier:
+    return IntentClassifier()
+
+
+def classify_intent(text: str, min_confidence: float = INTENT_MIN_CONFIDENCE) -> IntentMatch:
+    """
+    Classify a user message into one of the intents answered without the LLM.
+
+    Rules are tried first; a message matching exactly one intent gets confidence 1.
+    Otherwise the local classifier decides. Messages that are long, match several
+    intents, score below ``min_confidence``, carry words other than fillers and
+    those of the intent (an amount, "cancelar", "fixas"), state something about the
+    lookup ("minha renda é 5000"), name several periods or a relative year ("abril
+    e maio", "ano passado") or lack a required slot (the month of a month total) are
+    routed to ``INTENT_AGENT``.
+    """
+    text = normalize(text)
+    words = re.findall(r"\w+", text)
+    language = detect_language(words)
+    if not words or len(words) > INTENT_MAX_WORDS:
+        return IntentMatch(INTENT_AGENT, 0.0, language, {})
+
+    periods = extract_periods(text)
+    if len(periods) > 1 or relative_year(text) is not None:
+        # "abril e maio", "abril de 2023 e 2024", "minha renda do ano passado": the
+        # templates answer about a single month of this year or the last months.
+        return IntentMatch(INTENT_AGENT, 0.0, language, {})
+    # Their words would otherwise look like an unknown qualifier of the lookup.
+    text_without_period = CURRENT_MONTH.sub(" ", PREVIOUS_MONTH.sub(" ", text))
+
+    matches = [(intent, rule_language) for intent, rule_language, rule in RULES
+               if rule.search(text)]
+    if len({intent for intent, _ in matches}) > 1:
+        return IntentMatch(INTENT_AGENT, 0.0, language, {})
+    if matches:
+        intent, confidence = matches[0][0], 1.0
+        # Some phrases are the same in several languages ("ultimos gastos").
+        languages = [rule_language for _, rule_language in matches]
+        language = language if language in languages else languages[0]
+        if not _only_rule_phrase(intent, text_without_period):
+            return IntentMatch(INTENT_AGENT, 0.0, language, {})
+    else:
+        intent, confidence = get_classifier().predict(text)
+        if intent == INTENT_AGENT or confidence < min_confidence:
+            return IntentMatch(INTENT_AGENT, confidence, language, {})
+        if any(not _is_filler(word) and word not in INTENT_WORDS[intent]
+               for word in re.findall(r"\w+", text_without_period)):
+            return IntentMatch(INTENT_AGENT, confidence, language, {})
+
+    slots = periods[0] if periods else {}
+    if (intent == INTENT_MONTH_TOTAL) != bool(slots):
+        # A month total needs the month; a listing restricted to a month is a question
+        # the recent expenses cannot answer.
+        return IntentMatch(INTENT_AGENT, confidence, language, {})
+    return IntentMatch(intent, confidence, language, slots)
+
+
+TEMPLATES = {
+    "income": {
+        "pt": "Sua renda mensal cadastrada é {amount}.",
+        "es": "Tu ingreso mensual registrado es {amount}.",
+        "en": "Your registered monthly income is {amount}.",
+    },
+    "income_missing": {
+        "pt": "Você ainda não cadastrou sua renda mensal.",
+        "es": "Todavía no registraste tu ingreso mensual.",
+        "en": "You have not registered your monthly income yet.",
+    },
+    "month_total": {
+        "pt": "Em {period} você gastou {totals}.",
+        "es": "En {period} gastaste {totals}.",
+        "en": "In {period} you spent {totals}.",
+    },
+    "month_total_empty": {
+        "pt": "Não encontrei despesas em {period}.",
+        "es": "No encontré gastos en {period}.",
+        "en": "I found no expenses in {period}.",
+    },
+    "recent_expenses": {
+        "pt": "Suas despesas mais recentes:\n{lines}",
+        "es": "Tus gastos más recientes:\n{lines}",
+        "en": "Your most recent expenses:\n{lines}",
+    },
+    "recent_expenses_empty": {
+        "pt": "Você ainda não tem despesas registradas.",
+        "es": "Todavía no tienes gastos registrados.",
+        "en": "You have no expenses registered yet.",
+    },
+    "expenses": {
+        "pt": ("despesa", "despesas"), "es": ("gasto", "gastos"), "en": ("expense", "expenses")
+    },
+}
+RECENT_EXPENSES_SHOWN = 10
+
+
+def format_amount(value: float, language: str) -> str:
+    """``1,234.50`` in English, ``1.234,50`` in Portuguese and Spanish."""
+    text = f"{value:,.2f}"
+    if language == "en":
+        return text
+    return text.replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _rows(expenses) -> list[Dict[str, Any]]:
+    if isinstance(expenses, dict):
+        return [dict(zip(expenses["columns"], row, strict=True)) for row in expenses["rows"]]
+    return expenses
+
+
+def render_reply(match: IntentMatch, payload: Dict[str, Any]) -> str:
+    """Templated answer to ``match`` from the payload of its tool."""
+    language = match.language
+    if match.intent == INTENT_MONTHLY_INCOME:
+        if not payload.get("income"):
+            return TEMPLATES["income_missing"][language]
+        return TEMPLATES["income"][language].format(
+            amount=format_amount(payload["income"], language)
+        )
+
+    if match.intent == INTENT_MONTH_TOTAL:
+        period = f"{payload['month']:02d}/{payload['year']}"
+        if not payload["totals"]:
+            return TEMPLATES["month_total_empty"][language].format(period=period)
+        totals = "; ".join(
+            f"{format_amount(total['total'], language)} {total['currency']} "
+            f"({total['count']} {TEMPLATES['expenses'][language][total['count'] != 1]})"
+            for total in payload["totals"]
+        )
+        return TEMPLATES["month_total"][language].format(period=period, totals=totals)
+
+    rows = _rows(payload["expenses"])
+    if not rows:
+        return TEMPLATES["recent_expenses_empty"][language]
+    lines = "\n".join(
+        f"- {row['date'] or '-'}: {row['label']} "
+        f"{format_amount(row['value'], language)} {row['currency']}"
+        for row in rows[:RECENT_EXPENSES_SHOWN]
+    )
+    return TEMPLATES["recent_expenses"][language].format(lines=lines)
+
+
+def _tool_call(match: IntentMatch, user_id: int):
+    from .tools import (
+        search_expense_totals_by_month,
+        search_user_monthly_income,
+        search_user_recent_expenses,
+    )
+    if match.intent == INTENT_MONTHLY_INCOME:
+        return search_user_monthly_income, {"user_id": user_id}
+    if match.intent == INTENT_MONTH_TOTAL:
+        return search_expense_totals_by_month, {"user_id": user_id, **match.slots}
+    return search_user_recent_expenses, {"user_id": user_id}
+
+
+def answer_intent(match: IntentMatch, user_id: int) -> str:
+    """Answer a routed intent by calling its tool and rendering the template."""
+    tool, arguments = _tool_call(match, user_id)
+    return render_reply(match, tool.invoke(arguments))
+
+
+async def aanswer_intent(match: IntentMatch, user_id: int) -> str:
+    """Async version of ``answer_intent``, running the tool's async variant."""
+    tool, arguments = _tool_call(match, user_id)
+    return render_reply(match, await tool.ainvoke(arguments))
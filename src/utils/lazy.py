@@ -0,0 +1,46 @@
+import functools
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LazySingleton(Generic[T]):
+    """
+    Call ``factory`` once, on first use, and return the same object afterwards.
+
+    Used for the module-level connections and clients, so importing a module does
+    not open database files, load extensions or build API clients. Creation is
+    guarded by a lock: concurrent first calls still build a single instance.
+
+    Args:
+        factory: Builds the object, e.g. opens a connection.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        functools.update_wrapper(self, factory)
+        self.factory = factory
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+
+    def __call__(self) -> T:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self.factory()
+        return self._instance
+
+    def peek(self) -> Optional[T]:
+        """Return the instance if it was already created, without creating it."""
+        return self._instance
+
+    def reset(self) -> Optional[T]:
+        """Forget the instance, so the next call builds a new one; returns the old one."""
+        with self._lock:
+            instance, self._instance = self._instance, None
+        return instance
+
+
+def lazy_singleton(factory: Callable[[], T]) -> LazySingleton[T]:
+    """Decorator form of ``LazySingleton``."""
+    return LazySingleton(factory)
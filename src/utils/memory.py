@@ -0,0 +1,148 @@
+import asyncio
+import os
+import time
+from typing import NamedTuple, Optional
+
+from .tokens import count_tokens
+
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "800"))
+MEMORY_RECENT_LIMIT = int(os.getenv("MEMORY_RECENT_LIMIT", "6"))
+MEMORY_SIMILAR_LIMIT = int(os.getenv("MEMORY_SIMILAR_LIMIT", "5"))
+
+
+class Memory(NamedTuple):
+    """Conversation memory rendered for the system prompt."""
+    text: str
+    messages: int
+    tokens: int
+    timings: dict[str, float]
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def _format(row) -> str:
+    _, _, role, content, created_at, _ = row
+    return f"[{created_at}] {role}: {content}"
+
+
+def render_memory(
+    recent: list,
+    similar: list,
+    token_budget: int = MEMORY_TOKEN_BUDGET,
+    model: Optional[str] = None
+) -> tuple[str, int, int]:
+    """
+    Merge recent and similar conversation rows into the prompt's history block.
+
+    Rows are deduplicated by id and admitted in priority order, the newest recent
+    messages first and then the similar ones from the closest, until
+    ``token_budget`` is used up. The admitted rows are rendered in chronological
+    order. Returns the text, the number of messages and their token count.
+    """
+    candidates = {}
+    for row in [*recent, *similar]:
+        candidates.setdefault(row[0], row)
+
+    chosen = []
+    used = 0
+    for row in candidates.values():
+        tokens = count_tokens(_format(row), model)
+        if used + tokens > token_budget:
+            continue
+        used += tokens
+        chosen.append(row)
+
+    chosen.sort(key=lambda row: row[0])
+    return "\n".join(_format(row) for row in chosen), len(chosen), used
+
+
+def retrieve_memory(
+    user_id,
+    query: str,
+    recent_limit: int = MEMORY_RECENT_LIMIT,
+    similar_limit: int = MEMORY_SIMILAR_LIMIT,
+    token_budget: int = MEMORY_TOKEN_BUDGET,
+    model: Optional[str] = None
+) -> Memory:
+    """
+    Fetch the user's recent messages and the ones similar to ``query`` and render
+    them within ``token_budget`` tokens.
+
+    Both queries run on the messages store's single database thread, like the async
+    version, since its connections are shared. The recent messages are read while
+    ``query`` is embedded on the calling thread.
+
+    ``timings`` holds the latency in milliseconds of each stage: ``memory_recent_ms``,
+    ``memory_similar_ms`` (query embedding and vector search), ``memory_render_ms``
+    and ``memory_total_ms``.
+    """
+    from .messages_db_sqlite import (
+        _similar_messages_for_user,
+        executor,
+        get_embeddings,
+        get_recent_conversations,
+    )
+
+    start = time.perf_counter()
+    timings = {}
+
+    def timed(name, func, *args):
+        stage_start = time.perf_counter()
+        result = func(*args)
+        timings[name] = _elapsed_ms(stage_start)
+        return result
+
+    recent_future = executor.submit(
+        timed, "memory_recent_ms", get_recent_conversations, user_id, recent_limit
+    )
+    similar = []
+    if query:
+        similar_start = time.perf_counter()
+        vector = get_embeddings().embed_query(query)
+        similar = executor.submit(
+            _similar_messages_for_user, vector, user_id, similar_limit
+        ).result()
+        timings["memory_similar_ms"] = _elapsed_ms(similar_start)
+    recent = recent_future.result()
+
+    return _render(recent, similar, token_budget, model, start, timings)
+
+
+async def aretrieve_memory(
+    user_id,
+    query: str,
+    recent_limit: int = MEMORY_RECENT_LIMIT,
+    similar_limit: int = MEMORY_SIMILAR_LIMIT,
+    token_budget: int = MEMORY_TOKEN_BUDGET,
+    model: Optional[str] = None
+) -> Memory:
+    """Async version of ``retrieve_memory``."""
+    from .messages_db_sqlite import afind_similar_messages_for_user, aget_recent_conversations
+
+    start = time.perf_counter()
+    timings = {}
+
+    async def timed(name, coroutine):
+        stage_start = time.perf_counter()
+        result = await coroutine
+        timings[name] = _elapsed_ms(stage_start)
+        return result
+
+    stages = [timed("memory_recent_ms", aget_recent_conversations(user_id, recent_limit))]
+    if query:
+        stages.append(timed(
+            "memory_similar_ms", afind_similar_messages_for_user(query, user_id, similar_limit)
+        ))
+    recent, *similar = await asyncio.gather(*stages)
+
+    return _render(recent, similar[0] if similar else [], token_budget, model, start, timings)
+
+
+def _render(recent, similar, token_budget, model, start, timings) -> Memory:
+    render_start = time.perf_counter()
+    text, messages, tokens = render_memory(recent, similar, token_budget, model)
+    timings["memory_render_ms"] = _elapsed_ms(render_start)
+    timings["memory_total_ms"] = _elapsed_ms(start)
+    return Memory(text, messages, tokens, timings)
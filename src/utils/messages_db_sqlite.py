@@ -1,29 +1,230 @@
+import datetime
+import heapq
+import itertools
+import json
+import os
 import sqlite3
-import sqlite_vss
+import threading
 from typing import Optional
-from langchain_community.vectorstores import SQLiteVSS
-from langchain_openai import OpenAIEmbeddings
 from langchain_core.documents import Document
 
-sqlite_db = sqlite3.connect("messages_history.db")
-cursor = sqlite_db.cursor()
+from .db_executor import DBExecutor
+from .embedding_buffer import EmbeddingWriteBuffer
+from .lazy import lazy_singleton
+from .vector_index import UserVectorIndex
+
+MESSAGES_DB_PATH = os.getenv("MESSAGES_DB_PATH", "messages_history.db")
+MESSAGES_VECTOR_DB_PATH = os.getenv("MESSAGES_VECTOR_DB_PATH", "messages_history_vec.db")
+# Pointing both paths at the same file keeps conversations and their vectors in one
+# database: a message and its vector are written in a single transaction and
+# searches return conversation rows with one joined query.
+colocated = os.path.abspath(MESSAGES_VECTOR_DB_PATH) == os.path.abspath(MESSAGES_DB_PATH)
+
+executor = DBExecutor("messages-db", max_workers=1)
+# Serializes the vector index between the embedding buffer thread and searches.
+vss_lock = threading.Lock()
+
+# Answers of the agent cached by ``response_cache``, indexed by ``get_response_index``.
+CACHED_RESPONSES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cached_responses (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    query TEXT NOT NULL,
+    response TEXT NOT NULL,
+    data_version INTEGER NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+# Table written by the previous SQLiteVSS-based store and its ``vss0`` index, see
+# ``import_legacy_vectors``.
+LEGACY_VECTOR_TABLE = "embeddings"
+LEGACY_VECTOR_INDEX = f"vss_{LEGACY_VECTOR_TABLE}"
+
+
+# The connections, the sqlite-vss extension and the embeddings client are created on
+# first use, so importing this module stays cheap. Both connections are shared by the
+# whole module, so async callers are funneled through a single worker thread instead
+# of using them concurrently.
+@lazy_singleton
+def get_connection() -> sqlite3.Connection:
+    """Connection to the conversations database."""
+    connection = sqlite3.connect(MESSAGES_DB_PATH, check_same_thread=False)
+    if colocated:
+        _load_vss(connection)
+    return connection
+
+
+@lazy_singleton
+def get_vector_connection() -> sqlite3.Connection:
+    """Connection to the vector database, with sqlite-vss loaded."""
+    if colocated:
+        return get_connection()
+    connection = sqlite3.connect(MESSAGES_VECTOR_DB_PATH, check_same_thread=False)
+    _load_vss(connection)
+    return connection
+
+
+def _load_vss(connection: sqlite3.Connection):
+    import sqlite_vss
+    connection.enable_load_extension(True)
+    sqlite_vss.load(connection)
+    connection.enable_load_extension(False)
+
+
+@lazy_singleton
+def get_embeddings():
+    """Embeddings client selected by ``EMBEDDINGS_PROVIDER``."""
+    from .embeddings import create_embeddings
+    return create_embeddings()
+
+
+@lazy_singleton
+def get_message_index() -> UserVectorIndex:
+    """Per-user vector index of the conversations."""
+    return UserVectorIndex(get_vector_connection(), "messages")
+
 
-vss_connection = sqlite3.connect("messages_history_vec.db")
-vss_connection.enable_load_extension(True)
-vss_connection.row_factory = sqlite3.Row
-sqlite_vss.load(vss_connection)
+@lazy_singleton
+def get_response_index() -> UserVectorIndex:
+    """Per-user vector index of the cached answers, see ``response_cache``."""
+    connection = get_vector_connection()
+    with connection:
+        connection.execute(CACHED_RESPONSES_SCHEMA)
+    return UserVectorIndex(connection, "responses")
 
-embeddings = OpenAIEmbeddings()
-vectorstore = SQLiteVSS(
-    table="embeddings",
-    connection=vss_connection,
-    embedding=embeddings,
-    db_file="messages_history_vec.db",
+
+def _write_embeddings(documents: list[Document]):
+    vectors = get_embeddings().embed_documents(
+        [document.page_content for document in documents]
+    )
+    by_user: dict[int, list] = {}
+    for document, vector in zip(documents, vectors, strict=True):
+        metadata = document.metadata
+        by_user.setdefault(metadata["user_id"], []).append((metadata["message_id"], vector))
+    with vss_lock, get_vector_connection():
+        for user_id, user_vectors in by_user.items():
+            get_message_index().add(user_id, user_vectors)
+
+
+message_buffer = EmbeddingWriteBuffer(
+    _write_embeddings,
+    batch_size=int(os.getenv("MESSAGES_EMBED_BATCH_SIZE", "32")),
+    flush_interval=float(os.getenv("MESSAGES_EMBED_FLUSH_SECONDS", "2.0"))
 )
 
 
+def _ranked_conversations(
+    vector: list[float],
+    user_id,
+    limit: int,
+    condition: str = "",
+    params: tuple = ()
+) -> list[tuple[float, tuple]]:
+    """
+    Return up to ``limit`` ``(distance, conversation)`` pairs of ``user_id``, closest
+    first, keeping only the conversations that match the SQL ``condition``.
+
+    The search runs on the user's own vector partition and widens ``k`` until
+    ``limit`` conversations pass the condition or the partition is exhausted, so
+    selective filters never make the result come back short.
+    """
+    with vss_lock:
+        size = get_message_index().size(user_id)
+    search = _joined_search if colocated else _two_step_search
+    k = limit
+    while size and limit > 0:
+        ranked = search(vector, user_id, min(k, size), limit, condition, params)
+        if len(ranked) >= limit or k >= size:
+            return ranked
+        k *= 4
+    return []
+
+
+def _joined_search(vector, user_id, k, limit, condition, params) -> list[tuple[float, tuple]]:
+    # Colocated databases: vector search and conversation rows in one query.
+    with vss_lock:
+        rows = get_connection().execute(
+            f"""
+            SELECT hits.distance, conversations.*
+            FROM ({get_message_index().search_sql(user_id)}) AS hits
+            JOIN conversations ON conversations.id = hits.rowid
+            WHERE conversations.user_id = ? {condition}
+            ORDER BY hits.distance
+            LIMIT ?
+            """,
+            [json.dumps(vector), k, user_id, *params, limit]
+        ).fetchall()
+    return [(row[0], row[1:]) for row in rows]
+
+
+def _two_step_search(vector, user_id, k, limit, condition, params) -> list[tuple[float, tuple]]:
+    # Separate databases: nearest ids from the vector file, then their rows.
+    with vss_lock:
+        distances = dict(get_message_index().search(user_id, vector, k))
+    placeholders = ','.join(['?'] * len(distances))
+    rows = get_connection().execute(
+        f"""
+        SELECT * FROM conversations
+        WHERE id IN ({placeholders}) AND user_id = ? {condition}
+        """,
+        [*distances, user_id, *params]
+    ).fetchall()
+    ranked = sorted(((distances[row[0]], row) for row in rows), key=lambda hit: hit[0])
+    return ranked[:limit]
+
+
+def _search_conversations(vector: list[float], user_id, limit: int, condition: str = "", params=()):
+    # Only indexed messages are searched: the ones still in the write-behind buffer
+    # show up within MESSAGES_EMBED_FLUSH_SECONDS, and the latest turns are covered
+    # by get_recent_conversations meanwhile. Flushing here would put the pending
+    # embedding calls of every user back on the response path.
+    ranked = _ranked_conversations(vector, user_id, limit, condition, tuple(params))
+    return [row for _, row in ranked]
+
+
+# The searches below take the query vector, so the async variants can embed the query
+# outside the single database worker, concurrently with other database calls.
+def _similar_messages_for_user(vector, user_id, limit):
+    return _search_conversations(vector, user_id, limit)
+
+
+def _recent_similar_messages_by_date(vector, user_id, limit, time_limit_days):
+    # Calcular a data limite
+    date_limit = datetime.datetime.now() - datetime.timedelta(days=time_limit_days)
+    date_limit_str = date_limit.strftime('%Y-%m-%d %H:%M:%S')
+
+    return _search_conversations(
+        vector, user_id, limit, "AND created_at > ?", (date_limit_str,)
+    )
+
+
+def _similar_messages_by_topic(vector, topic_keywords, user_id, limit):
+    # Palavras-chave filtradas no SQL, dentro da partição vetorial do usuário
+    keywords = [keyword.lower() for keyword in topic_keywords]
+    if not keywords:
+        return []
+    condition = "AND (" + " OR ".join(
+        ["instr(lower(topic_summary), ?) > 0"] * len(keywords)
+    ) + ")"
+
+    if user_id:
+        return _search_conversations(vector, user_id, limit, condition, keywords)
+
+    # Sem usuário: busca em todas as partições e combina pelos mais próximos
+    with vss_lock:
+        user_ids = get_message_index().users()
+    ranked = heapq.merge(
+        *(_ranked_conversations(vector, uid, limit, condition, tuple(keywords))
+          for uid in user_ids),
+        key=lambda hit: hit[0]
+    )
+    return [row for _, row in itertools.islice(ranked, limit)]
+
+
 def create_conversations_table():
-    cursor.execute('''
+    sqlite_db = get_connection()
+    sqlite_db.execute('''
     CREATE TABLE IF NOT EXISTS conversations (
         id INTEGER PRIMARY KEY,
         user_id INTEGER,
@@ -41,29 +242,101 @@ def initialize_messages_database():
     This function should be called once to set up the database schema.
     """
     create_conversations_table()
-    # Ensure the vectorstore is initialized
-    vectorstore.create_table_if_not_exists()
+    import_legacy_vectors()
+
+
+def import_legacy_vectors() -> int:
+    """
+    Move the vectors of the former single-table ``SQLiteVSS`` store into the per-user
+    index, so existing history stays searchable without re-embedding it.
+
+    Runs once: the legacy table is dropped with the copy, and its ``vss_embeddings``
+    index once the copy is committed (also when an earlier import left it behind).
+    Returns the number of imported vectors.
+    """
+    vss_connection = get_vector_connection()
+    with vss_lock:
+        exists = vss_connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (LEGACY_VECTOR_TABLE,)
+        ).fetchone()
+        if not exists:
+            _drop_legacy_index(vss_connection)
+            return 0
+
+        by_user: dict[int, list] = {}
+        rows = vss_connection.execute(
+            f"SELECT metadata, text_embedding FROM {LEGACY_VECTOR_TABLE}"
+        )
+        for metadata, vector in rows:
+            metadata = json.loads(metadata or "{}")
+            if "user_id" in metadata and "message_id" in metadata:
+                by_user.setdefault(metadata["user_id"], []).append(
+                    (metadata["message_id"], json.loads(vector))
+                )
+        with vss_connection:
+            for user_id, user_vectors in by_user.items():
+                get_message_index().add(user_id, user_vectors)
+            vss_connection.execute(f"DROP TABLE {LEGACY_VECTOR_TABLE}")
+        _drop_legacy_index(vss_connection)
+        return sum(len(user_vectors) for user_vectors in by_user.values())
+
+
+def _drop_legacy_index(vss_connection: sqlite3.Connection):
+    # Nothing reads the old index any more; dropping the vss0 table drops its shadow
+    # tables too.
+    with vss_connection:
+        vss_connection.execute(f"DROP TABLE IF EXISTS {LEGACY_VECTOR_INDEX}")
+
 
 def add_message_with_embedding(user_id: int, role: str, content: str, topic_summary: str):
-    cursor.execute(
-        """
-        INSERT INTO conversations (user_id, role, content, topic_summary) VALUES (?, ?, ?, ?)
-        """,
-        (user_id, role, content, topic_summary)  # Fixed: removed the extra list brackets
-    )
-    message_id = cursor.lastrowid
-    sqlite_db.commit()
+    """
+    Store a chat message and queue its embedding.
+
+    The conversation row is committed immediately; the embedding and vector index
+    write happen in batches through ``message_buffer``, off the response path.
+    Call ``flush_message_embeddings`` to force them (e.g. on shutdown).
+
+    With colocated databases the message is embedded first and the row and its
+    vector are committed together, so a message is never stored without its vector.
+
+    Returns:
+        The ID of the stored message.
+    """
+    sqlite_db = get_connection()
+    if colocated:
+        vector = get_embeddings().embed_documents([content])[0]
+        with vss_lock, sqlite_db:
+            message_id = sqlite_db.execute(
+                """
+                INSERT INTO conversations (user_id, role, content, topic_summary)
+                VALUES (?, ?, ?, ?)
+                """,
+                (user_id, role, content, topic_summary)
+            ).lastrowid
+            get_message_index().add(user_id, [(message_id, vector)])
+        return message_id
+
+    with sqlite_db:
+        message_id = sqlite_db.execute(
+            """
+            INSERT INTO conversations (user_id, role, content, topic_summary) VALUES (?, ?, ?, ?)
+            """,
+            (user_id, role, content, topic_summary)  # Fixed: removed the extra list brackets
+        ).lastrowid
 
     document = Document(
         page_content=content,
         metadata={"user_id": user_id, "topic_summary": topic_summary, "message_id": message_id}
     )
+    message_buffer.add(document)
+
+    return message_id
 
-    documents = [document]
-    # Remove the ids parameter and let SQLiteVSS handle the IDs
-    ids = vectorstore.add_documents(documents)
 
-    return ids
+def flush_message_embeddings():
+    """Embed and index every message still waiting in the write-behind buffer."""
+    message_buffer.flush()
 
 
 def get_recent_conversations(user_id, limit=10):
@@ -78,7 +351,7 @@ def get_recent_conversations(user_id, limit=10):
     Returns:
         Lista de tuplas representando as conversas
     """
-    cursor.execute(
+    return get_connection().execute(
         """
         SELECT * FROM conversations
         WHERE user_id = ?
@@ -86,8 +359,7 @@ def get_recent_conversations(user_id, limit=10):
         LIMIT ?
         """,
         (user_id, limit)
-    )
-    return cursor.fetchall()
+    ).fetchall()
 
 
 def find_similar_messages_for_user(query, user_id, limit=5):
@@ -102,24 +374,7 @@ def find_similar_messages_for_user(query, user_id, limit=5):
     Returns:
         Lista de tuplas representando as conversas similares do usuário
     """
-    results = vectorstore.similarity_search(
-        query,
-        k=limit,
-        filter={"user_id": user_id}  # Filtrar por user_id
-    )
-
-    # Get message_ids from metadata
-    message_ids = [doc.metadata.get("message_id")
-                   for doc in results if "message_id" in doc.metadata]
-
-    if message_ids:
-        placeholders = ','.join(['?'] * len(message_ids))
-        cursor.execute(
-            f"SELECT * FROM conversations WHERE id IN ({placeholders})",
-            message_ids
-        )
-        return cursor.fetchall()
-    return []
+    return _similar_messages_for_user(get_embeddings().embed_query(query), user_id, limit)
 
 
 def find_recent_similar_messages_by_date(query, user_id, limit=5, time_limit_days=7):
@@ -135,36 +390,10 @@ def find_recent_similar_messages_by_date(query, user_id, limit=5, time_limit_day
     Returns:
         Lista de tuplas representando as conversas similares recentes do usuário
     """
-    # Calcular a data limite
-    import datetime
-    date_limit = datetime.datetime.now() - datetime.timedelta(days=time_limit_days)
-    date_limit_str = date_limit.strftime('%Y-%m-%d %H:%M:%S')
-
-    results = vectorstore.similarity_search(
-        query,
-        k=limit * 2,
-        filter={"user_id": user_id}
+    return _recent_similar_messages_by_date(
+        get_embeddings().embed_query(query), user_id, limit, time_limit_days
     )
 
-    message_ids = [doc.metadata.get("message_id")
-                   for doc in results if "message_id" in doc.metadata]
-
-    if message_ids:
-        placeholders = ','.join(['?'] * len(message_ids))
-        cursor.execute(
-            f"""
-            SELECT * FROM conversations
-            WHERE id IN ({placeholders})
-            AND user_id = ?
-            AND created_at > ?
-            ORDER BY id DESC
-            LIMIT ?
-            """,
-            message_ids + [user_id, date_limit_str, limit]
-        )
-        return cursor.fetchall()
-    return []
-
 
 def find_similar_messages_by_topic(
     query: str,
@@ -184,39 +413,57 @@ def find_similar_messages_by_topic(
     Returns:
         Lista de tuplas representando as conversas similares por tópico
     """
-    # Preparar filtro de metadata
-    metadata_filter = {}
-    if user_id:
-        metadata_filter["user_id"] = user_id
-
-    results = vectorstore.similarity_search(
-        query,
-        k=limit * 3,
-        filter=metadata_filter if metadata_filter else None
+    return _similar_messages_by_topic(
+        get_embeddings().embed_query(query), topic_keywords, user_id, limit
     )
 
-    filtered_results = []
-    for doc in results:
-        topic_summary = doc.metadata.get("topic_summary", "").lower()
-        if any(keyword.lower() in topic_summary for keyword in topic_keywords):
-            filtered_results.append(doc)
 
-        if len(filtered_results) >= limit:
-            break
+async def aadd_message_with_embedding(user_id: int, role: str, content: str, topic_summary: str):
+    """Async version of ``add_message_with_embedding``."""
+    return await executor.run(add_message_with_embedding, user_id, role, content, topic_summary)
 
-    message_ids = [doc.metadata.get("message_id")
-                   for doc in filtered_results[:limit] if "message_id" in doc.metadata]
 
-    if message_ids:
-        placeholders = ','.join(['?'] * len(message_ids))
-        cursor.execute(
-            f"SELECT * FROM conversations WHERE id IN ({placeholders})",
-            message_ids
-        )
-        return cursor.fetchall()
-    return []
+async def aget_recent_conversations(user_id, limit=10):
+    """Async version of ``get_recent_conversations``."""
+    return await executor.run(get_recent_conversations, user_id, limit)
+
+
+async def afind_similar_messages_for_user(query, user_id, limit=5):
+    """Async version of ``find_similar_messages_for_user``."""
+    vector = await get_embeddings().aembed_query(query)
+    return await executor.run(_similar_messages_for_user, vector, user_id, limit)
+
+
+async def afind_recent_similar_messages_by_date(query, user_id, limit=5, time_limit_days=7):
+    """Async version of ``find_recent_similar_messages_by_date``."""
+    vector = await get_embeddings().aembed_query(query)
+    return await executor.run(
+        _recent_similar_messages_by_date, vector, user_id, limit, time_limit_days
+    )
+
+
+async def afind_similar_messages_by_topic(
+    query: str,
+    topic_keywords: list[str],
+    user_id: Optional[str] = None,
+    limit: int = 5
+):
+    """Async version of ``find_similar_messages_by_topic``."""
+    vector = await get_embeddings().aembed_query(query)
+    return await executor.run(
+        _similar_messages_by_topic, vector, topic_keywords, user_id, limit
+    )
 
 
 def close_connections():
-    sqlite_db.close()
-    vss_connection.close()
+    """Flush pending embeddings and close the connections that were opened."""
+    message_buffer.close()
+    executor.shutdown()
+    vss_connection = get_vector_connection.reset()
+    sqlite_db = get_connection.reset()
+    get_message_index.reset()
+    get_response_index.reset()
+    if vss_connection is not None and vss_connection is not sqlite_db:
+        vss_connection.close()
+    if sqlite_db is not None:
+        sqlite_db.close()
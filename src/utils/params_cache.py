@@ -0,0 +1,82 @@
+import threading
+from typing import Any, Awaitable, Callable, Hashable
+
+from cachetools import TTLCache
+
+
+class ReadThroughCache:
+    """
+    Per-process read-through cache with TTL and LRU eviction.
+
+    Used for data that is read on most requests and rarely written, such as the
+    ``user_params`` rows. Writers call ``invalidate`` after committing, so this process
+    reads its own writes immediately; writes from other processes show up once the
+    entry expires after ``ttl`` seconds. Missing values (``None``) are cached too.
+
+    Args:
+        maxsize: Maximum number of cached entries; the least recently used go first.
+        ttl: Seconds an entry stays valid.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a load that raced with a write is not stored.
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: Hashable) -> tuple[bool, Any]:
+        """Return ``(True, value)`` on a hit, ``(False, generation)`` on a miss."""
+        with self._lock:
+            try:
+                value = self._cache[key]
+            except KeyError:
+                self.misses += 1
+                return False, self._generation
+            self.hits += 1
+            return True, value
+
+    def _store(self, key: Hashable, value: Any, generation: int):
+        with self._lock:
+            if generation == self._generation:
+                self._cache[key] = value
+
+    def get(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """Return the cached value of ``key``, calling ``load`` on a miss."""
+        hit, result = self._lookup(key)
+        if hit:
+            return result
+        value = load()
+        self._store(key, value, result)
+        return value
+
+    async def aget(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        """Async version of ``get``: hits return without leaving the event loop."""
+        hit, result = self._lookup(key)
+        if hit:
+            return result
+        value = await load()
+        self._store(key, value, result)
+        return value
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._generation += 1
+            self._cache.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def stats(self) -> dict[str, float]:
+        """Return the hit/miss counters, the hit rate and the number of cached entries."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._cache),
+            }
@@ -0,0 +1,163 @@
+import datetime
+import logging
+import os
+import re
+import time
+from typing import Optional
+
+from .intent_router import extract_periods, normalize, relative_year
+from .messages_db_sqlite import executor, get_embeddings, get_response_index, vss_lock
+
+logger = logging.getLogger(__name__)
+
+# Intent recorded for the turns answered from the cache.
+INTENT_CACHED = "cached"
+
+# Largest sqlite-vss distance (squared L2) between two queries sharing an answer. With
+# normalized embeddings it is 2 - 2 * cosine, so 0.1 means a cosine of at least 0.95.
+RESPONSE_CACHE_MAX_DISTANCE = float(os.getenv("RESPONSE_CACHE_MAX_DISTANCE", "0.1"))
+# Seconds an answer stays valid; answers are also dropped when the day changes, since
+# "this month" or "today" do not mean the same thing the next day.
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(6 * 60 * 60)))
+# Shorter messages ("and in May?", "yes") depend on the conversation, not only on the
+# user's data, so they are neither looked up nor cached.
+RESPONSE_CACHE_MIN_WORDS = int(os.getenv("RESPONSE_CACHE_MIN_WORDS", "4"))
+# Nearest cached queries checked for a valid answer.
+RESPONSE_CACHE_CANDIDATES = 4
+
+
+def cacheable(query: str) -> bool:
+    """Whether answers to ``query`` may be served from, and written to, the cache."""
+    return len(query.split()) >= RESPONSE_CACHE_MIN_WORDS
+
+
+def _slots(query: str) -> tuple:
+    """
+    The periods and the numbers a query refers to. Embeddings barely tell "April" from
+    "May", "this year" from "last year" or 100 from 1000, so two queries only share
+    an answer if these are equal.
+    """
+    text = normalize(query)
+    periods = [(period["month"], period["year"]) for period in extract_periods(text)]
+    return periods, relative_year(text), sorted(re.findall(r"\d+", text))
+
+
+def _fresh(created_at: float, now: float) -> bool:
+    if now - created_at > RESPONSE_CACHE_TTL:
+        return False
+    return datetime.date.fromtimestamp(created_at) == datetime.date.fromtimestamp(now)
+
+
+def _find(vector: list[float], user_id: int, query: str, data_version: int) -> Optional[str]:
+    now = time.time()
+    slots = _slots(query)
+    with vss_lock:
+        index = get_response_index()
+        hits = [
+            (rowid, distance)
+            for rowid, distance in index.search(user_id, vector, RESPONSE_CACHE_CANDIDATES)
+            if distance <= RESPONSE_CACHE_MAX_DISTANCE
+        ]
+        if not hits:
+            return None
+        placeholders = ", ".join("?" * len(hits))
+        rows = index.connection.execute(
+            f"""
+            SELECT id, query, response, created_at FROM cached_responses
+            WHERE id IN ({placeholders}) AND user_id = ? AND data_version = ?
+            """,
+            (*(rowid for rowid, _ in hits), user_id, data_version)
+        ).fetchall()
+    valid = {
+        row[0]: row[2] for row in rows if _fresh(row[3], now) and _slots(row[1]) == slots
+    }
+    for rowid, _ in hits:
+        if rowid in valid:
+            return valid[rowid]
+    return None
+
+
+def _store(vector: list[float], user_id: int, query: str, response: str, data_version: int):
+    now = time.time()
+    with vss_lock:
+        index = get_response_index()
+        with index.connection:
+            # Answers computed from older data or past their TTL can never hit again.
+            stale = [
+                row[0]
+                for row in index.connection.execute(
+                    """
+                    SELECT id FROM cached_responses
+                    WHERE user_id = ? AND (data_version != ? OR created_at < ?)
+                    """,
+                    (user_id, data_version, now - RESPONSE_CACHE_TTL)
+                )
+            ]
+            if stale:
+                index.remove(user_id, stale)
+                index.connection.executemany(
+                    "DELETE FROM cached_responses WHERE id = ?", [(rowid,) for rowid in stale]
+                )
+            rowid = index.connection.execute(
+                """
+                INSERT INTO cached_responses (user_id, query, response, data_version, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (user_id, query, response, data_version, now)
+            ).lastrowid
+            index.add(user_id, [(rowid, vector)])
+    return rowid
+
+
+def find_cached_response(user_id: int, query: str, data_version: int) -> Optional[str]:
+    """
+    Return a cached answer to a query close enough to ``query``.
+
+    Only answers stored by the same user, from the same ``data_version`` of their
+    expenses and parameters (see ``get_user_data_version``), within the TTL and on
+    the same day are returned, so a write by the user invalidates every answer
+    computed before it. The cached query must also mention the same months, years
+    and numbers as ``query``.
+
+    Args:
+        user_id: ID of the user asking.
+        query: The user's message.
+        data_version: Current version of the user's data.
+
+    Returns:
+        The cached answer, or None on a miss.
+    """
+    if not cacheable(query):
+        return None
+    return _find(get_embeddings().embed_query(query), user_id, query, data_version)
+
+
+def cache_response(user_id: int, query: str, response: str, data_version: int) -> Optional[int]:
+    """
+    Cache the agent's answer to ``query``, computed from ``data_version`` of the user's
+    data. The user's stale entries are dropped in the same transaction.
+
+    Returns:
+        The ID of the cached entry, or None when the query is not cacheable.
+    """
+    if not cacheable(query) or not response:
+        return None
+    return _store(get_embeddings().embed_query(query), user_id, query, response, data_version)
+
+
+async def afind_cached_response(user_id: int, query: str, data_version: int) -> Optional[str]:
+    """Async version of ``find_cached_response``."""
+    if not cacheable(query):
+        return None
+    vector = await get_embeddings().aembed_query(query)
+    return await executor.run(_find, vector, user_id, query, data_version)
+
+
+async def acache_response(
+    user_id: int, query: str, response: str, data_version: int
+) -> Optional[int]:
+    """Async version of ``cache_response``."""
+    if not cacheable(query) or not response:
+        return None
+    vector = await get_embeddings().aembed_query(query)
+    return await executor.run(_store, vector, user_id, query, response, data_version)
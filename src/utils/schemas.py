@@ -1,8 +1,43 @@
-from typing import Annotated, TypedDict
+from typing import Annotated, Optional, TypedDict
 from langgraph.graph.message import add_messages
+from langgraph.prebuilt.chat_agent_executor import AgentState
+
+# Key marking the timings written by the first node of a turn.
+NEW_TURN = "new_turn"
+
+
+def merge_timings(current: dict[str, float], update: dict[str, float]) -> dict[str, float]:
+    """
+    Merge the stage latencies written by the nodes of a turn.
+
+    Threads are checkpointed, so an update marked with ``NEW_TURN`` replaces the
+    previous turn's timings instead of adding to them.
+    """
+    if NEW_TURN in update:
+        return {key: value for key, value in update.items() if key != NEW_TURN}
+    return {**(current or {}), **update}
 
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
     user_id: int
     user_name: str
+    # Conversation memory rendered into the system prompt by the memory node.
+    memory: str
+    # Rolling summary of the turns trimmed from the context window.
+    summary: str
+    # Intent of the latest message; "agent" when it is answered by the LLM agent.
+    intent: str
+    # Version of the user's data the turn's answer is computed from, see
+    # ``get_user_data_version``; None when the answer must not be cached.
+    data_version: Optional[int]
+    # Latency in milliseconds of each stage of the turn, merged across nodes.
+    timings: Annotated[dict[str, float], merge_timings]
+
+
+class FinanceAgentState(AgentState):
+    """State of the inner ReAct agent, carrying the per-user prompt fields."""
+    user_id: int
+    user_name: str
+    memory: str
+    summary: str
@@ -0,0 +1,133 @@
+import contextlib
+import contextvars
+import queue
+import sqlite3
+import threading
+from typing import Callable, Iterator, Optional
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class SQLiteConnectionPool:
+    """
+    Bounded pool of SQLite connections shared by the threads and tasks of a process.
+
+    Each caller checks a connection out for the duration of a ``with pool.connection()``
+    block, so a connection is never used by two threads at the same time. Nested
+    blocks in the same thread (or asyncio task) reuse the connection that is already
+    checked out instead of taking a second one from the pool.
+
+    Connections are opened lazily in WAL mode with a ``busy_timeout``, so readers
+    never block the writer, and with a per-connection prepared statement cache.
+
+    Args:
+        database: Path of the SQLite database file.
+        size: Maximum number of open connections.
+        timeout: Seconds to wait for a free connection before giving up.
+        busy_timeout_ms: How long SQLite retries a locked database before failing.
+        cached_statements: Number of prepared statements cached per connection.
+        on_connect: Optional hook run on every new connection (e.g. to load extensions).
+    """
+
+    def __init__(
+        self,
+        database: str,
+        size: int = 5,
+        timeout: float = 30.0,
+        busy_timeout_ms: int = 5000,
+        cached_statements: int = 256,
+        on_connect: Optional[Callable[[sqlite3.Connection], None]] = None
+    ):
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self.on_connect = on_connect
+
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue(maxsize=size)
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._current: contextvars.ContextVar[Optional[sqlite3.Connection]] = (
+            contextvars.ContextVar(f"sqlite_pool_{id(self)}", default=None)
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        if self.on_connect is not None:
+            self.on_connect(conn)
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeoutError(
+                f"no connection to {self.database} available after {self.timeout}s"
+            ) from None
+
+    def _release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Check a connection out of the pool.
+
+        Use ``with pool.connection() as conn, conn:`` to also wrap the block in a
+        transaction that commits on success and rolls back on error.
+        """
+        held = self._current.get()
+        if held is not None:
+            yield held
+            return
+
+        conn = self._acquire()
+        token = self._current.set(conn)
+        try:
+            yield conn
+        finally:
+            self._current.reset(token)
+            self._release(conn)
+
+    def close(self):
+        """Close every idle connection; connections still checked out go back to the pool."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
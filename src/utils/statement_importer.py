@@ -0,0 +1,347 @@
+"""
+Streaming importer of bank statements (CSV and OFX) into the ``expenses`` table.
+
+Statements are read line by line through generators and written with
+``add_user_expenses_bulk`` in batches, so memory use does not grow with the file.
+Every line gets a content hash stored in ``expenses.import_hash``; lines whose hash
+was already imported for the user are skipped, which makes re-importing a statement,
+or an overlapping one, idempotent.
+
+Usage:
+    python -m src.utils.statement_importer --user-id 1 extrato.csv [--format ofx]
+"""
+import argparse
+import csv
+import datetime
+import itertools
+import os
+import re
+import time
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import xxhash
+
+from .expenses_db_sqlite import add_user_expenses_bulk, create_expenses_table, find_imported_hashes
+
+CSV_DATE_COLUMNS = ("date", "data", "fecha", "dt", "data lançamento", "data lancamento")
+CSV_DESCRIPTION_COLUMNS = (
+    "description", "descrição", "descricao", "histórico", "historico",
+    "memo", "label", "lançamento", "lancamento"
+)
+CSV_AMOUNT_COLUMNS = ("amount", "valor", "value", "importe", "montant")
+DATE_FORMATS_DAY_FIRST = ("%Y-%m-%d", "%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y", "%d.%m.%Y", "%Y%m%d")
+DATE_FORMATS_MONTH_FIRST = ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%m-%d-%Y", "%Y%m%d")
+
+OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+class Transaction(NamedTuple):
+    date: str
+    amount: float
+    description: str
+    currency: str
+    fitid: Optional[str] = None
+
+
+class ImportReport(NamedTuple):
+    read: int
+    inserted: int
+    duplicates: int
+    skipped: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.read / self.seconds if self.seconds else float(self.read)
+
+
+def parse_amount(raw: str) -> float:
+    """
+    Parse a money amount written in either Brazilian or English notation.
+
+    Handles currency symbols, ``1.234,56``, ``1,234.56``, trailing minus signs
+    and accounting parentheses for negative values.
+    """
+    text = raw.strip()
+    negative = text.startswith("(") and text.endswith(")")
+    text = re.sub(r"[^\d,.\-]", "", text)
+    if text.startswith("-") or text.endswith("-"):
+        negative = True
+    text = text.strip("-")
+    decimal_match = re.search(r"([,.])\d{1,2}$", text)
+    if "," in text and "." in text:
+        decimal = "," if text.rfind(",") > text.rfind(".") else "."
+    else:
+        decimal = decimal_match.group(1) if decimal_match else None
+    thousands = {",", "."} - {decimal}
+    for separator in thousands:
+        text = text.replace(separator, "")
+    if decimal == ",":
+        text = text.replace(",", ".")
+    if not text:
+        raise ValueError(f"invalid amount: {raw!r}")
+    value = float(text)
+    return -value if negative else value
+
+
+def parse_date(raw: str, dayfirst: bool = True) -> str:
+    """Parse a statement date into ``YYYY-MM-DD``."""
+    text = raw.strip()
+    formats = DATE_FORMATS_DAY_FIRST if dayfirst else DATE_FORMATS_MONTH_FIRST
+    for date_format in formats:
+        try:
+            return datetime.datetime.strptime(text, date_format).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"invalid date: {raw!r}")
+
+
+def parse_ofx_date(raw: str) -> str:
+    """Parse an OFX ``DTPOSTED`` value (``YYYYMMDD[HHMMSS[.XXX]][[TZ]]``)."""
+    return datetime.datetime.strptime(raw.strip()[:8], "%Y%m%d").date().isoformat()
+
+
+def _find_column(fieldnames: list[str], candidates: tuple[str, ...]) -> str:
+    normalized = {name.strip().lstrip("\ufeff").lower(): name for name in fieldnames if name}
+    for candidate in candidates:
+        if candidate in normalized:
+            return normalized[candidate]
+    raise ValueError(f"none of the columns {candidates} found in {fieldnames}")
+
+
+def iter_csv_transactions(
+    lines: Iterable[str],
+    currency: str = "BRL",
+    dayfirst: bool = True,
+    delimiter: Optional[str] = None
+) -> Iterator[Transaction]:
+    """
+    Yield the transactions of a CSV statement.
+
+    The date, description and amount columns are detected from the header in
+    Portuguese, English, Spanish or French; the delimiter is sniffed when not given.
+    """
+    lines = iter(lines)
+    if delimiter is None:
+        head = list(itertools.islice(lines, 5))
+        delimiter = csv.Sniffer().sniff("".join(head), delimiters=",;\t|").delimiter
+        lines = itertools.chain(head, lines)
+
+    reader = csv.DictReader(lines, delimiter=delimiter)
+    fieldnames = list(reader.fieldnames or [])
+    date_column = _find_column(fieldnames, CSV_DATE_COLUMNS)
+    description_column = _find_column(fieldnames, CSV_DESCRIPTION_COLUMNS)
+    amount_column = _find_column(fieldnames, CSV_AMOUNT_COLUMNS)
+
+    for row in reader:
+        if not row.get(date_column) or not row.get(amount_column):
+            continue
+        yield Transaction(
+            date=parse_date(row[date_column], dayfirst),
+            amount=parse_amount(row[amount_column]),
+            description=" ".join((row.get(description_column) or "").split()),
+            currency=currency
+        )
+
+
+def iter_ofx_tags(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """
+    Yield ``(tag, value)`` pairs of an OFX document, closing tags as ``("/TAG", "")``.
+
+    Works for both SGML (OFX 1.x, unclosed leaf tags) and XML (OFX 2.x) files and for
+    documents written on a single line, keeping only the unfinished tag in memory.
+    """
+    pending = ""
+    for line in lines:
+        pending += line
+        last_tag = pending.rfind("<")
+        if last_tag <= 0:
+            continue
+        for match in OFX_TAG.finditer(pending, 0, last_tag):
+            closing, tag, value = match.groups()
+            yield ("/" if closing else "") + tag.upper(), value.strip()
+        pending = pending[last_tag:]
+    for match in OFX_TAG.finditer(pending):
+        closing, tag, value = match.groups()
+        yield ("/" if closing else "") + tag.upper(), value.strip()
+
+
+def iter_ofx_transactions(lines: Iterable[str], currency: str = "BRL") -> Iterator[Transaction]:
+    """Yield the ``<STMTTRN>`` transactions of an OFX statement."""
+    fields: Optional[dict[str, str]] = None
+    for tag, value in iter_ofx_tags(lines):
+        if tag == "CURDEF" and value:
+            currency = value
+        elif tag == "STMTTRN":
+            fields = {}
+        elif tag == "/STMTTRN" and fields is not None:
+            yield Transaction(
+                date=parse_ofx_date(fields["DTPOSTED"]),
+                amount=parse_amount(fields["TRNAMT"]),
+                description=" ".join((fields.get("MEMO") or fields.get("NAME") or "").split()),
+                currency=currency,
+                fitid=fields.get("FITID")
+            )
+            fields = None
+        elif fields is not None and value:
+            fields[tag] = value
+
+
+def transaction_hash(transaction: Transaction, occurrence: int) -> str:
+    """
+    Content hash identifying a statement line across imports.
+
+    ``occurrence`` numbers identical lines of the same day, so two equal purchases
+    on the same date are kept as two expenses instead of being deduplicated.
+    """
+    key = "|".join((
+        transaction.fitid or "",
+        transaction.date,
+        f"{transaction.amount:.2f}",
+        transaction.currency,
+        transaction.description.lower(),
+        str(occurrence)
+    ))
+    return xxhash.xxh3_128_hexdigest(key.encode("utf-8"))
+
+
+def iter_statement_expenses(
+    transactions: Iterable[Transaction],
+    include_credits: bool = False
+) -> Iterator[Optional[dict]]:
+    """
+    Convert transactions to expense dicts with their ``import_hash``.
+
+    Debits become expenses with a positive ``value``. Credits yield ``None`` (and
+    are counted as skipped) unless ``include_credits`` is set.
+    """
+    current_date = None
+    occurrences: dict[str, int] = {}
+    for transaction in transactions:
+        # Statements are ordered by date, so occurrence counters only need to live for
+        # one day, which keeps memory bounded by the busiest day of the statement.
+        if transaction.date != current_date:
+            current_date = transaction.date
+            occurrences.clear()
+        key = f"{transaction.fitid}|{transaction.amount}|{transaction.description}"
+        occurrence = occurrences.get(key, 0)
+        occurrences[key] = occurrence + 1
+
+        if transaction.amount >= 0 and not include_credits:
+            yield None
+            continue
+        yield {
+            "label": transaction.description or "Statement line",
+            "value": abs(transaction.amount),
+            "currency": transaction.currency,
+            "recurrent": 0,
+            "installments": 0,
+            "expiring_date": transaction.date,
+            "import_hash": transaction_hash(transaction, occurrence)
+        }
+
+
+def import_statement_lines(
+    user_id: int,
+    lines: Iterable[str],
+    statement_format: str,
+    currency: str = "BRL",
+    batch_size: int = 1000,
+    dayfirst: bool = True,
+    include_credits: bool = False
+) -> ImportReport:
+    """
+    Import an already opened CSV or OFX statement for a user.
+
+    Args:
+        user_id (int): The ID of the user.
+        lines (Iterable[str]): The lines of the statement.
+        statement_format (str): ``"csv"`` or ``"ofx"``.
+        currency (str): Currency of CSV statements and OFX files without ``CURDEF``.
+        batch_size (int): Number of expenses written per transaction.
+        dayfirst (bool): Whether ambiguous CSV dates are ``DD/MM`` (the default).
+        include_credits (bool): Also import incoming money as expenses.
+
+    Returns:
+        ImportReport: Counters and elapsed time of the import.
+    """
+    if statement_format == "csv":
+        transactions = iter_csv_transactions(lines, currency=currency, dayfirst=dayfirst)
+    elif statement_format == "ofx":
+        transactions = iter_ofx_transactions(lines, currency=currency)
+    else:
+        raise ValueError(f"unsupported statement format: {statement_format}")
+
+    start = time.perf_counter()
+    read = inserted = duplicates = skipped = 0
+    expenses = iter_statement_expenses(transactions, include_credits)
+    while batch := list(itertools.islice(expenses, batch_size)):
+        read += len(batch)
+        rows = [expense for expense in batch if expense is not None]
+        skipped += len(batch) - len(rows)
+
+        existing = find_imported_hashes(user_id, (row["import_hash"] for row in rows))
+        new_rows = []
+        for row in rows:
+            if row["import_hash"] in existing:
+                continue
+            existing.add(row["import_hash"])
+            new_rows.append(row)
+        duplicates += len(rows) - len(new_rows)
+
+        add_user_expenses_bulk(user_id, new_rows, chunk_size=batch_size)
+        inserted += len(new_rows)
+
+    return ImportReport(read, inserted, duplicates, skipped, time.perf_counter() - start)
+
+
+def import_statement(
+    user_id: int,
+    path: str,
+    statement_format: Optional[str] = None,
+    encoding: str = "utf-8-sig",
+    **kwargs
+) -> ImportReport:
+    """
+    Import a CSV or OFX statement file for a user.
+
+    The format is taken from the file extension unless ``statement_format`` is given;
+    the remaining keyword arguments are passed to ``import_statement_lines``.
+    """
+    statement_format = statement_format or os.path.splitext(path)[1].lstrip(".").lower()
+    with open(path, encoding=encoding, errors="replace", newline="") as statement:
+        return import_statement_lines(user_id, statement, statement_format, **kwargs)
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Import a bank statement into the expenses table.")
+    parser.add_argument("path", help="CSV or OFX statement file")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--format", choices=("csv", "ofx"), dest="statement_format")
+    parser.add_argument("--currency", default="BRL")
+    parser.add_argument("--encoding", default="utf-8-sig")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--monthfirst", action="store_true", help="CSV dates are MM/DD")
+    parser.add_argument("--include-credits", action="store_true")
+    args = parser.parse_args(argv)
+
+    create_expenses_table()
+    report = import_statement(
+        args.user_id,
+        args.path,
+        statement_format=args.statement_format,
+        encoding=args.encoding,
+        currency=args.currency,
+        batch_size=args.batch_size,
+        dayfirst=not args.monthfirst,
+        include_credits=args.include_credits
+    )
+    print(
+        f"read {report.read} lines: {report.inserted} inserted, "
+        f"{report.duplicates} duplicates, {report.skipped} credits skipped "
+        f"in {report.seconds:.2f}s ({report.rows_per_second:,.0f} rows/sec)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import functools
+import logging
+from collections.abc import Sequence
+from typing import Optional
+
+from langchain_core.messages import BaseMessage
+
+logger = logging.getLogger(__name__)
+
+# Encoding of the gpt-4o / gpt-4.1 family, used for models tiktoken does not know yet.
+DEFAULT_ENCODING = "o200k_base"
+# Per-message overhead of the chat format (role and separators), from OpenAI's guide.
+TOKENS_PER_MESSAGE = 3
+# Rough characters per token, used when no tiktoken encoding can be loaded.
+CHARS_PER_TOKEN = 4
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(model: Optional[str] = None):
+    """
+    Return the tiktoken encoding of ``model``, or ``None`` if it cannot be loaded.
+
+    tiktoken downloads encodings on first use; without network access (and no
+    ``TIKTOKEN_CACHE_DIR``) token counts fall back to a length-based estimate.
+    """
+    import tiktoken
+
+    try:
+        if model:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                pass
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception:
+        logger.warning("tiktoken encoding unavailable, estimating token counts from length")
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Number of tokens of ``text`` for ``model``."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: Sequence[BaseMessage], model: Optional[str] = None) -> int:
+    """Approximate prompt tokens of chat ``messages``, including the chat format overhead."""
+    total = 0
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        total += TOKENS_PER_MESSAGE + count_tokens(content, model)
+        for tool_call in getattr(message, "tool_calls", None) or ():
+            total += count_tokens(f"{tool_call['name']}{tool_call['args']}", model)
+    return total
@@ -1,5 +1,7 @@
 from typing import Dict, Any, Optional
-from langchain_core.tools import tool
+import base64
+import json
+from langchain_core.tools import StructuredTool, tool
 
 import sys
 import os
@@ -11,10 +13,84 @@ from utils.expenses_db_sqlite import (
     get_user_monthly_income,
     get_recent_user_expenses,
     get_expenses_by_month,
-    add_user_expense
+    get_monthly_expense_totals,
+    add_user_expense,
+    add_user_expenses_bulk,
+    aget_user_monthly_income,
+    aget_recent_user_expenses,
+    aget_expenses_by_month,
+    aget_monthly_expense_totals,
+    aadd_user_expense,
+    aadd_user_expenses_bulk,
+    serialize_expenses,
+    month_year,
+    EXPENSES_PAGE_SIZE
+)
+from utils.expense_analytics import (
+    spending_report,
+    expense_to_income_report,
+    aspending_report,
+    aexpense_to_income_report
 )
 # Importing message-related utilities for future use
 
+# "columns" writes the expense field names once per result, "records" once per expense.
+EXPENSES_RESULT_FORMAT = os.getenv("EXPENSES_RESULT_FORMAT", "columns")
+
+
+def async_variant(sync_tool: StructuredTool):
+    """
+    Register the decorated coroutine as the async implementation of ``sync_tool``.
+
+    The tool keeps a single name and schema for the model; ``invoke`` runs the sync
+    function and ``ainvoke`` (used by ``finance_agent.ainvoke``/``astream``) awaits
+    the coroutine, which does its I/O off the event loop.
+    """
+    def decorator(coroutine):
+        sync_tool.coroutine = coroutine
+        return coroutine
+    return decorator
+
+
+def _income_payload(income: float | None) -> Dict[str, Any]:
+    return {
+        "message": "Monthly income retrieved successfully",
+        "income": income if income is not None else 0.0
+    }
+
+
+def encode_cursor(expense) -> str:
+    """Opaque token pointing after ``expense`` in the expense listings."""
+    payload = json.dumps([expense.expiring_date, expense.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> tuple[Optional[str], Optional[int]]:
+    """
+    Return the ``(after_expiring_date, after_id)`` of a token from ``encode_cursor``.
+
+    Raises:
+        ValueError: If the token was not produced by ``encode_cursor``.
+    """
+    if not cursor:
+        return None, None
+    try:
+        expiring_date, expense_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return expiring_date, int(expense_id)
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"invalid cursor {cursor!r}") from error
+
+
+def _expenses_payload(message: str, expenses: list) -> Dict[str, Any]:
+    # Listings fetch one expense more than a page to know whether another page exists.
+    page = expenses[:EXPENSES_PAGE_SIZE]
+    return {
+        "message": message,
+        "count": len(page),
+        "expenses": serialize_expenses(page, columnar=EXPENSES_RESULT_FORMAT == "columns"),
+        "next_cursor": encode_cursor(page[-1]) if len(expenses) > len(page) else None
+    }
+
 @tool
 def search_user_monthly_income(user_id: int) -> Dict[str, Any]:
     """
@@ -25,46 +101,201 @@ def search_user_monthly_income(user_id: int) -> Dict[str, Any]:
     Returns:
     - The user's monthly income as a float
     """
-    income = get_user_monthly_income(user_id)
-    return {
-        "message": "Monthly income retrieved successfully",
-        "income": income if income is not None else 0.0
-    }
+    return _income_payload(get_user_monthly_income(user_id))
+
+
+@async_variant(search_user_monthly_income)
+async def asearch_user_monthly_income(user_id: int) -> Dict[str, Any]:
+    return _income_payload(await aget_user_monthly_income(user_id))
 
 
 @tool
-def search_user_recent_expenses(user_id: int) -> Dict[str, Any]:
+def search_user_recent_expenses(user_id: int, cursor: Optional[str] = None) -> Dict[str, Any]:
     """
     Search for the user's expenses
     Use this tool to find the user's recent expenses not filtered by month
+    Results come in pages; when next_cursor is not null, call again with it to get
+    the older expenses
     Params:
     - user_id: The user id
+    - cursor: The next_cursor of the previous page, omit it for the first page
     """
-    expenses = get_recent_user_expenses(user_id)
-    return {
-        "message": "Recent expenses retrieved successfully",
-        "count": len(expenses),
-        "expenses": expenses if expenses else []
-    }
+    try:
+        after = decode_cursor(cursor)
+    except ValueError as error:
+        return {"status": "error", "message": str(error)}
+    expenses = get_recent_user_expenses(user_id, *after, limit=EXPENSES_PAGE_SIZE + 1)
+    return _expenses_payload("Recent expenses retrieved successfully", expenses)
+
+
+@async_variant(search_user_recent_expenses)
+async def asearch_user_recent_expenses(
+    user_id: int,
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    try:
+        after = decode_cursor(cursor)
+    except ValueError as error:
+        return {"status": "error", "message": str(error)}
+    expenses = await aget_recent_user_expenses(user_id, *after, limit=EXPENSES_PAGE_SIZE + 1)
+    return _expenses_payload("Recent expenses retrieved successfully", expenses)
 
 
 @tool
-def search_expense_by_month(user_id: int, month: int) -> Dict[str, Any]:
+def search_expense_by_month(
+    user_id: int,
+    month: int,
+    year: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Search for the user's expenses by month
     Use this tool to filter the expenses by month
+    Results come in pages; when next_cursor is not null, call again with it to get
+    the rest of the month
     Params:
     - user_id: The user id
     - month: The month to filter the income by (1-12)
+    - year: The year of the month (e.g. 2025), defaults to the latest past occurrence
+      of the month (December asked in January is December of the previous year)
+    - cursor: The next_cursor of the previous page, omit it for the first page
     """
-    expenses = get_expenses_by_month(user_id, month)
+    try:
+        after = decode_cursor(cursor)
+    except ValueError as error:
+        return {"status": "error", "message": str(error)}
+    expenses = get_expenses_by_month(user_id, month, year, *after, limit=EXPENSES_PAGE_SIZE + 1)
+    return _expenses_payload("Expenses retrieved successfully", expenses)
+
+
+@async_variant(search_expense_by_month)
+async def asearch_expense_by_month(
+    user_id: int,
+    month: int,
+    year: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    try:
+        after = decode_cursor(cursor)
+    except ValueError as error:
+        return {"status": "error", "message": str(error)}
+    expenses = await aget_expenses_by_month(
+        user_id, month, year, *after, limit=EXPENSES_PAGE_SIZE + 1
+    )
+    return _expenses_payload("Expenses retrieved successfully", expenses)
+
+
+def _totals_payload(month: int, year: Optional[int], totals: list) -> Dict[str, Any]:
     return {
-        "message": "Expenses retrieved successfully",
-        "count": len(expenses),
-        "expenses": expenses if expenses else []
+        "message": "Expense totals retrieved successfully",
+        "month": month,
+        "year": month_year(month, year),
+        "totals": totals
     }
 
 
+@tool
+def search_expense_totals_by_month(
+    user_id: int,
+    month: int,
+    year: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Search for the user's total spending in a month
+    Use this tool to answer how much the user spent in a month: it returns the sum,
+    the number of expenses and the recurrent part for each currency, already computed
+    over all the month's expenses. Prefer it to adding up search_expense_by_month results
+    Params:
+    - user_id: The user id
+    - month: The month of the totals (1-12)
+    - year: The year of the month (e.g. 2025), defaults to the latest past occurrence
+      of the month (December asked in January is December of the previous year)
+    """
+    return _totals_payload(month, year, get_monthly_expense_totals(user_id, month, year))
+
+
+@async_variant(search_expense_totals_by_month)
+async def asearch_expense_totals_by_month(
+    user_id: int,
+    month: int,
+    year: Optional[int] = None
+) -> Dict[str, Any]:
+    totals = await aget_monthly_expense_totals(user_id, month, year)
+    return _totals_payload(month, year, totals)
+
+
+@tool
+def analyze_spending_patterns(
+    user_id: int,
+    months: int = 6,
+    currency: str = "BRL",
+    year: Optional[int] = None,
+    month: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Analyze the user's spending patterns over the last months
+    Use this tool for questions about where the money goes, spending trends or unusual
+    expenses: it returns the totals per category, the total of each month with its
+    rolling average and change from the previous month, and the expenses far above
+    the usual for their category
+    Params:
+    - user_id: The user id
+    - months: How many months to analyze, ending at month/year (default 6)
+    - currency: The currency of the expenses (e.g. "BRL", "USD")
+    - year: The year of the last month analyzed, defaults to the latest past occurrence
+      of the month
+    - month: The last month analyzed (1-12), defaults to the current month
+    """
+    return spending_report(user_id, months, currency, year, month)
+
+
+@async_variant(analyze_spending_patterns)
+async def aanalyze_spending_patterns(
+    user_id: int,
+    months: int = 6,
+    currency: str = "BRL",
+    year: Optional[int] = None,
+    month: Optional[int] = None
+) -> Dict[str, Any]:
+    return await aspending_report(user_id, months, currency, year, month)
+
+
+@tool
+def analyze_expense_to_income(
+    user_id: int,
+    months: int = 6,
+    currency: str = "BRL",
+    year: Optional[int] = None,
+    month: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Compare the user's expenses with their monthly income
+    Use this tool to assess the user's financial health: it returns, for each month,
+    the expenses total and the share of the income it takes (ratio, 1.0 = all the income)
+    Params:
+    - user_id: The user id
+    - months: How many months to compare, ending at month/year (default 6)
+    - currency: The currency of the expenses (e.g. "BRL", "USD"); the income has no
+      currency of its own and is compared as if it were in this one, so use the
+      currency the user is paid in
+    - year: The year of the last month compared, defaults to the latest past occurrence
+      of the month
+    - month: The last month compared (1-12), defaults to the current month
+    """
+    return expense_to_income_report(user_id, months, currency, year, month)
+
+
+@async_variant(analyze_expense_to_income)
+async def aanalyze_expense_to_income(
+    user_id: int,
+    months: int = 6,
+    currency: str = "BRL",
+    year: Optional[int] = None,
+    month: Optional[int] = None
+) -> Dict[str, Any]:
+    return await aexpense_to_income_report(user_id, months, currency, year, month)
+
+
 @tool
 def add_user_expense_in_month(user_id: int, expense: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -89,6 +320,58 @@ def add_user_expense_in_month(user_id: int, expense: Dict[str, Any]) -> Dict[str
     return {"status": "success", "message": "Expense added successfully"}
 
 
+@async_variant(add_user_expense_in_month)
+async def aadd_user_expense_in_month(user_id: int, expense: Dict[str, Any]) -> Dict[str, Any]:
+    await aadd_user_expense(user_id, expense)
+    return {"status": "success", "message": "Expense added successfully"}
+
+
+def _bulk_payload(id_range: tuple[int, int] | None, count: int) -> Dict[str, Any]:
+    return {
+        "status": "success",
+        "message": f"{count} expenses added successfully",
+        "count": count,
+        "ids": list(id_range) if id_range else []
+    }
+
+
+@tool
+def add_user_expenses_from_statement(
+    user_id: int,
+    expenses: list[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Add many expenses for the user at once
+    Use this tool to add all the lines of a parsed bank statement or a list of expenses
+    in a single call instead of calling add_user_expense_in_month for each one
+    Params:
+    - user_id: The user id
+    - expenses: The expenses to add, each one with the same fields as in
+      add_user_expense_in_month (label, value, currency, recurrent, installments,
+      expiring_date)
+    """
+    # A single chunk keeps the call all-or-nothing: an invalid line inserts nothing.
+    try:
+        id_range = add_user_expenses_bulk(user_id, expenses, chunk_size=max(len(expenses), 1))
+    except ValueError as error:
+        return {"status": "error", "message": str(error)}
+    return _bulk_payload(id_range, len(expenses))
+
+
+@async_variant(add_user_expenses_from_statement)
+async def aadd_user_expenses_from_statement(
+    user_id: int,
+    expenses: list[Dict[str, Any]]
+) -> Dict[str, Any]:
+    try:
+        id_range = await aadd_user_expenses_bulk(
+            user_id, expenses, chunk_size=max(len(expenses), 1)
+        )
+    except ValueError as error:
+        return {"status": "error", "message": str(error)}
+    return _bulk_payload(id_range, len(expenses))
+
+
 @tool
 def add_chat_message(user_id: str, message: str) -> Dict[str, Any]:
     """
@@ -106,5 +389,9 @@ tools = [
     search_user_monthly_income,
     search_user_recent_expenses,
     search_expense_by_month,
-    add_user_expense_in_month
+    search_expense_totals_by_month,
+    analyze_spending_patterns,
+    analyze_expense_to_income,
+    add_user_expense_in_month,
+    add_user_expenses_from_statement
 ]
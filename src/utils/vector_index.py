@@ -0,0 +1,137 @@
+import json
+import sqlite3
+from collections.abc import Iterable, Sequence
+from typing import Optional
+
+PARTITIONS_TABLE = "vector_partitions"
+
+
+class UserVectorIndex:
+    """
+    sqlite-vss vector index partitioned by user.
+
+    Every user gets their own ``vss0`` table (``vss_<name>_<user_id>``) whose rowids
+    are the ids of the indexed rows, e.g. ``conversations.id``. A search therefore
+    only touches the requesting user's vectors: its cost grows with that user's
+    history, not with the whole corpus, and no result slot is wasted on other users.
+    Partitions are created on the first write and listed, with their sizes, in the
+    ``vector_partitions`` table.
+
+    The index does not commit: callers wrap writes in ``with connection:`` so vectors
+    can be written in the same transaction as the rows they point to. sqlite-vss
+    keeps the index of each table in memory per connection, so every reader and
+    writer of an index must share a single connection.
+
+    Args:
+        connection: Connection with the ``sqlite_vss`` extension loaded.
+        name: Index name, used as the prefix of the partition tables.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, name: str):
+        if not name.isidentifier():
+            raise ValueError(f"invalid vector index name {name!r}")
+        self.connection = connection
+        self.name = name
+        self.create_tables()
+
+    def create_tables(self):
+        with self.connection:
+            self.connection.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {PARTITIONS_TABLE} (
+                    name TEXT,
+                    user_id INTEGER,
+                    dimensions INTEGER,
+                    size INTEGER DEFAULT 0,
+                    PRIMARY KEY (name, user_id)
+                )
+                """
+            )
+
+    def table(self, user_id) -> str:
+        """Quoted name of the ``vss0`` table holding ``user_id``'s vectors."""
+        return f'"vss_{self.name}_{int(user_id)}"'
+
+    def _partition(self, user_id) -> Optional[tuple[int, int]]:
+        return self.connection.execute(
+            f"SELECT dimensions, size FROM {PARTITIONS_TABLE} WHERE name = ? AND user_id = ?",
+            (self.name, int(user_id))
+        ).fetchone()
+
+    def size(self, user_id) -> int:
+        """Number of vectors indexed for ``user_id``."""
+        partition = self._partition(user_id)
+        return partition[1] if partition else 0
+
+    def users(self) -> list[int]:
+        """Ids of the users that have a partition."""
+        rows = self.connection.execute(
+            f"SELECT user_id FROM {PARTITIONS_TABLE} WHERE name = ? ORDER BY user_id",
+            (self.name,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def add(self, user_id, vectors: Iterable[tuple[int, Sequence[float]]]):
+        """Index ``(rowid, vector)`` pairs in ``user_id``'s partition, creating it if needed."""
+        vectors = list(vectors)
+        if not vectors:
+            return
+        dimensions = len(vectors[0][1])
+        rows = [(rowid, json.dumps(list(vector))) for rowid, vector in vectors]
+        partition = self._partition(user_id)
+        if partition is None:
+            self.connection.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table(user_id)} "
+                f"USING vss0(embedding({dimensions}))"
+            )
+            self.connection.execute(
+                f"INSERT INTO {PARTITIONS_TABLE} (name, user_id, dimensions) VALUES (?, ?, ?)",
+                (self.name, int(user_id), dimensions)
+            )
+        elif partition[0] != dimensions:
+            raise ValueError(
+                f"{self.name} vectors of user {user_id} have {partition[0]} dimensions, "
+                f"got {dimensions}; rebuild the index after changing embeddings provider"
+            )
+
+        self.connection.executemany(
+            f"INSERT INTO {self.table(user_id)} (rowid, embedding) VALUES (?, ?)", rows
+        )
+        self.connection.execute(
+            f"UPDATE {PARTITIONS_TABLE} SET size = size + ? WHERE name = ? AND user_id = ?",
+            (len(rows), self.name, int(user_id))
+        )
+
+    def remove(self, user_id, rowids: Iterable[int]):
+        """Drop the vectors of ``rowids`` from ``user_id``'s partition."""
+        rowids = [(int(rowid),) for rowid in rowids]
+        if not rowids or self._partition(user_id) is None:
+            return
+        self.connection.executemany(
+            f"DELETE FROM {self.table(user_id)} WHERE rowid = ?", rowids
+        )
+        self.connection.execute(
+            f"UPDATE {PARTITIONS_TABLE} SET size = max(size - ?, 0) WHERE name = ? AND user_id = ?",
+            (len(rowids), self.name, int(user_id))
+        )
+
+    def search_sql(self, user_id) -> str:
+        """
+        SQL selecting ``rowid, distance`` of the nearest vectors in ``user_id``'s
+        partition; it takes the query vector (JSON) and ``k`` as parameters and can be
+        used as a subquery to join the indexed rows.
+        """
+        return (
+            f"SELECT rowid, distance FROM {self.table(user_id)} "
+            "WHERE vss_search(embedding, vss_search_params(?, ?))"
+        )
+
+    def search(self, user_id, vector: Sequence[float], k: int) -> list[tuple[int, float]]:
+        """Return the ``k`` nearest ``(rowid, distance)`` pairs, closest first."""
+        k = min(k, self.size(user_id))
+        if k <= 0:
+            return []
+        rows = self.connection.execute(
+            self.search_sql(user_id), (json.dumps(list(vector)), k)
+        ).fetchall()
+        return sorted(((row[0], row[1]) for row in rows), key=lambda hit: hit[1])
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+from agent_service.finance_buddy import FinanceBuddy
+
+REPLY = "Anotei os 10 reais do mercado. Você ainda não cadastrou sua renda."
+
+
+class RecordingChatModel(BaseChatModel):
+    """Answers ``REPLY`` to every call and keeps the messages it was sent."""
+
+    calls: list = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls.append(messages)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=REPLY))])
+
+
+@pytest.fixture
+def finance_manager(monkeypatch):
+    # The agent's stores read their paths on import; keep them out of the working
+    # directory and the variables out of the other tests.
+    directory = tempfile.mkdtemp()
+    with pytest.MonkeyPatch.context() as patch:
+        for name, file in (("EXPENSES_DB_PATH", "expenses.db"),
+                           ("MESSAGES_DB_PATH", "messages.db"),
+                           ("MESSAGES_VECTOR_DB_PATH", "messages_vec.db"),
+                           ("CHECKPOINTS_DB_PATH", "checkpoints.db")):
+            patch.setenv(name, os.path.join(directory, file))
+        patch.setenv("OPENAI_API_KEY", os.getenv("OPENAI_API_KEY", "unused"))
+        import agent.finance_manager as finance_manager
+    from utils.messages_db_sqlite import get_embeddings
+
+    monkeypatch.setenv("EMBEDDINGS_PROVIDER", "hashing")
+    get_embeddings.reset()
+    yield finance_manager
+    get_embeddings.reset()
+
+
+def test_batched_messages_reach_the_agent_as_one_turn(finance_manager, monkeypatch):
+    print("Answering a batch of messages through the finance graph...")
+    model = RecordingChatModel()
+    monkeypatch.setattr(
+        finance_manager, "finance_agent_graph", finance_manager.build_finance_agent_graph(model)
+    )
+    buddy = FinanceBuddy(finance_manager.finance_agent)
+    batch = ["gastei 10 no mercado hoje, registra aí", "qual minha renda?"]
+
+    async def run():
+        await buddy.initialize()
+        return await buddy.reply(time.time_ns(), batch, thread_id="batch")
+
+    # The last message alone is an income lookup the router would answer by itself.
+    assert asyncio.run(run()) == REPLY, "the batch was not answered by the agent."
+    turn = [message for message in model.calls[0] if isinstance(message, HumanMessage)]
+    assert turn[-1].content == "\n".join(batch), "the agent did not see the whole batch."
+
+
+def test_follow_ups_are_not_answered_from_another_thread(finance_manager, monkeypatch):
+    print("Asking the same follow-up in two threads...")
+    model = RecordingChatModel(calls=[])
+    monkeypatch.setattr(
+        finance_manager, "finance_agent_graph", finance_manager.build_finance_agent_graph(model)
+    )
+    buddy = FinanceBuddy(finance_manager.finance_agent)
+    user_id = time.time_ns()
+    follow_up = "and what about in may?"
+
+    async def run():
+        await buddy.initialize()
+        await buddy.reply(user_id, ["how can I save on groceries?"], thread_id="groceries")
+        await buddy.reply(user_id, [follow_up], thread_id="groceries")
+        await buddy.reply(user_id, ["how can I spend less on rent?"], thread_id="rent")
+        await buddy.reply(user_id, [follow_up], thread_id="rent")
+
+    asyncio.run(run())
+    assert len(model.calls) == 4, "a follow-up was answered from another thread's cache."
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import sys
+
+from aiohttp.test_utils import TestClient, TestServer
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+from agent_service.finance_buddy import FinanceBuddy
+from agent_service.server import create_app, scheduler_key
+
+
+class FakeBuddy:
+    """Stands in for the agent: answers with the number of messages of the turn."""
+
+    thread_id = staticmethod(FinanceBuddy.thread_id)
+
+    def __init__(self):
+        self.ready = False
+        self.turns = []
+        self.release = asyncio.Event()
+
+    async def initialize(self):
+        self.ready = True
+
+    async def close(self):
+        self.ready = False
+
+    async def stream_reply(self, user_id, messages, thread_id=None, user_name=""):
+        self.turns.append((thread_id, list(messages)))
+        await self.release.wait()
+        for token in ("answered ", str(len(messages)), " messages"):
+            yield token
+
+
+async def until(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+def sse_events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_turns_are_batched_streamed_and_bounded():
+    print("Serving concurrent chat requests...")
+
+    async def run():
+        buddy = FakeBuddy()
+        app = create_app(buddy, workers=1, queue_size=1, max_batch=8)
+        async with TestClient(TestServer(app)) as client:
+            scheduler = app[scheduler_key]
+            assert (await client.get("/readyz")).status == 200
+
+            streamed = asyncio.create_task(
+                client.post("/v1/chat/stream", json={"user_id": 1, "message": "oi"})
+            )
+            await until(lambda: scheduler.stats()["running"] == 1)
+            batched = [
+                asyncio.create_task(
+                    client.post("/v1/chat", json={"user_id": 2, "message": message})
+                )
+                for message in ("gastei 10 no mercado", "e 20 na farmacia")
+            ]
+            await until(
+                lambda: len(getattr(scheduler._pending.get("user-2"), "messages", ())) == 2
+            )
+
+            rejected = await client.post("/v1/chat", json={"user_id": 3, "message": "oi"})
+            assert rejected.status == 429 and rejected.headers["Retry-After"]
+            assert (await client.get("/readyz")).status == 503, "a full queue reported ready."
+
+            buddy.release.set()
+            response = await streamed
+            assert response.headers["Content-Type"] == "text/event-stream"
+            events = sse_events(await response.text())
+            assert [data.get("text") for _, data in events[:-1]] == ["answered ", "1", " messages"]
+            assert events[-1] == ("done", {"thread_id": "user-1"})
+
+            replies = [await (await task).json() for task in batched]
+            assert replies == [{"thread_id": "user-2", "reply": "answered 2 messages"}] * 2
+            assert buddy.turns == [
+                ("user-1", ["oi"]), ("user-2", ["gastei 10 no mercado", "e 20 na farmacia"])
+            ], "waiting messages of a thread were not answered in one turn."
+        assert not buddy.ready
+
+    asyncio.run(run())
+
+
+def test_rejects_invalid_requests():
+    print("Validating chat requests...")
+
+    async def run():
+        buddy = FakeBuddy()
+        buddy.release.set()
+        async with TestClient(TestServer(create_app(buddy, workers=2))) as client:
+            assert await (await client.get("/healthz")).json() == {"status": "ok"}
+            for body in ({"message": "oi"}, {"user_id": "1", "message": "oi"},
+                         {"user_id": 1, "message": " "}, [1]):
+                response = await client.post("/v1/chat", json=body)
+                assert response.status == 400, body
+            response = await client.post("/v1/chat", data="not json")
+            assert response.status == 400
+            response = await client.post(
+                "/v1/chat", json={"user_id": 1, "message": "oi", "thread_id": "t-1"}
+            )
+            assert await response.json() == \
+                {"thread_id": "user-1:t-1", "reply": "answered 1 messages"}
+            assert buddy.turns[-1][0] == "user-1:t-1"
+
+            # Another user's thread id only names a thread of the caller.
+            response = await client.post(
+                "/v1/chat", json={"user_id": 78, "message": "oi", "thread_id": "user-77"}
+            )
+            assert (await response.json())["thread_id"] == "user-78:user-77"
+            response = await client.post(
+                "/v1/chat", json={"user_id": 78, "message": "oi", "thread_id": "user-78:t-1"}
+            )
+            assert (await response.json())["thread_id"] == "user-78:t-1"
+
+    asyncio.run(run())
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import sys
+import tempfile
+from typing import Annotated, TypedDict
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, StateGraph
+from langgraph.graph.message import add_messages
+
+from src.utils.checkpointer import SQLiteCheckpointSaver
+
+
+class ChatState(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+def echo(state: ChatState):
+    return {"messages": [AIMessage(content=f"{len(state['messages'])} mensagens")]}
+
+
+def build_graph(checkpointer):
+    workflow = StateGraph(ChatState)
+    workflow.add_node("echo", echo)
+    workflow.set_entry_point("echo")
+    workflow.add_edge("echo", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def database_path():
+    return os.path.join(tempfile.mkdtemp(), "checkpoints.db")
+
+
+def test_thread_history_survives_a_new_saver():
+    print("Continuing a thread from the SQLite checkpointer...")
+    database = database_path()
+    config = {"configurable": {"thread_id": "user-123"}}
+
+    graph = build_graph(SQLiteCheckpointSaver(database))
+    graph.invoke({"messages": [HumanMessage(content="Oi")]}, config)
+
+    graph = build_graph(SQLiteCheckpointSaver(database))
+    result = graph.invoke({"messages": [HumanMessage(content="Quanto gastei?")]}, config)
+    assert [message.content for message in result["messages"]] == [
+        "Oi", "1 mensagens", "Quanto gastei?", "3 mensagens"
+    ], "previous turn was not restored."
+
+    other = graph.invoke({"messages": [HumanMessage(content="Oi")]}, {
+        "configurable": {"thread_id": "user-456"}
+    })
+    assert len(other["messages"]) == 2, "threads are not isolated."
+
+
+def test_history_and_delete_thread():
+    print("Listing and deleting checkpoints...")
+    saver = SQLiteCheckpointSaver(database_path())
+    graph = build_graph(saver)
+    config = {"configurable": {"thread_id": "t"}}
+    graph.invoke({"messages": [HumanMessage(content="Oi")]}, config)
+
+    history = list(graph.get_state_history(config))
+    assert len(history) == 3, "input, loop and node checkpoints were not all stored."
+    assert history[0].values["messages"][-1].content == "1 mensagens"
+    assert len(list(saver.list(config, limit=1))) == 1
+
+    saver.delete_thread("t")
+    assert saver.get_tuple(config) is None, "thread was not deleted."
+
+
+def test_async_invocation():
+    print("Continuing a thread asynchronously...")
+    graph = build_graph(SQLiteCheckpointSaver(database_path()))
+    config = {"configurable": {"thread_id": "async"}}
+
+    async def conversation():
+        await graph.ainvoke({"messages": [HumanMessage(content="Oi")]}, config)
+        return await graph.ainvoke({"messages": [HumanMessage(content="Tchau")]}, config)
+
+    result = asyncio.run(conversation())
+    assert result["messages"][-1].content == "3 mensagens"
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+sys.path.append(absolute_path)
+from src.utils import flush_message_embeddings
+from src.utils.messages_db_sqlite import get_embeddings
+
+
+def reset_embeddings():
+    # Messages still buffered are embedded by the client they were queued under.
+    flush_message_embeddings()
+    get_embeddings.reset()
+
+
+@pytest.fixture(autouse=True)
+def hashing_embeddings(monkeypatch):
+    # Run against the local embeddings backend: no network or API key needed.
+    reset_embeddings()
+    monkeypatch.setenv("EMBEDDINGS_PROVIDER", "hashing")
+    yield
+    reset_embeddings()
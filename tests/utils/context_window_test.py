@@ -0,0 +1,104 @@
+import asyncio
+import os
+import sys
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.utils.context_window import (
+    acompact_context,
+    compact_context,
+    messages_to_compact,
+    split_turns,
+)
+from src.utils.tokens import count_message_tokens
+
+
+def conversation(turns):
+    messages = []
+    for index in range(turns):
+        messages.append(HumanMessage(content=f"Quanto gastei no mês {index}?"))
+        messages.append(AIMessage(
+            content="",
+            tool_calls=[{"name": "search_expense_by_month", "args": {"month": index}, "id": f"c{index}"}]
+        ))
+        messages.append(ToolMessage(content=f"[{index}]", tool_call_id=f"c{index}"))
+        messages.append(AIMessage(content=f"Você gastou {index * 100} reais."))
+    return messages
+
+
+def summarizer(*summaries):
+    return GenericFakeChatModel(messages=iter([AIMessage(content=text) for text in summaries]))
+
+
+def test_turns_keep_tool_calls_together():
+    print("Splitting a conversation into turns...")
+    turns = split_turns(conversation(3))
+    assert [len(turn) for turn in turns] == [4, 4, 4]
+    assert all(isinstance(turn[0], HumanMessage) for turn in turns)
+
+
+def test_only_turns_beyond_the_last_n_are_compacted():
+    print("Compacting a long conversation...")
+    messages = conversation(6)
+    old = messages_to_compact(messages, keep_turns=4, token_budget=10_000, compact_every=2)
+    assert old == messages[:8], "the two oldest turns were not selected."
+    assert messages_to_compact(conversation(3), keep_turns=4, token_budget=10_000) == []
+
+    compaction = compact_context(
+        messages, "", summarizer("Gastos dos meses 0 e 1."), keep_turns=4, compact_every=2
+    )
+    assert compaction.summary == "Gastos dos meses 0 e 1."
+    assert compaction.messages == messages[:8]
+
+
+def test_compaction_waits_for_several_turns():
+    print("Compacting once every few turns...")
+    assert messages_to_compact(
+        conversation(7), keep_turns=4, token_budget=10_000, compact_every=4
+    ) == [], "compacted before enough turns piled up."
+    messages = conversation(8)
+    old = messages_to_compact(messages, keep_turns=4, token_budget=10_000, compact_every=4)
+    assert old == messages[:16], "the four oldest turns were not compacted at once."
+
+    # After compacting, the next turn fits again instead of compacting one more turn.
+    assert messages_to_compact(
+        messages[16:] + conversation(1), keep_turns=4, token_budget=10_000, compact_every=4
+    ) == []
+
+
+def test_token_budget_leaves_room_for_the_next_turns():
+    print("Compacting a conversation that outgrew its token budget...")
+    messages = conversation(4)
+    budget = count_message_tokens(messages) - 1
+    old = messages_to_compact(messages, keep_turns=4, token_budget=budget)
+    assert old, "a conversation over its budget was not compacted."
+    kept = messages[len(old):]
+    assert count_message_tokens(kept) <= budget * 0.75
+
+    kept += conversation(1)
+    assert count_message_tokens(kept) <= budget
+    assert messages_to_compact(kept, keep_turns=4, token_budget=budget) == []
+
+
+def test_token_budget_trims_recent_turns_but_keeps_the_current_one():
+    print("Compacting a conversation over its token budget...")
+    messages = conversation(4)
+    messages[-4] = HumanMessage(content="extrato " * 400)
+    last_turn = messages[-4:]
+
+    old = messages_to_compact(messages, keep_turns=4, token_budget=200)
+    assert old == messages[:-4], "older turns over the budget were kept."
+    assert count_message_tokens(last_turn) > 200, "current turn must survive any budget."
+
+
+def test_async_compaction_folds_the_previous_summary():
+    print("Compacting asynchronously...")
+    compaction = asyncio.run(acompact_context(
+        conversation(5), "Resumo anterior.", summarizer("Resumo novo."), keep_turns=2,
+        compact_every=1
+    ))
+    assert compaction.summary == "Resumo novo." and len(compaction.messages) == 12
@@ -0,0 +1,86 @@
+import os
+import sys
+import threading
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+from langchain_core.documents import Document
+
+from src.utils.embedding_buffer import EmbeddingWriteBuffer
+
+
+class RecordingWriter:
+    def __init__(self, fail_times=0):
+        self.batches = []
+        self.fail_times = fail_times
+        self.written = threading.Event()
+
+    def __call__(self, documents):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise ConnectionError("embedding API unavailable")
+        self.batches.append([document.page_content for document in documents])
+        self.written.set()
+
+
+def test_flush_writes_pending_documents_in_batches():
+    print("Flushing the embedding buffer explicitly...")
+    writer = RecordingWriter()
+    buffer = EmbeddingWriteBuffer(writer, batch_size=100, flush_interval=60)
+    for index in range(5):
+        buffer.add(Document(page_content=f"message {index}"))
+    assert len(buffer) == 5 and writer.batches == [], "documents were written synchronously."
+
+    buffer.flush()
+    assert writer.batches == [[f"message {index}" for index in range(5)]]
+    assert len(buffer) == 0
+    buffer.close()
+
+
+def test_size_triggered_flush():
+    print("Filling the embedding buffer up to its batch size...")
+    writer = RecordingWriter()
+    buffer = EmbeddingWriteBuffer(writer, batch_size=3, flush_interval=60)
+    for index in range(3):
+        buffer.add(Document(page_content=f"message {index}"))
+    assert writer.written.wait(5), "full batch was not written in the background."
+    assert writer.batches == [["message 0", "message 1", "message 2"]]
+    buffer.close()
+
+
+def test_time_triggered_flush():
+    print("Waiting for the embedding buffer flush interval...")
+    writer = RecordingWriter()
+    buffer = EmbeddingWriteBuffer(writer, batch_size=100, flush_interval=0.05)
+    buffer.add(Document(page_content="ok"))
+    assert writer.written.wait(5), "pending document was not written after the interval."
+    assert writer.batches == [["ok"]]
+    buffer.close()
+
+
+def test_failed_flush_keeps_documents():
+    print("Failing an embedding write...")
+    writer = RecordingWriter(fail_times=1)
+    buffer = EmbeddingWriteBuffer(writer, batch_size=100, flush_interval=60)
+    buffer.add(Document(page_content="obrigado"))
+    try:
+        buffer.flush()
+    except ConnectionError:
+        pass
+    assert len(buffer) == 1, "failed documents were dropped."
+
+    buffer.close()
+    assert writer.batches == [["obrigado"]], "documents were not written on close."
+
+
+def test_buffer_is_reusable_after_close():
+    print("Adding documents after closing the embedding buffer...")
+    writer = RecordingWriter()
+    buffer = EmbeddingWriteBuffer(writer, batch_size=100, flush_interval=0.05)
+    buffer.add(Document(page_content="antes"))
+    buffer.close()
+    buffer.add(Document(page_content="depois"))
+    buffer.close()
+    buffer.close()
+    assert writer.batches == [["antes"], ["depois"]], "the reopened buffer lost documents."
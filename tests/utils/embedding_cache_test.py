@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+from langchain_core.embeddings import Embeddings
+
+from src.utils.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    model = "counting-test"
+
+    def __init__(self):
+        self.calls = 0
+        self.texts = 0
+
+    def _vector(self, text):
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 0.5]
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def cache_path():
+    return os.path.join(tempfile.mkdtemp(), "embedding_cache.db")
+
+
+def test_repeated_texts_are_not_embedded_again():
+    print("Embedding repeated texts through the cache...")
+    client = CountingEmbeddings()
+    cached = CachedEmbeddings(client, database=cache_path())
+
+    first = cached.embed_documents(["ok", "obrigado", "ok"])
+    assert client.texts == 2, "duplicate texts in a batch were embedded twice."
+    assert first[0] == first[2] == client._vector("ok")
+
+    assert cached.embed_query("obrigado") == client._vector("obrigado")
+    assert client.calls == 1, "cached query reached the embeddings client."
+    assert cached.stats() == {"hits": 1, "misses": 3, "hit_rate": 0.25}
+    print("Embedding cache stats:", cached.stats())
+
+
+def test_cache_persists_across_instances():
+    print("Reopening the embedding cache...")
+    database = cache_path()
+    CachedEmbeddings(CountingEmbeddings(), database=database).embed_query("quanto gastei?")
+
+    client = CountingEmbeddings()
+    CachedEmbeddings(client, database=database).embed_query("quanto gastei?")
+    assert client.calls == 0, "persisted embedding was not reused."
+
+
+def test_least_recently_used_entries_are_evicted():
+    print("Overflowing the embedding cache...")
+    client = CountingEmbeddings()
+    cached = CachedEmbeddings(client, database=cache_path(), max_entries=2)
+    cached.embed_query("a")
+    cached.embed_query("b")
+    cached.embed_query("a")  # "b" is now the least recently used entry
+    cached.embed_query("c")
+
+    client.calls = 0
+    cached.embed_documents(["a", "c"])
+    assert client.calls == 0, "recently used entries were evicted."
+    cached.embed_query("b")
+    assert client.calls == 1, "least recently used entry was kept."
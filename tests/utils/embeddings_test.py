@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+from src.utils.embedding_cache import CachedEmbeddings
+from src.utils.embeddings import HashingEmbeddings, create_embeddings
+
+
+def cosine(first, second):
+    return sum(a * b for a, b in zip(first, second, strict=True))
+
+
+def test_hashing_embeddings_are_deterministic_and_normalized():
+    print("Embedding with the local hashing backend...")
+    embeddings = HashingEmbeddings(dimensions=256)
+    vector = embeddings.embed_query("Quanto gastei com aluguel?")
+    assert len(vector) == 256
+    assert vector == HashingEmbeddings(dimensions=256).embed_query("Quanto gastei com aluguel?")
+    assert abs(cosine(vector, vector) - 1.0) < 1e-5, "vector is not L2-normalized."
+    assert embeddings.embed_query("") == [0.0] * 256
+
+
+def test_hashing_embeddings_rank_similar_texts_higher():
+    print("Comparing hashing embeddings of related texts...")
+    embeddings = HashingEmbeddings()
+    query = embeddings.embed_query("quanto gastei com aluguel em abril")
+    related = embeddings.embed_query("Gastos com o aluguel de abril")
+    unrelated = embeddings.embed_query("Qual é a previsão do tempo amanhã?")
+    assert cosine(query, related) > cosine(query, unrelated)
+
+
+def test_hashing_embeddings_latency():
+    print("Timing the local hashing backend...")
+    embeddings = HashingEmbeddings()
+    message = "Olá, quero saber quanto gastei este mês com mercado, aluguel e transporte."
+    start = time.perf_counter()
+    for _ in range(100):
+        embeddings.embed_query(message)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / 100
+    assert elapsed_ms < 10, f"local embedding took {elapsed_ms:.2f} ms"
+    print(f"Local embedding latency: {elapsed_ms:.3f} ms")
+
+
+def test_create_embeddings_selects_provider(monkeypatch):
+    print("Selecting the embeddings provider...")
+    assert isinstance(create_embeddings("hashing"), HashingEmbeddings)
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    openai = create_embeddings("openai")
+    assert isinstance(openai, CachedEmbeddings), "remote embeddings should be cached."
+
+    try:
+        create_embeddings("unknown")
+    except ValueError as error:
+        print("Unknown provider rejected.", error)
+    else:
+        raise AssertionError("unknown provider was accepted.")
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+from src.utils import add_user_expenses_bulk, add_user_param, initialize_database
+from src.utils.expense_analytics import (
+    ExpenseColumns,
+    aexpense_to_income_report,
+    anomaly_scores,
+    expense_to_income_report,
+    month_over_month,
+    rolling_average,
+    spending_report,
+)
+
+
+def expense(label, value, date, recurrent=0, currency="BRL"):
+    return {
+        "label": label, "value": value, "currency": currency, "recurrent": recurrent,
+        "installments": 0, "expiring_date": date
+    }
+
+
+def test_series_helpers():
+    print("Computing rolling averages and month-over-month changes...")
+    series = np.array([100.0, 200.0, 0.0, 300.0])
+    assert rolling_average(series, 3).tolist() == [100.0, 150.0, 100.0, 500 / 3]
+
+    deltas, percents = month_over_month(series)
+    assert np.isnan(deltas[0]) and deltas[1:].tolist() == [100.0, -200.0, 300.0]
+    assert percents[1] == 100.0 and percents[2] == -100.0 and np.isnan(percents[3]), \
+        "change after an empty month must have no percent."
+
+
+def test_anomaly_scores_leave_the_expense_out():
+    print("Scoring an outlier in a small category...")
+    values = np.array([100.0, 100.0, 100.0, 101.0, 1000.0, 50.0])
+    columns = ExpenseColumns(
+        ids=np.arange(6), months=np.zeros(6, dtype=int), values=values,
+        recurrent=np.zeros(6, dtype=int), categories=np.array([0, 0, 0, 0, 0, 1]),
+        category_names=["mercado", "livros"]
+    )
+    scores = anomaly_scores(columns, min_count=5)
+    # Counted in its own spread, the outlier would score 2.0.
+    assert scores[4] > 100, f"the outlier was hidden by its own spread: {scores[4]}"
+    assert np.all(scores[:4] < 0) and scores[5] == 0, scores
+
+
+def test_spending_report():
+    print("Analyzing a user's spending...")
+    initialize_database()
+    user_id = time.time_ns()
+    add_user_expenses_bulk(user_id, [
+        *[expense("Mercado", 100.0 + day, f"2025-0{1 + day % 3}-{day + 1:02d}") for day in range(9)],
+        expense("mercado ", 900.0, "2025-03-20"),
+        expense("Aluguel", 1500.0, "2025-01-05", recurrent=1),
+        expense("Aluguel", 1500.0, "2025-03-05", recurrent=1),
+        expense("Livro", 20.0, "2025-02-10", currency="USD"),
+        expense("Antigo", 50.0, "2024-12-31"),
+    ])
+
+    report = spending_report(user_id, months=3, year=2025, month=3, z_score=2.0)
+    print("Report:", report)
+    assert report["first_month"] == "2025-01" and report["last_month"] == "2025-03"
+    assert report["count"] == 12, "out-of-window or other currency expenses were loaded."
+    assert report["recurrent_total"] == 3000.0
+    assert [c["category"] for c in report["categories"]] == ["aluguel", "mercado"]
+    assert report["categories"][1] == {"category": "mercado", "total": 1836.0, "count": 10}
+
+    january, february, march = report["months"]
+    assert (january["total"], february["total"], march["total"]) == (1809.0, 312.0, 2715.0)
+    assert january["change"] is None and february["change"] == -1497.0
+    assert march["rolling_average"] == round((1809 + 312 + 2715) / 3, 2)
+
+    assert [a["value"] for a in report["anomalies"]] == [900.0], \
+        "the outlier was not the only anomaly flagged."
+
+
+def test_expense_to_income_report():
+    print("Comparing expenses with income...")
+    user_id = time.time_ns()
+    add_user_expenses_bulk(user_id, [
+        expense("Aluguel", 1500.0, "2025-02-05"),
+        expense("Mercado", 1000.0, "2025-03-10"),
+    ])
+    report = expense_to_income_report(user_id, months=2, year=2025, month=3)
+    assert report["income"] is None and report["average_ratio"] is None
+
+    add_user_param(user_id, {"label": "monthly_income", "value": "5000"})
+    report = asyncio.run(aexpense_to_income_report(user_id, months=2, year=2025, month=3))
+    print("Report:", report)
+    assert [m["ratio"] for m in report["months"]] == [0.3, 0.2]
+    assert report["average_expenses"] == 1250.0 and report["average_ratio"] == 0.25
@@ -1,5 +1,7 @@
+import asyncio
 import os
 import sys
+import time
 
 # Add the parent directory to the system path
 absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
@@ -14,21 +16,28 @@ from src.utils import (
     add_user,
     add_user_param,
     add_user_expense,
+    add_user_expenses_bulk,
     get_user_monthly_income,
     get_recent_user_expenses,
-    get_expenses_by_month
+    get_expenses_by_month,
+    get_monthly_expense_totals,
+    initialize_database,
+    serialize_expenses,
+    Expense,
+    aget_user_monthly_income,
+    aadd_user_expense
 )
+from src.utils.expenses_db_sqlite import month_year, pool
 
 
 def test_create_expenses_table():
     print("Initializing test expense table creation...")
     create_expenses_table()
 
-    import sqlite3
-    conn = sqlite3.connect("expenses.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='expenses'")
-    result = cursor.fetchone()
+    with pool.connection() as conn:
+        result = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='expenses'"
+        ).fetchone()
     assert result is not None, "expenses table was not created successfully."
     print("expenses table created successfully.", result)
 
@@ -37,11 +46,10 @@ def test_create_users_table():
     print("Initializing test users table creation...")
     create_user_table()
 
-    import sqlite3
-    conn = sqlite3.connect("expenses.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user'")
-    result = cursor.fetchone()
+    with pool.connection() as conn:
+        result = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='user'"
+        ).fetchone()
     assert result is not None, "user table was not created successfully."
     print("user table created successfully.", result)
 
@@ -50,11 +58,10 @@ def test_create_user_params_table():
     print("Initializing test user params table creation...")
     create_user_params_table()
 
-    import sqlite3
-    conn = sqlite3.connect("expenses.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user_params'")
-    result = cursor.fetchone()
+    with pool.connection() as conn:
+        result = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='user_params'"
+        ).fetchone()
     assert result is not None, "user_params table was not created successfully."
     print("user_params table created successfully.", result)
 
@@ -69,11 +76,8 @@ def test_add_user():
 
     print(type(user_id))
 
-    import sqlite3
-    conn = sqlite3.connect("expenses.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM user WHERE id = (?)", (user_id,))
-    result = cursor.fetchone()
+    with pool.connection() as conn:
+        result = conn.execute("SELECT * FROM user WHERE id = (?)", (user_id,)).fetchone()
     assert result is not None, "user data was not inserted successfully."
     print("test user created successfully.", result)
 
@@ -88,11 +92,8 @@ def test_add_user_param():
         }
     )
 
-    import sqlite3
-    conn = sqlite3.connect("expenses.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM user_params WHERE id = (?)", [1])
-    result = cursor.fetchall()
+    with pool.connection() as conn:
+        result = conn.execute("SELECT * FROM user_params WHERE id = (?)", [1]).fetchall()
     assert result is not None, "user_params data was not inserted successfully."
     print("test user param created successfully.", result)
 
@@ -111,15 +112,49 @@ def test_add_user_expense():
         }
     )
 
-    import sqlite3
-    conn = sqlite3.connect("expenses.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM expenses WHERE id = (?)", [user_expense])
-    result = cursor.fetchone()
+    with pool.connection() as conn:
+        result = conn.execute("SELECT * FROM expenses WHERE id = (?)", [user_expense]).fetchone()
     assert result is not None, "expenses data was not inserted successfully."
     print("test user param created successfully.", result)
 
 
+def test_add_user_expenses_bulk():
+    print("Adding a bank statement of user expenses...")
+    expenses = [
+        {
+            "label": f"Statement line {index}",
+            "value": 10.0 + index,
+            "currency": "BRL",
+            "recurrent": 0,
+            "installments": 0,
+            "expiring_date": "2025-03-15"
+        }
+        for index in range(25)
+    ]
+    first_id, last_id = add_user_expenses_bulk(1, expenses, chunk_size=10)
+    assert last_id - first_id + 1 == len(expenses), "inserted id range is wrong."
+
+    with pool.connection() as conn:
+        rows = conn.execute(
+            "SELECT label FROM expenses WHERE id BETWEEN ? AND ? ORDER BY id",
+            (first_id, last_id)
+        ).fetchall()
+    labels = [row[0] for row in rows]
+    assert labels == [expense["label"] for expense in expenses], "bulk rows were not inserted."
+    assert add_user_expenses_bulk(1, []) is None, "empty bulk insert should return None."
+    print("bulk user expenses created successfully.", first_id, last_id)
+
+
+def test_add_user_expenses_bulk_rejects_invalid_rows():
+    print("Adding an invalid bank statement line...")
+    try:
+        add_user_expenses_bulk(1, [{"label": "Missing value", "currency": "BRL"}])
+    except ValueError as error:
+        print("invalid expense rejected.", error)
+    else:
+        raise AssertionError("invalid expense was accepted.")
+
+
 def test_get_user_monthly_income():
     print("Getting user monthly income...")
 
@@ -140,12 +175,209 @@ def test_get_user_monthly_expenses():
 def test_get_expenses_by_month():
     print("Getting user expenses by month...")
 
-    result = get_expenses_by_month(1, 4)  # Assuming user_id 1 exists
+    result = get_expenses_by_month(1, 4, 2025)  # Assuming user_id 1 exists
     assert result is not None, "user month expenses was not retrieved successfully."
     assert len(result) != 0, "user expenses by month list is empty."
     print("User expenses by month retrieved successfully.", result)
 
 
+def test_get_expenses_by_month_is_year_aware():
+    print("Getting user expenses by month of another year...")
+
+    result = get_expenses_by_month(1, 4, 1999)  # Assuming user_id 1 exists
+    assert result == [], "expenses from other years were returned."
+    print("Expenses by month are filtered by year.")
+
+
+def test_month_without_year_is_its_latest_occurrence():
+    print("Getting the expenses of a month without its year...")
+    import datetime
+    today = datetime.date(2025, 1, 10)
+    assert month_year(12, today=today) == 2024, "December asked in January is in the future."
+    assert month_year(1, today=today) == 2025
+    assert month_year(12, 2025, today) == 2025
+
+    user_id = time.time_ns()
+    month = datetime.date.today().month % 12 + 1
+    add_user_expense(user_id, {
+        "label": "Seguro", "value": 80.0, "currency": "BRL", "recurrent": 0,
+        "installments": 1, "expiring_date": f"{month_year(month)}-{month:02d}-15"
+    })
+    assert [expense.label for expense in get_expenses_by_month(user_id, month)] == ["Seguro"]
+    assert get_monthly_expense_totals(user_id, month)[0]["count"] == 1
+
+
+def test_month_query_uses_index():
+    print("Checking the month query plan...")
+    initialize_database()
+
+    with pool.connection() as conn:
+        rows = conn.execute(
+            """
+            EXPLAIN QUERY PLAN
+            SELECT * FROM expenses
+            WHERE user_id = ? AND expiring_date >= ? AND expiring_date < ?
+            ORDER BY expiring_date DESC
+            LIMIT 50
+            """,
+            (1, "2025-04-01", "2025-05-01")
+        ).fetchall()
+    plan = " ".join(row[3] for row in rows)
+    assert "idx_expenses_user_expiring_date" in plan, plan
+    assert "SCAN" not in plan and "TEMP B-TREE" not in plan, plan
+    print("Month query plan:", plan)
+
+
+def test_expenses_are_typed_and_serialized_compactly():
+    print("Serializing expenses for the model...")
+    user_id = time.time_ns()
+    add_user_expense(user_id, {
+        "label": "Academia", "value": 99.9, "currency": "BRL", "recurrent": 1,
+        "installments": 0, "expiring_date": "2025-04-10 00:00:00"
+    })
+    expenses = get_expenses_by_month(user_id, 4, 2025)
+    assert isinstance(expenses[0], Expense) and expenses[0].user_id == user_id
+    assert get_recent_user_expenses(user_id) == expenses
+
+    records = serialize_expenses(expenses)
+    assert records == [{
+        "label": "Academia", "value": 99.9, "currency": "BRL", "recurrent": 1,
+        "installments": 0, "date": "2025-04-10"
+    }], records
+    columns = serialize_expenses(expenses, columnar=True)
+    assert columns == {
+        "columns": ["label", "value", "currency", "recurrent", "installments", "date"],
+        "rows": [["Academia", 99.9, "BRL", 1, 0, "2025-04-10"]]
+    }, columns
+    assert len(str(columns)) < len(str(expenses)), "compact form is not shorter than the rows."
+    print("Expenses serialized:", columns)
+
+
+def test_expense_pages_follow_a_cursor():
+    print("Paging through a user's expenses...")
+    user_id = time.time_ns()
+    add_user_expenses_bulk(user_id, [
+        {"label": f"Compra {number}", "value": number, "currency": "BRL", "recurrent": 0,
+         "installments": 0,
+         "expiring_date": f"2025-04-{number % 3 + 1:02d}" if number < 9 else None}
+        for number in range(12)
+    ])
+
+    def pages(fetch):
+        seen, after = [], (None, None)
+        while True:
+            page = fetch(*after, limit=5)
+            seen.extend(page)
+            if len(page) < 5:
+                return seen
+            after = (page[-1].expiring_date, page[-1].id)
+
+    everything = get_recent_user_expenses(user_id, limit=100)
+    assert [expense.value for expense in everything] == [
+        8, 5, 2, 7, 4, 1, 6, 3, 0, 11, 10, 9
+    ], "expenses are not ordered by date and id, undated last."
+    assert pages(lambda *after, limit: get_recent_user_expenses(user_id, *after, limit)) \
+        == everything, "recent pages skipped or repeated expenses."
+    assert pages(lambda *after, limit: get_expenses_by_month(user_id, 4, 2025, *after, limit)) \
+        == everything[:9], "month pages skipped or repeated expenses."
+
+    from src.utils.tools import decode_cursor, encode_cursor, search_user_recent_expenses
+    assert decode_cursor(encode_cursor(everything[9])) == (None, everything[9].id)
+    first = search_user_recent_expenses.invoke({"user_id": user_id})
+    assert first["count"] == 12 and first["next_cursor"] is None
+    assert search_user_recent_expenses.invoke(
+        {"user_id": user_id, "cursor": "not a cursor"}
+    )["status"] == "error"
+    print("Expense pages are complete and in order.")
+
+
+def test_monthly_totals_follow_expense_writes():
+    print("Checking the monthly expense totals...")
+    user_id = time.time_ns()
+    expense = {"currency": "BRL", "installments": 0, "expiring_date": "2025-05-10"}
+    add_user_expenses_bulk(user_id, [
+        {**expense, "label": "Aluguel", "value": 1500.0, "recurrent": 1},
+        {**expense, "label": "Mercado", "value": 320.5, "recurrent": 0},
+        {**expense, "label": "Livro", "value": 20.0, "recurrent": 0, "currency": "USD"},
+        {**expense, "label": "Sem data", "value": 99.0, "recurrent": 0, "expiring_date": None},
+    ])
+    market_id = add_user_expense(
+        user_id, {**expense, "label": "Cinema", "value": 60.0, "recurrent": 0}
+    )
+
+    totals = get_monthly_expense_totals(user_id, 5, 2025)
+    assert totals == [
+        {"currency": "BRL", "total": 1880.5, "count": 3, "recurrent_total": 1500.0},
+        {"currency": "USD", "total": 20.0, "count": 1, "recurrent_total": 0.0},
+    ], totals
+
+    with pool.connection() as conn, conn:
+        conn.execute(
+            "UPDATE expenses SET expiring_date = '2025-06-01' WHERE id = ?", (market_id,)
+        )
+        conn.execute("DELETE FROM expenses WHERE user_id = ? AND currency = 'USD'", (user_id,))
+    assert get_monthly_expense_totals(user_id, 5, 2025) == [
+        {"currency": "BRL", "total": 1820.5, "count": 2, "recurrent_total": 1500.0},
+    ], "update and delete were not reflected in the totals."
+    assert get_monthly_expense_totals(user_id, 6, 2025)[0]["total"] == 60.0
+    print("Monthly expense totals follow inserts, updates and deletes.")
+
+
+def test_async_api():
+    print("Using the async expenses API...")
+
+    async def run():
+        expense_id = await aadd_user_expense(
+            user_id=1,
+            expense={
+                "label": "Internet",
+                "value": 99.90,
+                "currency": "BRL",
+                "recurrent": 1,
+                "installments": 0,
+                "expiring_date": "2025-04-10"
+            }
+        )
+        income = await aget_user_monthly_income(1)
+        return expense_id, income
+
+    expense_id, income = asyncio.run(run())
+    assert expense_id is not None, "async expense was not inserted successfully."
+    assert income is not None, "async monthly income was not retrieved successfully."
+    print("Async expenses API works.", expense_id, income)
+
+
+def test_tools_run_concurrently():
+    print("Running tool calls concurrently...")
+    from langchain_core.messages import AIMessage
+    from langgraph.prebuilt import ToolNode
+    from src.utils.tools import tools
+
+    user_id = time.time_ns()
+    add_user_param(user_id, {"label": "monthly_income", "value": "4200"})
+    add_user_expense(user_id, {"label": "Feira", "value": 80.0, "currency": "BRL",
+                               "recurrent": 0, "installments": 0, "expiring_date": "2025-04-02"})
+    calls = [
+        {"name": "search_user_monthly_income", "args": {"user_id": user_id}}
+        if number % 2 else
+        {"name": "search_expense_by_month", "args": {"user_id": user_id, "month": 4, "year": 2025}}
+        for number in range(10)
+    ]
+    step = AIMessage(content="", tool_calls=[
+        {**call, "id": f"call_{number}", "type": "tool_call"} for number, call in enumerate(calls)
+    ])
+    node = ToolNode(tools)
+
+    for result in (node.invoke([step]), asyncio.run(node.ainvoke([step]))):
+        assert [message.tool_call_id for message in result] == [
+            f"call_{number}" for number in range(10)
+        ]
+        for number, message in enumerate(result):
+            expected = '"income": 4200.0' if number % 2 else '"count": 1'
+            assert expected in message.content, message.content
+    print("Concurrent tool calls returned every result.")
+
+
 test_create_expenses_table()
 test_create_users_table()
 test_create_user_params_table()
@@ -154,9 +386,21 @@ print("All DDL tests passed successfully.")
 test_add_user()
 test_add_user_param()
 test_add_user_expense()
+test_add_user_expenses_bulk()
+test_add_user_expenses_bulk_rejects_invalid_rows()
 print("All DML tests passed successfully.")
 
 test_get_user_monthly_income()
 test_get_user_monthly_expenses()
 test_get_expenses_by_month()
+test_get_expenses_by_month_is_year_aware()
+test_month_without_year_is_its_latest_occurrence()
+test_month_query_uses_index()
+test_monthly_totals_follow_expense_writes()
+test_expenses_are_typed_and_serialized_compactly()
+test_expense_pages_follow_a_cursor()
 print("All DQL tests passed successfully.")
+
+test_async_api()
+test_tools_run_concurrently()
+print("All async tests passed successfully.")
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+
+# Modules that must only be loaded when messages are stored or searched.
+HEAVY_MODULES = ("sqlite_vss", "langchain_community", "langchain_openai", "numpy")
+
+
+def import_times(statement):
+    """
+    Run ``statement`` in a fresh interpreter with ``-X importtime`` and return the
+    cumulative import time in microseconds of every module it loaded, plus the
+    files created in its working directory.
+    """
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [env.get("PYTHONPATH"), absolute_path]))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        times[module.strip()] = int(cumulative)
+    return times, os.listdir(workdir)
+
+
+def report(times, top=10):
+    for module, micros in sorted(times.items(), key=lambda item: -item[1])[:top]:
+        print(f"{micros / 1000:8.1f} ms  {module}")
+
+
+def test_expense_functions_import_without_messages_stack():
+    print("Importing an expense function from src.utils...")
+    times, files = import_times("from src.utils import get_user_monthly_income")
+    report(times)
+    print(f"src.utils imported in {times['src.utils'] / 1000:.1f} ms")
+
+    assert "src.utils.messages_db_sqlite" not in times, "messages module was imported."
+    loaded = [module for module in HEAVY_MODULES if module in times]
+    assert not loaded, f"heavy modules imported eagerly: {loaded}"
+    assert files == [], f"importing opened database files: {files}"
+
+
+def test_messages_module_connects_on_first_use():
+    print("Importing the messages module...")
+    times, files = import_times("import src.utils.messages_db_sqlite")
+    report(times)
+
+    loaded = [module for module in HEAVY_MODULES if module in times]
+    assert not loaded, f"heavy modules imported eagerly: {loaded}"
+    assert files == [], f"importing opened database files: {files}"
@@ -0,0 +1,112 @@
+import asyncio
+import datetime
+import os
+import sys
+import time
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+from src.utils import add_user_expense, add_user_param, initialize_database
+from src.utils.intent_router import (
+    INTENT_AGENT,
+    INTENT_MONTH_TOTAL,
+    INTENT_MONTHLY_INCOME,
+    INTENT_RECENT_EXPENSES,
+    aanswer_intent,
+    answer_intent,
+    classify_intent,
+    extract_month,
+    extract_periods,
+)
+
+
+def test_classify_routes_only_simple_lookups():
+    print("Classifying user messages...")
+    cases = {
+        "quanto ganho por mês?": (INTENT_MONTHLY_INCOME, "pt"),
+        "What is my monthly income?": (INTENT_MONTHLY_INCOME, "en"),
+        "¿Cuánto gano?": (INTENT_MONTHLY_INCOME, "es"),
+        "renda?": (INTENT_MONTHLY_INCOME, "pt"),
+        "Quanto gastei em abril de 2024?": (INTENT_MONTH_TOTAL, "pt"),
+        "how much did I spend last month?": (INTENT_MONTH_TOTAL, "en"),
+        "mis últimos gastos": (INTENT_RECENT_EXPENSES, "es"),
+        "mostre meus gastos": (INTENT_RECENT_EXPENSES, "pt"),
+        # Open questions and lookups the templates cannot answer go to the agent.
+        "como posso economizar?": (INTENT_AGENT, "pt"),
+        "quanto gastei?": (INTENT_AGENT, "pt"),
+        "quanto gastei no mercado em abril?": (INTENT_AGENT, "pt"),
+        "quanto ganho e quanto gastei em abril?": (INTENT_AGENT, "pt"),
+        "meu salário aumentou, como devo investir?": (INTENT_AGENT, "pt"),
+        "listar minhas despesas de abril": (INTENT_AGENT, "pt"),
+        # Lookup words inside requests, opinions or statements.
+        "cancelar meus gastos": (INTENT_AGENT, "pt"),
+        "remover minhas despesas": (INTENT_AGENT, "pt"),
+        "meus gastos estão altos?": (INTENT_AGENT, "pt"),
+        "minhas despesas fixas": (INTENT_AGENT, "pt"),
+        "minha renda é 5000": (INTENT_AGENT, "pt"),
+        "my income is 3000": (INTENT_AGENT, "en"),
+        "mi sueldo es 2000": (INTENT_AGENT, "es"),
+        "meu salário é de R$ 4.500": (INTENT_AGENT, "pt"),
+        # Relative years and several periods are beyond a single month's template.
+        "quanto gastei em abril do ano passado": (INTENT_AGENT, "pt"),
+        "how much did i spend last year in march": (INTENT_AGENT, "en"),
+        "¿cuánto gasté el año pasado en marzo?": (INTENT_AGENT, "es"),
+        "minha renda do ano passado": (INTENT_AGENT, "pt"),
+        "quanto gastei em abril e maio": (INTENT_AGENT, "pt"),
+        "quanto gastei este mês e mês passado": (INTENT_AGENT, "pt"),
+        "quanto gastei em abril de 2023 e 2024": (INTENT_AGENT, "pt"),
+        "gastos do mês passado": (INTENT_MONTH_TOTAL, "pt"),
+    }
+    for message, (intent, language) in cases.items():
+        match = classify_intent(message)
+        print(f"{message!r} -> {match}")
+        assert match.intent == intent, f"{message!r} was routed to {match.intent}."
+        if intent != INTENT_AGENT:
+            assert match.language == language, f"{message!r} was read as {match.language}."
+
+    assert classify_intent("Quanto gastei em abril de 2024?").slots == {"month": 4, "year": 2024}
+
+
+def test_extract_month():
+    today = datetime.date(2025, 1, 15)
+    assert extract_month("gastos do mes passado", today) == {"month": 12, "year": 2024}
+    assert extract_month("this month", today) == {"month": 1, "year": 2025}
+    # A bare month is its latest occurrence, never one in the future.
+    assert extract_month("gastos de marco", today) == {"month": 3, "year": 2024}
+    assert extract_month("gastos de janeiro", today) == {"month": 1, "year": 2025}
+    assert extract_month("gastos de marco", datetime.date(2025, 6, 1)) == \
+        {"month": 3, "year": 2025}
+    assert extract_month("gastos de marco de 2026", today) == {"month": 3, "year": 2026}
+    assert extract_month("quanto gastei", today) == {}
+
+    # Relative years qualify the month; several periods are no single month.
+    assert extract_month("gastos de abril do ano passado", today) == {"month": 4, "year": 2024}
+    assert extract_month("gastos de janeiro do ano passado", today) == \
+        {"month": 1, "year": 2024}
+    assert extract_periods("gastos de abril de 2023 e 2024", today) == \
+        [{"month": 4, "year": 2023}, {"month": 4, "year": 2024}]
+    assert extract_month("gastos de abril e maio", today) == {}
+    assert extract_month("gastos deste mes e do mes passado", today) == {}
+
+
+def test_answer_intent_with_tool_and_template():
+    print("Answering routed intents...")
+    initialize_database()
+    user_id = time.time_ns()
+    income = classify_intent("qual é minha renda?")
+    assert answer_intent(income, user_id + 1) == "Você ainda não cadastrou sua renda mensal."
+
+    add_user_param(user_id, {"label": "monthly_income", "value": "5234.5"})
+    add_user_expense(user_id, {
+        "label": "Mercado", "value": 1120.3, "currency": "BRL", "recurrent": 0,
+        "installments": 0, "expiring_date": "2025-04-03"
+    })
+    assert answer_intent(income, user_id) == "Sua renda mensal cadastrada é 5.234,50."
+
+    total = classify_intent("how much did I spend in April 2025?")
+    assert asyncio.run(aanswer_intent(total, user_id)) == \
+        "In 04/2025 you spent 1,120.30 BRL (1 expense)."
+
+    recent = answer_intent(classify_intent("meus últimos gastos"), user_id)
+    assert recent.endswith("- 2025-04-03: Mercado 1.120,30 BRL"), recent
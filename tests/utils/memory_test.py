@@ -0,0 +1,73 @@
+import asyncio
+import os
+import sys
+import time
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+from src.utils import add_message_with_embedding, create_conversations_table
+from src.utils.memory import aretrieve_memory, render_memory, retrieve_memory
+from src.utils.tokens import count_tokens
+
+
+def row(message_id, content, role="user"):
+    return (message_id, 1, role, content, "2025-04-01 10:00:00", "Teste")
+
+
+def test_render_memory_dedupes_and_respects_budget():
+    print("Rendering memory from overlapping sources...")
+    recent = [row(5, "Quanto gastei em abril?"), row(4, "Gastei 200 no mercado", "assistant")]
+    similar = [row(4, "Gastei 200 no mercado", "assistant"), row(1, "Orçamento de abril")]
+
+    text, messages, tokens = render_memory(recent, similar, token_budget=1000)
+    assert messages == 3, "duplicated message was rendered twice."
+    assert text.index("Orçamento") < text.index("mercado") < text.index("Quanto"), \
+        "memory is not in chronological order."
+
+    budget = count_tokens(text.splitlines()[-1]) + 1
+    text, messages, tokens = render_memory(recent, similar, token_budget=budget)
+    assert messages == 1 and "Quanto gastei" in text, "newest message was not kept first."
+    assert tokens <= budget
+
+
+def test_retrieve_memory_sync_and_async():
+    print("Retrieving conversation memory...")
+    create_conversations_table()
+    user_id = time.time_ns()
+    add_message_with_embedding(user_id, "user", "Paguei o aluguel de março", "Aluguel")
+    add_message_with_embedding(user_id, "assistant", "Anotei o aluguel de março.", "Aluguel")
+
+    memory = retrieve_memory(user_id, "Quanto paguei de aluguel?")
+    print("Memory:", memory)
+    assert memory.messages == 2 and "aluguel de março" in memory.text
+    assert {"memory_recent_ms", "memory_similar_ms", "memory_total_ms"} <= set(memory.timings)
+
+    memory = asyncio.run(aretrieve_memory(user_id, "Quanto paguei de aluguel?"))
+    assert memory.messages == 2, "async retrieval returned a different memory."
+
+    empty = retrieve_memory(user_id + 1, "")
+    assert empty.text == "" and "memory_similar_ms" not in empty.timings
+
+
+def test_retrieve_memory_reads_on_the_database_thread(monkeypatch):
+    print("Checking which threads read the messages database...")
+    import threading
+    from src.utils import messages_db_sqlite
+
+    threads = []
+
+    def recording(func):
+        def wrapper(*args):
+            threads.append(threading.current_thread().name)
+            return func(*args)
+        return wrapper
+
+    for name in ("get_recent_conversations", "_similar_messages_for_user"):
+        monkeypatch.setattr(messages_db_sqlite, name, recording(getattr(messages_db_sqlite, name)))
+
+    create_conversations_table()
+    retrieve_memory(time.time_ns(), "Quanto paguei de aluguel?")
+    assert len(threads) == 2
+    assert all(name.startswith("messages-db") for name in threads), \
+        f"shared connection used outside the database thread: {threads}"
@@ -0,0 +1,108 @@
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+import src.utils
+
+
+def load_colocated_module():
+    # A fresh copy of messages_db_sqlite with conversations and vectors in one file.
+    database = os.path.join(tempfile.mkdtemp(), "messages.db")
+    overrides = {
+        "MESSAGES_DB_PATH": database,
+        "MESSAGES_VECTOR_DB_PATH": database,
+        "EMBEDDINGS_PROVIDER": "hashing"
+    }
+    previous = {name: os.environ.get(name) for name in overrides}
+    os.environ.update(overrides)
+    try:
+        spec = importlib.util.spec_from_file_location(
+            "src.utils.messages_db_colocated",
+            os.path.join(os.path.dirname(src.utils.__file__), "messages_db_sqlite.py")
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        # The provider is read on first use; create the embeddings while it is set.
+        module.get_embeddings()
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name)
+            else:
+                os.environ[name] = value
+    module.initialize_messages_database()
+    return module, database
+
+
+def test_message_and_vector_share_one_transaction():
+    print("Storing messages in a colocated database...")
+    messages, database = load_colocated_module()
+    assert messages.colocated
+    assert messages.get_vector_connection() is messages.get_connection()
+
+    message_id = messages.add_message_with_embedding(
+        user_id=1, role="user", content="Paguei o aluguel", topic_summary="Aluguel"
+    )
+    assert len(messages.message_buffer) == 0, "colocated write went through the buffer."
+    assert messages.get_message_index().size(1) == 1, "vector was not written with the message."
+
+    tables = messages.get_connection().execute(
+        "SELECT name FROM sqlite_master WHERE name IN ('conversations', 'vss_messages_1')"
+    ).fetchall()
+    assert len(tables) == 2, f"conversations and vectors are not in {database}."
+
+    conversations = messages.find_similar_messages_for_user("aluguel", user_id=1)
+    assert [row[0] for row in conversations] == [message_id]
+    messages.close_connections()
+
+
+def test_joined_search_applies_filters():
+    print("Searching a colocated database with a topic filter...")
+    messages, _ = load_colocated_module()
+    for index in range(20):
+        messages.add_message_with_embedding(1, "user", f"Jantar fora {index}", "Lazer")
+    messages.add_message_with_embedding(1, "user", "Jantar fora com a família", "Mercado")
+    messages.add_message_with_embedding(2, "user", "Jantar fora", "Mercado")
+
+    conversations = messages.find_similar_messages_by_topic(
+        "Jantar fora", ["mercado"], user_id=1, limit=5
+    )
+    assert len(conversations) == 1 and conversations[0][1] == 1
+    assert conversations[0] == messages.get_recent_conversations(1, limit=1)[0], \
+        "joined search did not return full conversation rows."
+    messages.close_connections()
+
+
+def test_legacy_vectors_are_imported_and_dropped():
+    print("Importing the vectors of the former single-table store...")
+    messages, _ = load_colocated_module()
+    message_id = messages.add_message_with_embedding(1, "user", "Paguei a luz", "Contas")
+    vector = messages.get_embeddings().embed_query("Paguei a luz")
+    connection = messages.get_vector_connection()
+    with connection:
+        connection.execute(
+            "CREATE TABLE embeddings (rowid INTEGER PRIMARY KEY, text TEXT, "
+            "metadata BLOB, text_embedding BLOB)"
+        )
+        connection.execute(
+            f"CREATE VIRTUAL TABLE vss_embeddings USING vss0(text_embedding({len(vector)}))"
+        )
+        connection.execute(
+            "INSERT INTO embeddings (text, metadata, text_embedding) VALUES (?, ?, ?)",
+            ("Paguei a luz", json.dumps({"user_id": 7, "message_id": message_id}),
+             json.dumps(vector))
+        )
+
+    assert messages.import_legacy_vectors() == 1
+    assert messages.get_message_index().size(7) == 1, "legacy vector was not imported."
+    tables = connection.execute(
+        "SELECT name FROM sqlite_master WHERE name LIKE '%embeddings%'"
+    ).fetchall()
+    assert tables == [], f"legacy tables were left behind: {tables}"
+    assert messages.import_legacy_vectors() == 0
+    messages.close_connections()
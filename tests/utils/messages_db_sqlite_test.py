@@ -1,5 +1,9 @@
+import asyncio
 import os
 import sys
+import time
+
+import pytest
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -9,11 +13,14 @@ sys.path.append(absolute_path)
 from src.utils import (
     create_conversations_table,
     add_message_with_embedding,
+    flush_message_embeddings,
     get_recent_conversations,
     find_similar_messages_for_user,
     find_recent_similar_messages_by_date,
-    find_similar_messages_by_topic
+    find_similar_messages_by_topic,
+    afind_similar_messages_for_user
 )
+from src.utils.messages_db_sqlite import close_connections, get_embeddings
 
 
 def test_create_conversations_table():
@@ -57,6 +64,8 @@ def test_get_recent_conversations():
 
 def test_find_similar_messages_for_user():
     print("Initializing test find_similar_messages_for_user...")
+    # Searches only see indexed messages, not the ones still buffered.
+    flush_message_embeddings()
     conversations = find_similar_messages_for_user(
         query="Test message content",
         user_id=1,
@@ -89,6 +98,7 @@ def test_find_similar_messages_by_topic():
         topic_summary="Test Summary"
     )
     assert message_id is not None, "conversation added successfully."
+    flush_message_embeddings()
     conversations = find_similar_messages_by_topic(
         query="Test content",
         topic_keywords=["Summary"],
@@ -100,14 +110,86 @@ def test_find_similar_messages_by_topic():
     print("Recent conversations retrieved successfully.", conversations)
 
 
-test_create_conversations_table()
-print("All DDL tests passed successfully.")
+def test_filtered_search_returns_full_limit_for_heavy_user():
+    print("Initializing test of filtered search on a user with a long history...")
+    user_id = time.time_ns()
+    for index in range(40):
+        add_message_with_embedding(
+            user_id=user_id,
+            role="user",
+            content=f"Gastei com cinema e restaurante no fim de semana {index}",
+            topic_summary="Lazer"
+        )
+    for index in range(3):
+        add_message_with_embedding(
+            user_id=user_id,
+            role="user",
+            content=f"Paguei o aluguel do apartamento {index}",
+            topic_summary="Aluguel"
+        )
+    add_message_with_embedding(
+        user_id=user_id + 1,
+        role="user",
+        content="Gastei com cinema e restaurante no fim de semana",
+        topic_summary="Aluguel"
+    )
+    flush_message_embeddings()
+
+    conversations = find_similar_messages_by_topic(
+        query="Gastei com cinema e restaurante",
+        topic_keywords=["aluguel"],
+        user_id=user_id,
+        limit=3
+    )
+    assert len(conversations) == 3, "filtered search came back short."
+    assert all(row[1] == user_id for row in conversations), "another user's message leaked."
+
+    conversations = find_recent_similar_messages_by_date(
+        query="Paguei o aluguel", user_id=user_id, limit=10
+    )
+    assert len(conversations) == 10, "date-filtered search came back short."
+
 
-test_add_message_with_embedding()
-print("All DML tests passed successfully.")
+def test_afind_similar_messages_for_user():
+    print("Initializing test afind_similar_messages_for_user...")
+    conversations = asyncio.run(afind_similar_messages_for_user(
+        query="Test message content",
+        user_id=1,
+        limit=5
+    ))
 
-test_get_recent_conversations()
-test_find_similar_messages_for_user()
-test_find_recent_similar_messages_by_date()
-test_find_similar_messages_by_topic()
-print("All DQL tests passed successfully.")
+    assert len(conversations) > 0, "No recent conversations found."
+    print("Similar conversations retrieved asynchronously.", conversations)
+
+
+def test_messages_are_stored_after_closing_connections():
+    print("Storing a message after closing the connections...")
+    close_connections()
+    user_id = time.time_ns()
+    message_id = add_message_with_embedding(user_id, "user", "Paguei a academia", "Academia")
+    flush_message_embeddings()
+    conversations = find_similar_messages_for_user("academia", user_id=user_id)
+    assert [row[0] for row in conversations] == [message_id]
+
+
+# Run as a script: python tests/utils/messages_db_sqlite_test.py
+if __name__ == "__main__":
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("EMBEDDINGS_PROVIDER", "hashing")
+        get_embeddings.reset()
+        test_create_conversations_table()
+        print("All DDL tests passed successfully.")
+
+        test_add_message_with_embedding()
+        print("All DML tests passed successfully.")
+
+        test_get_recent_conversations()
+        test_find_similar_messages_for_user()
+        test_find_recent_similar_messages_by_date()
+        test_find_similar_messages_by_topic()
+        test_filtered_search_returns_full_limit_for_heavy_user()
+        test_afind_similar_messages_for_user()
+        test_messages_are_stored_after_closing_connections()
+        print("All DQL tests passed successfully.")
+        flush_message_embeddings()
+        get_embeddings.reset()
@@ -0,0 +1,63 @@
+import asyncio
+import os
+import sys
+import time
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+from src.utils import add_user_param, aget_user_monthly_income, get_user_monthly_income
+from src.utils.expenses_db_sqlite import create_user_params_table, user_params_cache
+from src.utils.params_cache import ReadThroughCache
+
+
+def test_cache_counts_hits_and_evicts():
+    print("Reading through the cache...")
+    cache = ReadThroughCache(maxsize=2, ttl=60)
+    loads = []
+
+    def load(value):
+        loads.append(value)
+        return value
+
+    assert cache.get("a", lambda: load(None)) is None
+    assert cache.get("a", lambda: load("other")) is None, "a missing value was not cached."
+    cache.get("b", lambda: load(2))
+    cache.get("c", lambda: load(3))
+    assert cache.get("a", lambda: load(1)) == 1, "the least recently used entry was kept."
+    assert loads == [None, 2, 3, 1]
+    assert cache.stats() == {"hits": 1, "misses": 4, "hit_rate": 0.2, "entries": 2}
+
+
+def test_cache_expires_and_skips_stale_loads():
+    print("Expiring and invalidating entries...")
+    cache = ReadThroughCache(ttl=0.05)
+    cache.get("a", lambda: 1)
+    time.sleep(0.06)
+    assert cache.get("a", lambda: 2) == 2, "expired entry was returned."
+
+    def racing_load():
+        cache.invalidate("a")  # a write committed while the old value was loading
+        return 3
+
+    cache.invalidate("a")
+    assert cache.get("a", racing_load) == 3
+    assert cache.get("a", lambda: 4) == 4, "a load that raced with a write was cached."
+    assert asyncio.run(cache.aget("a", None)) == 4
+
+
+def test_income_reads_hit_the_cache_until_written():
+    print("Reading the monthly income repeatedly...")
+    create_user_params_table()
+    user_id = time.time_ns()
+    add_user_param(user_id, {"label": "monthly_income", "value": "3000"})
+    before = user_params_cache.stats()
+
+    assert [get_user_monthly_income(user_id) for _ in range(5)] == [3000.0] * 5
+    assert asyncio.run(aget_user_monthly_income(user_id)) == 3000.0
+    after = user_params_cache.stats()
+    assert after["misses"] - before["misses"] == 1 and after["hits"] - before["hits"] == 5
+
+    add_user_param(user_id, {"label": "monthly_income", "value": "4500"})
+    assert get_user_monthly_income(user_id) == 4500.0, "write did not invalidate the cache."
+    print("Cache stats:", user_params_cache.stats())
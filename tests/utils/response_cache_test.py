@@ -0,0 +1,86 @@
+import asyncio
+import os
+import sys
+import time
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+from src.utils import add_user_expense, add_user_param, get_user_data_version, initialize_database
+from src.utils.messages_db_sqlite import get_response_index
+from src.utils import response_cache
+from src.utils.response_cache import (
+    afind_cached_response,
+    cache_response,
+    cacheable,
+    find_cached_response,
+)
+
+QUERY = "What did I spend this month?"
+ANSWER = "You spent R$ 120,00 this month."
+EXPENSE = {"label": "mercado", "value": 120.0, "currency": "BRL", "recurrent": False,
+           "installments": 1}
+
+
+def test_data_version_follows_writes():
+    print("Writing expenses and parameters...")
+    initialize_database()
+    user_id = time.time_ns()
+    assert get_user_data_version(user_id) == 0
+    add_user_expense(user_id, EXPENSE)
+    add_user_param(user_id, {"label": "monthly_income", "value": "3000"})
+    assert get_user_data_version(user_id) == 2
+
+
+def test_cached_answer_is_reused_until_data_changes():
+    print("Caching an answer...")
+    initialize_database()
+    user_id = time.time_ns()
+    version = get_user_data_version(user_id)
+    assert find_cached_response(user_id, QUERY, version) is None
+    cache_response(user_id, QUERY, ANSWER, version)
+
+    assert find_cached_response(user_id, "what did i spend this month", version) == ANSWER
+    assert asyncio.run(afind_cached_response(user_id, QUERY, version)) == ANSWER
+    assert find_cached_response(user_id, "How much is my monthly income?", version) is None
+    assert find_cached_response(user_id + 1, QUERY, version) is None, "answer leaked across users."
+
+    add_user_expense(user_id, {**EXPENSE, "label": "farmacia", "value": 30.0})
+    new_version = get_user_data_version(user_id)
+    assert find_cached_response(user_id, QUERY, new_version) is None, "stale answer was returned."
+
+    cache_response(user_id, QUERY, "You spent R$ 150,00 this month.", new_version)
+    assert find_cached_response(user_id, QUERY, new_version) == "You spent R$ 150,00 this month."
+    assert get_response_index().size(user_id) == 1, "stale answer was not dropped."
+
+
+def test_cached_answer_needs_the_same_month_and_numbers(monkeypatch):
+    print("Looking up queries that differ only in a month or an amount...")
+    # Accept any distance, as a semantic model might for these queries, so only the
+    # slots tell them apart.
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_MAX_DISTANCE", 4.0)
+    user_id = time.time_ns()
+    query = "Quanto gastei em abril de 2025 no total?"
+    cache_response(user_id, query, "Em 04/2025 você gastou 120,00 BRL.", 0)
+    assert find_cached_response(user_id, query, 0) is not None
+
+    for other in ["Quanto gastei em maio de 2025 no total?",
+                  "Quanto gastei em abril de 2024 no total?"]:
+        assert find_cached_response(user_id, other, 0) is None, f"{other!r} hit the cache."
+
+    cache_response(user_id, "Me mostre os gastos de abril", "Em abril: mercado.", 0)
+    assert find_cached_response(user_id, "Me mostre os gastos de abril do ano passado", 0) \
+        is None, "a relative year was read as the current one."
+    cache_response(user_id, "Quanto gastei no ano passado?", "R$ 9.000,00.", 0)
+    assert find_cached_response(user_id, "Quanto gastei neste ano?", 0) is None
+
+    cache_response(user_id, "Posso gastar 100 reais no mercado?", "Pode sim.", 0)
+    assert find_cached_response(user_id, "Posso gastar 1000 reais no mercado?", 0) is None
+
+
+def test_short_follow_ups_are_not_cached():
+    print("Caching a follow-up...")
+    user_id = time.time_ns()
+    assert not cacheable("and in May?")
+    assert cache_response(user_id, "and in May?", ANSWER, 0) is None
+    assert find_cached_response(user_id, "and in May?", 0) is None
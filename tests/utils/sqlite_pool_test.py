@@ -0,0 +1,85 @@
+import os
+import sys
+import tempfile
+import threading
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+from src.utils.sqlite_pool import PoolTimeoutError, SQLiteConnectionPool
+
+
+def make_pool(size=2, timeout=30.0):
+    database = os.path.join(tempfile.mkdtemp(), "pool_test.db")
+    pool = SQLiteConnectionPool(database, size=size, timeout=timeout)
+    with pool.connection() as conn, conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, thread TEXT)")
+    return pool
+
+
+def test_connection_uses_wal_and_busy_timeout():
+    print("Checking pooled connection pragmas...")
+    pool = make_pool()
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == pool.busy_timeout_ms
+
+
+def test_nested_blocks_reuse_connection():
+    print("Checking nested pool usage in the same thread...")
+    pool = make_pool(size=1, timeout=0.1)
+    with pool.connection() as outer:
+        with pool.connection() as inner:
+            assert inner is outer
+
+
+def test_pool_is_bounded():
+    print("Checking that the pool never opens more than its size...")
+    pool = make_pool(size=1, timeout=0.1)
+    acquired = threading.Event()
+    release = threading.Event()
+
+    def hold_connection():
+        with pool.connection():
+            acquired.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold_connection)
+    holder.start()
+    acquired.wait()
+    try:
+        with pool.connection():
+            raise AssertionError("second connection should not be available")
+    except PoolTimeoutError:
+        pass
+    finally:
+        release.set()
+        holder.join()
+
+
+def test_concurrent_writes_from_many_threads():
+    print("Writing from several threads through the pool...")
+    pool = make_pool(size=4)
+    errors = []
+
+    def write_rows():
+        try:
+            for _ in range(25):
+                with pool.connection() as conn, conn:
+                    conn.execute(
+                        "INSERT INTO items (thread) VALUES (?)",
+                        (threading.current_thread().name,)
+                    )
+        except Exception as error:  # noqa: B902
+            errors.append(error)
+
+    threads = [threading.Thread(target=write_rows) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors, errors
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 200
+    assert pool._opened <= pool.size
@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+from src.utils import create_expenses_table
+from src.utils.statement_importer import (
+    import_statement_lines,
+    iter_ofx_transactions,
+    parse_amount,
+    parse_date
+)
+
+CSV_STATEMENT = """Data;Histórico;Valor
+01/03/2025;Padaria Pão Quente;-12,50
+01/03/2025;Padaria Pão Quente;-12,50
+02/03/2025;Salário;7.500,00
+03/03/2025;Aluguel;-1.650,00
+"""
+
+OFX_STATEMENT = """OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+
+<OFX>
+<BANKMSGSRSV1><STMTTRNRS><STMTRS>
+<CURDEF>BRL
+<BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20250305120000[-3:BRT]
+<TRNAMT>-89.90
+<FITID>202503050001
+<MEMO>Supermercado
+</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250306<TRNAMT>-45.00<FITID>202503060001<NAME>Farmácia</STMTTRN>
+</BANKTRANLIST>
+</STMTRS></STMTTRNRS></BANKMSGSRSV1>
+</OFX>
+"""
+
+
+def test_parse_amount():
+    print("Parsing statement amounts...")
+    assert parse_amount("R$ -1.234,56") == -1234.56
+    assert parse_amount("1,234.56") == 1234.56
+    assert parse_amount("(12.50)") == -12.5
+    assert parse_amount("10,00-") == -10.0
+    assert parse_amount("-89.90") == -89.9
+
+
+def test_parse_date():
+    print("Parsing statement dates...")
+    assert parse_date("05/03/2025") == "2025-03-05"
+    assert parse_date("03/05/2025", dayfirst=False) == "2025-03-05"
+    assert parse_date("2025-03-05") == "2025-03-05"
+
+
+def test_iter_ofx_transactions():
+    print("Parsing an OFX statement...")
+    transactions = list(iter_ofx_transactions(OFX_STATEMENT.splitlines(keepends=True)))
+    assert [t.date for t in transactions] == ["2025-03-05", "2025-03-06"]
+    assert [t.amount for t in transactions] == [-89.9, -45.0]
+    assert [t.description for t in transactions] == ["Supermercado", "Farmácia"]
+    assert transactions[0].fitid == "202503050001"
+    assert transactions[0].currency == "BRL"
+    print("OFX transactions parsed successfully.", transactions)
+
+
+def test_import_csv_statement_is_idempotent():
+    print("Importing a CSV statement twice...")
+    create_expenses_table()
+    lines = CSV_STATEMENT.splitlines(keepends=True)
+    user_id = time.time_ns()  # a fresh user, so earlier runs cannot hold these lines
+
+    first = import_statement_lines(user_id, lines, "csv", batch_size=2)
+    assert first.read == 4
+    assert first.inserted == 3, "both identical purchases of the same day must be kept."
+    assert first.skipped == 1, "credits should be skipped."
+
+    second = import_statement_lines(user_id, lines, "csv", batch_size=2)
+    assert second.inserted == 0 and second.duplicates == 3, "re-import created duplicates."
+    print("CSV statement imported successfully.", first, second)
+
+
+def test_import_ofx_statement():
+    print("Importing an OFX statement...")
+    create_expenses_table()
+    report = import_statement_lines(time.time_ns(), OFX_STATEMENT.splitlines(keepends=True), "ofx")
+    assert report.inserted == 2, "OFX expenses were not imported."
+    assert report.rows_per_second > 0
+    print("OFX statement imported successfully.", report)
@@ -0,0 +1,44 @@
+import os
+import sqlite3
+import sys
+
+absolute_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+print("Adding to sys.path:", absolute_path)
+sys.path.append(absolute_path)
+import sqlite_vss
+
+from src.utils.vector_index import UserVectorIndex
+
+
+def vss_index():
+    conn = sqlite3.connect(":memory:")
+    conn.enable_load_extension(True)
+    sqlite_vss.load(conn)
+    return UserVectorIndex(conn, "messages")
+
+
+def test_search_only_returns_the_users_vectors():
+    print("Searching a user's vector partition...")
+    index = vss_index()
+    with index.connection:
+        index.add(1, [(10, [1.0, 0.0]), (11, [0.0, 1.0]), (12, [0.9, 0.1])])
+        index.add(2, [(20, [1.0, 0.0])])
+
+    hits = index.search(1, [1.0, 0.0], k=5)
+    assert [rowid for rowid, _ in hits] == [10, 12, 11], "hits are not ordered by distance."
+    assert index.search(2, [1.0, 0.0], k=5)[0][0] == 20
+    assert index.search(3, [1.0, 0.0], k=5) == [], "unknown user returned vectors."
+    assert index.size(1) == 3 and index.users() == [1, 2]
+
+
+def test_dimension_mismatch_is_rejected():
+    print("Adding vectors of another size to a partition...")
+    index = vss_index()
+    with index.connection:
+        index.add(1, [(10, [1.0, 0.0])])
+    try:
+        index.add(1, [(11, [1.0, 0.0, 0.0])])
+    except ValueError as error:
+        print("Rejected:", error)
+    else:
+        raise AssertionError("vectors with a different dimension were accepted.")